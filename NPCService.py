@@ -9,12 +9,18 @@ import math
 import random
 import generated.npcservice_pb2 as npc_pb2
 import generated.npcservice_pb2_grpc as npc_grpc
+from npc_store import make_npc_store, step_npcs
+import log
+
+logger = log.get_logger(__name__)
 
 
 class NPCService(npc_grpc.NPCServiceServicer):
-    def __init__(self, master_server, config_file="npcs.json", loop=None):
+    def __init__(self, master_server, config_file="npcs.json", loop=None, vectorized=None):
         self.master_server = master_server
-        self.npcs = {}
+        # dict of per-NPC dicts, or an array-backed store with the same
+        # mapping interface when NumPy is available (see npc_store.py)
+        self.npcs = make_npc_store(vectorized)
         if loop is None:
             raise RuntimeError("Event loop must be explicitly passed to NPCService since it runs in a separate thread.")
         self.loop = loop
@@ -25,7 +31,7 @@ class NPCService(npc_grpc.NPCServiceServicer):
 
     def load_npcs(self, config_file):
         if not os.path.exists(config_file):
-            print(f"[NPC] Config file {config_file} not found, skipping preload.")
+            logger.warning("[NPC] Config file %s not found, skipping preload.", config_file)
             return
 
         with open(config_file, "r") as f:
@@ -51,38 +57,21 @@ class NPCService(npc_grpc.NPCServiceServicer):
                 ),
                 self.loop
             )
-            print(f"[NPC] Loaded NPC {npc_id} ({self.npcs[npc_id]['name']}) at {self.npcs[npc_id]['x']},{self.npcs[npc_id]['y']},{self.npcs[npc_id]['z']}")
+            npc = self.npcs[npc_id]
+            logger.info("[NPC] Loaded NPC %s (%s) at %s,%s,%s", npc_id, npc["name"], npc["x"], npc["y"], npc["z"])
 
     async def _movement_loop(self):
         while True:
             start = time.time()
-            for npc_id, npc in list(self.npcs.items()):
-                # wandering heading change
-                npc['yaw'] = npc.get('yaw', random.random() * 2 * math.pi) + random.uniform(-0.6, 0.6) * self.tick
-                speed = npc.get('speed', 1.5)
-                dx = math.cos(npc['yaw']) * speed * self.tick
-                dz = math.sin(npc['yaw']) * speed * self.tick
-                new_x = npc['x'] + dx
-                new_z = npc['z'] + dz
-                new_y = self.master_server.get_height_at(new_x, new_z)
-
-                # Bounds check
-                wb = self.master_server.world_bounds
-                if not (wb["min_x"] <= new_x <= wb["max_x"] and wb["min_z"] <= new_z <= wb["max_z"]):
-                    npc['yaw'] += math.pi  # reverse direction
-                    continue
-
-                # Collider check
-                if self.master_server.is_inside_collider(new_x, new_y, new_z):
-                    npc['yaw'] += math.pi / 2
-                    continue
-
-                # Commit move
-                npc.update({"x": new_x, "y": new_y, "z": new_z, "state": "walking"})
+            # Wander, bounds reflection, height and collider checks for every NPC
+            moves = step_npcs(self.npcs, self.tick, self.master_server)
+
+            # One batched send for the whole tick
+            if moves:
                 try:
-                    await self.master_server.broadcast_npc_update(npc_id, new_x, new_y, new_z)
-                except Exception as e:
-                    print(f"[NPC] broadcast update failed for {npc_id}: {e}")
+                    await self.master_server.broadcast_npc_updates(moves)
+                except Exception:
+                    logger.exception("[NPC] broadcast of %d NPC updates failed", len(moves))
 
             elapsed = time.time() - start
             await asyncio.sleep(max(0, self.tick - elapsed))
@@ -107,7 +96,7 @@ class NPCService(npc_grpc.NPCServiceServicer):
             self.loop
         )
 
-        print(f"[NPC] Spawned NPC {npc_id} at ({request.x}, {request.y}, {request.z})")
+        logger.info("[NPC] Spawned NPC %s at (%s, %s, %s)", npc_id, request.x, request.y, request.z)
         return npc_pb2.NPCAck(success=True, npcId=npc_id)
 
     def WalkNPC(self, request, context):
@@ -122,7 +111,7 @@ class NPCService(npc_grpc.NPCServiceServicer):
             self.loop
         )
 
-        print(f"[NPC] NPC {npc_id} walked to ({request.x}, {request.y}, {request.z})")
+        logger.info("[NPC] NPC %s walked to (%s, %s, %s)", npc_id, request.x, request.y, request.z)
         return npc_pb2.NPCAck(success=True, npcId=npc_id)
 
     def DespawnNPC(self, request, context):
@@ -137,7 +126,7 @@ class NPCService(npc_grpc.NPCServiceServicer):
             self.loop
         )
 
-        print(f"[NPC] Despawned NPC {npc_id}")
+        logger.info("[NPC] Despawned NPC %s", npc_id)
         return npc_pb2.NPCAck(success=True, npcId=npc_id)
 
 
@@ -150,5 +139,5 @@ def serve(master_server, port=7000, loop=None):
     npc_grpc.add_NPCServiceServicer_to_server(service, server)
     server.add_insecure_port(f"[::]:{port}")
     server.start()
-    print(f"[NPC SERVICE] gRPC NPCService running on port {port}")
+    logger.info("[NPC SERVICE] gRPC NPCService running on port %s", port)
     return service
\ No newline at end of file
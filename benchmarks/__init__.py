@@ -0,0 +1,5 @@
+"""Offline benchmarks for the master server.
+
+Each module is a standalone script; run from the repository root, e.g.:
+    python -m benchmarks.world_tick --players 200
+"""
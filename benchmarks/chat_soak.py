@@ -0,0 +1,97 @@
+"""Soak the chat StreamMessages fan-out and watch memory and task count.
+
+Runs chat.ChatServiceServicer in-process with `--subscribers` streams (each
+on every channel) consumed by their own tasks, publishes `--messages` chat
+lines through SendMessage, and every `--churn` messages disconnects one
+stream and opens a new one. `--stalled` extra streams subscribe and never
+read, like a stuck client; their bounded queues overflow and drop instead
+of growing. With `--resume` a reconnecting stream passes the last seq the
+old one saw (StreamRequest.sinceSeq) and is caught up from chat history.
+Every `--report` messages it prints traced memory, live asyncio tasks,
+subscribers and drops so far; the first three should stay flat.
+
+    python -m benchmarks.chat_soak --messages 1000000
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+from chat import ChatServiceServicer
+from generated import chatservice_pb2
+
+CHANNELS = ["global", "trade", "guild"]
+CHANNELS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "channels.ini")
+
+
+class StreamContext:
+    """Stand-in for the grpc.aio servicer context (unused by the servicer)."""
+
+
+async def consume(servicer, player_id, counts, since=None):
+    request = chatservice_pb2.StreamRequest(playerId=player_id, channels=CHANNELS, sinceSeq=since)
+    async for msg in servicer.StreamMessages(request, StreamContext()):
+        counts[0] += 1
+        counts[1] = msg.seq
+
+
+async def soak(args):
+    servicer = ChatServiceServicer(CHANNELS_FILE, queue_limit=args.queue_limit)
+    for i in range(args.stalled):
+        servicer.hub.subscribe(f"stalled-{i}", CHANNELS)
+    received = [0, 0]  # lines received, last seq seen
+    streams = [asyncio.create_task(consume(servicer, f"sub-{i}", received)) for i in range(args.subscribers)]
+    await asyncio.sleep(0)
+    opened = args.subscribers
+
+    tracemalloc.start()
+    print(f"{'messages':>10} {'received':>12} {'traced KiB':>11} {'tasks':>6} {'subs':>5} {'dropped':>9} {'msg/s':>9}")
+    start = last = time.perf_counter()
+    for i in range(1, args.messages + 1):
+        msg = chatservice_pb2.ChatMessage(channel=CHANNELS[i % len(CHANNELS)], playerId="soak", text=f"line {i}")
+        await servicer.SendMessage(msg, None)
+        if i % args.churn == 0:
+            # Drop the oldest stream the way a client disconnect does, open a new one
+            old = streams.pop(0)
+            old.cancel()
+            since = received[1] if args.resume else None
+            streams.append(asyncio.create_task(consume(servicer, f"sub-{opened}", received, since)))
+            opened += 1
+        if i % args.batch == 0:
+            await asyncio.sleep(0)  # let the streams drain
+        if i % args.report == 0:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            current, _ = tracemalloc.get_traced_memory()
+            stats = servicer.hub.stats
+            dropped = sum(stats.dropped.values()) + sum(stats.evicted.values())
+            print(f"{i:>10} {received[0]:>12} {current / 1024:>11.0f} {len(asyncio.all_tasks()):>6} "
+                  f"{len(servicer.hub):>5} {dropped:>9} {args.report / (now - last):>9.0f}")
+            last = now
+    tracemalloc.stop()
+
+    for task in streams:
+        task.cancel()
+    await asyncio.gather(*streams, return_exceptions=True)
+    print(f"done in {time.perf_counter() - start:.1f}s; subscribers left after shutdown: "
+          f"{len(servicer.hub) - args.stalled} (+{args.stalled} stalled); "
+          f"caught up {servicer.history.stats.replayed} lines")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--subscribers", type=int, default=20)
+    parser.add_argument("--churn", type=int, default=1000, help="messages between stream reconnects")
+    parser.add_argument("--batch", type=int, default=100, help="messages published between yields to the streams")
+    parser.add_argument("--stalled", type=int, default=2, help="subscribers that never read")
+    parser.add_argument("--queue-limit", type=int, default=1024)
+    parser.add_argument("--report", type=int, default=100_000)
+    parser.add_argument("--resume", action="store_true", help="reconnect with a sinceSeq cursor")
+    args = parser.parse_args()
+    asyncio.run(soak(args))
+
+
+if __name__ == "__main__":
+    main()
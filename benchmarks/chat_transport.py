@@ -0,0 +1,113 @@
+"""Compare the master's chat round trip in-process vs over gRPC loopback.
+
+Runs chat.ChatServiceServicer with a ChatManager listening on every channel
+and a stand-in master that records when each line comes back from the
+listener. "local" wires the manager to the servicer directly (use_local);
+"grpc" serves the servicer on a loopback port and goes through the stub,
+with batch_size=1 so each line is its own SendMessages call, as it would be
+without batching.
+
+For each transport it reports the send -> broadcast latency of `--messages`
+lines sent one at a time (p50/p99), then the CPU time per line of a burst
+of `--burst` lines sent back to back.
+
+    python -m benchmarks.chat_transport --messages 2000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import grpc
+
+from chat import ChatManager, ChatServiceServicer
+from generated import chatservice_pb2_grpc
+
+CHANNELS = ["global", "trade", "guild"]
+CHANNELS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "channels.ini")
+
+
+class RecordingMaster:
+    """Counts broadcast chat lines and wakes whoever waits for the next one."""
+
+    def __init__(self):
+        self.received = 0
+        self.arrived = asyncio.Event()
+
+    async def broadcast_chat(self, msg):
+        self.received += 1
+        self.arrived.set()
+
+
+async def wait_for(master, count):
+    while master.received < count:
+        master.arrived.clear()
+        await master.arrived.wait()
+
+
+async def measure(manager, master, args):
+    latencies = []
+    for i in range(args.messages):
+        start = time.perf_counter()
+        await manager.send_message("bench", f"line {i}")
+        await wait_for(master, i + 1)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    sent = master.received
+    cpu = time.process_time()
+    for i in range(args.burst):
+        await manager.send_message("bench", f"burst {i}", channel=CHANNELS[i % len(CHANNELS)])
+    await wait_for(master, sent + args.burst)
+    cpu = time.process_time() - cpu
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], cpu / args.burst
+
+
+async def run_local(args):
+    servicer = ChatServiceServicer(CHANNELS_FILE, queue_limit=args.burst + 1)
+    master = RecordingMaster()
+    manager = ChatManager(master, None, servicer=servicer)
+    listener = asyncio.create_task(manager.listen(CHANNELS))
+    await asyncio.sleep(0)
+    try:
+        return await measure(manager, master, args)
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+
+async def run_grpc(args):
+    servicer = ChatServiceServicer(CHANNELS_FILE, queue_limit=args.burst + 1)
+    server = grpc.aio.server()
+    chatservice_pb2_grpc.add_ChatServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    channel = grpc.aio.insecure_channel(f"127.0.0.1:{port}")
+    master = RecordingMaster()
+    manager = ChatManager(master, chatservice_pb2_grpc.ChatServiceStub(channel), batch_size=1)
+    listener = asyncio.create_task(manager.listen(CHANNELS))
+    while not len(servicer.hub):
+        await asyncio.sleep(0.01)  # until the listener's stream is open
+    try:
+        return await measure(manager, master, args)
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        await channel.close()
+        await server.stop(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000, help="lines sent one at a time")
+    parser.add_argument("--burst", type=int, default=10_000, help="lines sent back to back")
+    args = parser.parse_args()
+
+    print(f"{'transport':>10} {'p50 us':>9} {'p99 us':>9} {'cpu us/msg':>11}")
+    for name, run in (("local", run_local), ("grpc", run_grpc)):
+        p50, p99, cpu = asyncio.run(run(args))
+        print(f"{name:>10} {p50 * 1e6:>9.1f} {p99 * 1e6:>9.1f} {cpu * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Collider query cost: uniform-grid index vs a naive scan.
+
+Scatters `--colliders` oriented boxes (counts comma-separated) over a
+`--extent` square and times point queries, batched point queries (one NPC
+tick's worth, `--points`) and short segment sweeps.
+
+    python -m benchmarks.colliders --colliders 1000,10000,50000
+"""
+import argparse
+import math
+import random
+import time
+
+from colliders import ColliderGrid, oriented_box
+
+
+def scatter(count, extent, rng):
+    boxes = []
+    for _ in range(count):
+        half = math.radians(rng.uniform(0, 360)) / 2
+        boxes.append(oriented_box(
+            (rng.uniform(0, extent), rng.uniform(0, 5), rng.uniform(0, extent)),
+            (rng.uniform(1, 12), rng.uniform(2, 10), rng.uniform(1, 12)),
+            (0.0, math.sin(half), 0.0, math.cos(half)),
+        ))
+    return boxes
+
+
+def timed_us(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(*item)
+    return (time.perf_counter() - start) * 1e6 / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--colliders", default="1000,10000,50000", help="comma-separated collider counts")
+    parser.add_argument("--extent", type=float, default=2000.0, help="map side length (world units)")
+    parser.add_argument("--points", type=int, default=10000, help="points per batched query")
+    parser.add_argument("--cell-size", type=float, default=16.0)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    points = [(rng.uniform(0, args.extent), 1.0, rng.uniform(0, args.extent)) for _ in range(args.points)]
+    segments = [((x, y, z), (x + rng.uniform(-2, 2), y, z + rng.uniform(-2, 2))) for x, y, z in points]
+    xs, ys, zs = zip(*points)
+
+    print(f"{'colliders':>10} {'build ms':>9} {'scan us/pt':>11} {'grid us/pt':>11} "
+          f"{'batch ms':>9} {'sweep us':>9}")
+    for count in (int(n) for n in args.colliders.split(",")):
+        boxes = scatter(count, args.extent, rng)
+        start = time.perf_counter()
+        grid = ColliderGrid(boxes, args.cell_size)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        scan = timed_us(lambda x, y, z: any(b.contains(x, y, z) for b in boxes), points[:20])
+        point = timed_us(grid.contains, points)
+        start = time.perf_counter()
+        grid.contains_many(xs, ys, zs)
+        batch_ms = (time.perf_counter() - start) * 1000
+        sweep = timed_us(grid.segment_hit, segments)
+        print(f"{count:>10} {build_ms:>9.1f} {scan:>11.1f} {point:>11.2f} {batch_ms:>9.2f} {sweep:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare the dict NPC step with the NumPy structure-of-arrays step.
+
+Steps `--npcs` wandering NPCs (comma-separated counts) for `--ticks` ticks
+with each store and reports milliseconds per tick against the NPC tick
+budget (NPCService.tick, 250 ms).
+
+    python -m benchmarks.npc_sim --npcs 1000,10000
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+import npc_store
+from master_server import MasterServer
+
+TICK = 0.25
+
+
+def populate(npcs, server, count):
+    rng = random.Random(42)
+    wb = server.world_bounds
+    for i in range(count):
+        npcs[f"npc-{i:05d}"] = {
+            "name": f"NPC {i}", "type": "villager",
+            "x": rng.uniform(wb["min_x"], wb["max_x"]), "y": 0.0,
+            "z": rng.uniform(wb["min_z"], wb["max_z"]),
+            "yaw": rng.random() * 2 * math.pi, "speed": 1.5, "state": "idle",
+        }
+
+
+def run_store(server, vectorized, count, ticks):
+    npcs = npc_store.make_npc_store(vectorized)
+    populate(npcs, server, count)
+    npc_store.step_npcs(npcs, TICK, server)  # warm-up
+    start = time.perf_counter()
+    for _ in range(ticks):
+        npc_store.step_npcs(npcs, TICK, server)
+    return (time.perf_counter() - start) * 1000 / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--npcs", default="1000,10000", help="comma-separated NPC counts")
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    stores = [("dict", False)]
+    if npc_store.np is not None:
+        stores.append(("array", True))
+    else:
+        print("numpy not installed: array store skipped", file=sys.stderr)
+
+    server = MasterServer()
+    print(f"{'npcs':>8} {'store':<6} {'ms/tick':>10} {'% of budget':>12}")
+    for count in (int(n) for n in args.npcs.split(",")):
+        for label, vectorized in stores:
+            ms = run_store(server, vectorized, count, args.ticks)
+            print(f"{count:>8} {label:<6} {ms:>10.2f} {ms / (TICK * 1000):>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
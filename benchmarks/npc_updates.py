@@ -0,0 +1,106 @@
+"""Compare per-NPC NPC_UPDATE broadcasts with one NPC_BATCH_UPDATE per tick.
+
+Simulates `--npcs` wandering NPCs and `--players` connected clients for
+`--ticks` NPC ticks and reports bytes and writes per tick plus CPU
+milliseconds per tick for each mode, in the chosen wire `--encoding`.
+
+    python -m benchmarks.npc_updates --npcs 500 --players 200
+"""
+import argparse
+import asyncio
+import contextlib
+import math
+import os
+import random
+import time
+
+import wire
+from master_server import MasterServer
+
+
+class CountingWriter:
+    """Stand-in for asyncio.StreamWriter that counts bytes and write calls."""
+
+    def __init__(self):
+        self.bytes = 0
+        self.writes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        self.writes += 1
+
+    async def drain(self):
+        return
+
+
+def build_server(args, batching, quantum):
+    server = MasterServer(npc_batching=batching, npc_quantum=quantum)
+    rng = random.Random(42)
+    wb = server.world_bounds
+    writers = []
+    for i in range(args.players):
+        w = CountingWriter()
+        pid = f"player-{i:04d}"
+        server.sessions.join(w, pid, server.spawn_points[0], 0)
+        if args.encoding == wire.ENCODING_BINARY:
+            server.codecs[w] = wire.BinaryCodec(server.handles)
+        writers.append(w)
+    npcs = {
+        f"npc-{i:05d}": [rng.uniform(wb["min_x"], wb["max_x"]), 6.989525,
+                         rng.uniform(wb["min_z"], wb["max_z"]), rng.random() * 2 * math.pi]
+        for i in range(args.npcs)
+    }
+    return server, writers, npcs
+
+
+async def simulate(server, npcs, ticks):
+    rng = random.Random(1234)
+    step = 1.5 * 0.25
+    for _ in range(ticks):
+        moves = []
+        for npc_id, npc in npcs.items():
+            npc[3] += rng.uniform(-0.15, 0.15)
+            npc[0] += math.cos(npc[3]) * step
+            npc[2] += math.sin(npc[3]) * step
+            moves.append((npc_id, npc[0], npc[1], npc[2]))
+        await server.broadcast_npc_updates(moves)
+
+
+def run_mode(args, batching, quantum):
+    server, writers, npcs = build_server(args, batching, quantum)
+    # Untimed warm-up tick: binary clients learn every NPC handle here
+    asyncio.run(simulate(server, npcs, 1))
+    for w in writers:
+        w.bytes = w.writes = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        cpu_start = time.process_time()
+        asyncio.run(simulate(server, npcs, args.ticks))
+        cpu = time.process_time() - cpu_start
+    sent = sum(w.bytes for w in writers)
+    writes = sum(w.writes for w in writers)
+    return sent / args.ticks, writes / args.ticks, cpu * 1000 / args.ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--npcs", type=int, default=500)
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--encoding", choices=wire.ENCODINGS, default=wire.ENCODING_JSON)
+    parser.add_argument("--quantum", type=float, default=0.01, help="position step for the quantized mode")
+    args = parser.parse_args()
+
+    modes = [
+        ("per_npc", False, None),
+        ("batch", True, None),
+        (f"batch+q{args.quantum:g}", True, args.quantum),
+    ]
+    print(f"npcs={args.npcs} players={args.players} encoding={args.encoding}")
+    print(f"{'mode':<14} {'bytes/tick':>14} {'writes/tick':>12} {'cpu ms/tick':>12}")
+    for label, batching, quantum in modes:
+        bpt, wpt, cpt = run_mode(args, batching, quantum)
+        print(f"{label:<14} {bpt:>14,.0f} {wpt:>12,.0f} {cpt:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure cold import time of the server's packet and handler modules.
+
+Each target is imported in a fresh interpreter `--runs` times; the table
+shows the median wall time of the import alone (interpreter start-up is
+excluded). `packets+parse` also parses one packet of every registered type,
+which is when the lazy packet modules get loaded.
+
+    python -m benchmarks.startup --runs 15
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+TARGETS = {
+    "packets": "import packets",
+    "packets+parse": (
+        "import packets\n"
+        "from packets.registry import _modules\n"
+        "for pid in list(_modules): packets.packet_class(pid)"
+    ),
+    "dispatch": "import dispatch",
+    "handlers": "import handlers.player, handlers.chat, handlers.world",
+    "master_server": "import master_server",
+}
+
+TIMER = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "{code}\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def time_import(code, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", TIMER.format(code=code)],
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("targets", nargs="*", help=f"subset of: {', '.join(TARGETS)}")
+    args = parser.parse_args()
+    unknown = [t for t in args.targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+
+    print(f"{'target':<16} {'median ms':>10}")
+    for name in args.targets or TARGETS:
+        try:
+            seconds = time_import(TARGETS[name], args.runs)
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<16} {'failed':>10}  {e.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{name:<16} {seconds * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
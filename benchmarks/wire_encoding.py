@@ -0,0 +1,72 @@
+"""Compare JSON and binary wire encodings for position-heavy packets.
+
+Encodes and decodes a WORLD_UPDATE with `--players` entries plus a stream of
+PLAYER_MOVE packets, and reports bytes per packet and microseconds per
+encode/decode for each encoding; "binary+q" quantizes positions to
+`--precision` centimetres (MasterServer(position_precision=...)).
+
+    python -m benchmarks.wire_encoding --players 200 --precision 1
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+import wire
+from protocol import PacketType
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_binary(label, packet_id, data, repeat, quantizer=None):
+    handles = wire.HandleTable()
+    binary = wire.BinaryCodec(handles, quantizer)
+    binary.encode(packet_id, data)  # intern ids once, as a long-lived connection would
+    names = {h: handles.name(h) for h in binary.known}
+
+    payload, refs = wire.encode_payload(packet_id, data, handles, quantizer)
+    bin_bytes, bin_enc = timed(lambda: binary.encode(packet_id, data), repeat)
+    _, bin_dec = timed(lambda: wire.decode_payload(packet_id, payload, names, quantizer), repeat)
+    print(f"{label:<22} {'binary+q' if quantizer else 'binary':<9} {len(bin_bytes):>9} {bin_enc:>10.1f} {bin_dec:>10.1f}")
+
+
+def bench(label, packet_id, data, repeat, quantizer):
+    json_bytes, json_enc = timed(lambda: wire.JSON_CODEC.encode(packet_id, data), repeat)
+    _, json_dec = timed(lambda: json.loads(json_bytes.decode()), repeat)
+    print(f"{label:<22} {'json':<9} {len(json_bytes):>9} {json_enc:>10.1f} {json_dec:>10.1f}")
+    bench_binary("", packet_id, data, repeat)
+    if quantizer is not None:
+        bench_binary("", packet_id, data, repeat, quantizer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--precision", type=float, default=1.0, help="quantization step, centimetres")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    players = [
+        {"id": str(uuid.UUID(int=rng.getrandbits(128))), "x": rng.uniform(150, 250),
+         "y": 6.989525, "z": rng.uniform(500, 600)}
+        for _ in range(args.players)
+    ]
+    move = {"x": 208.6597, "y": 6.989525, "z": 545.12}
+    bounds = {"min_x": 150, "max_x": 250, "min_y": 0, "max_y": 50, "min_z": 500, "max_z": 600}
+    quantizer = wire.PositionQuantizer.for_bounds(bounds, args.precision)
+
+    print(f"{'packet':<22} {'enc':<9} {'bytes':>9} {'enc us':>10} {'dec us':>10}")
+    bench(f"WORLD_UPDATE x{args.players}", PacketType.WORLD_UPDATE, {"seq": 1, "players": players},
+          max(1, args.repeat // 20), quantizer)
+    bench("PLAYER_MOVE", PacketType.PLAYER_MOVE, move, args.repeat, None)
+
+
+if __name__ == "__main__":
+    main()
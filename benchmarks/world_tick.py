@@ -0,0 +1,115 @@
+"""Compare world broadcast cost in per_move, tick and tick+delta modes.
+
+Simulates `--players` connected clients, of which a `--moving` fraction send
+PLAYER_MOVE at `--move-hz`, for `--seconds` of simulated time, and reports
+bytes written and CPU seconds per simulated second for each broadcast mode.
+In tick+delta mode every client acks each snapshot it receives; with
+`--view-radius` a tick+delta+aoi row adds area-of-interest filtering.
+
+    python -m benchmarks.world_tick --players 200 --move-hz 10 --tick-rate 20
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import time
+
+from master_server import MasterServer
+from handlers import player as player_handlers
+from handlers import world as world_handlers
+
+
+class CountingWriter:
+    """Stand-in for asyncio.StreamWriter that only counts bytes."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+
+    async def drain(self):
+        return
+
+
+def build_server(mode, delta, players, tick_rate, view_radius=None):
+    server = MasterServer(tick_rate=tick_rate, broadcast_mode=mode, delta_compression=delta,
+                          view_radius=view_radius)
+    rng = random.Random(42)
+    wb = server.world_bounds
+    writers = []
+    for i in range(players):
+        w = CountingWriter()
+        pid = f"player-{i:04d}"
+        server.sessions.join(w, pid, (rng.uniform(wb["min_x"], wb["max_x"]), 6.989525,
+                                      rng.uniform(wb["min_z"], wb["max_z"])), 0)
+        server.dirty_players.add(pid)
+        writers.append(w)
+    return server, writers
+
+
+async def simulate(server, moving, move_hz, seconds):
+    rng = random.Random(1234)
+    players = server.sessions.players()
+    pids = [s.player_id for s in players[:max(1, int(len(players) * moving))]]
+    total_moves = int(len(pids) * move_hz * seconds)
+    moves_per_tick = total_moves / (seconds * server.tick_rate)
+    wb = server.world_bounds
+    pending = 0.0
+    for _ in range(int(seconds * server.tick_rate)):
+        pending += moves_per_tick
+        while pending >= 1:
+            pending -= 1
+            session = server.sessions.by_player(rng.choice(pids))
+            x, y, z = session.position
+            x = min(max(x + rng.uniform(-0.5, 0.5), wb["min_x"]), wb["max_x"])
+            z = min(max(z + rng.uniform(-0.5, 0.5), wb["min_z"]), wb["max_z"])
+            # Simulated time runs faster than the clock: give the move the
+            # elapsed time it has at move_hz so the speed check passes it
+            session.last_move_time = time.time() - 1.0 / move_hz
+            # The real move path: queued for the tick, or applied and broadcast
+            # at once in per_move mode
+            await player_handlers.handle_player_move(server, session.writer, {"data": {"x": x, "y": y, "z": z}})
+        await world_handlers.world_tick(server)
+        if server.delta_compression:
+            for w in server.sessions.writers():
+                await world_handlers.handle_world_ack(server, w, {"data": {"seq": server.world_history.seq}})
+
+
+def run_mode(mode, delta, view_radius, args):
+    server, writers = build_server(mode, delta, args.players, args.tick_rate, view_radius)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        cpu_start = time.process_time()
+        asyncio.run(simulate(server, args.moving, args.move_hz, args.seconds))
+        cpu = time.process_time() - cpu_start
+    sent = sum(w.bytes for w in writers)
+    return sent / args.seconds, cpu / args.seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--moving", type=float, default=0.1, help="fraction of players that move")
+    parser.add_argument("--move-hz", type=float, default=10.0)
+    parser.add_argument("--tick-rate", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--view-radius", type=float, default=None)
+    args = parser.parse_args()
+
+    modes = [
+        ("per_move", world_handlers.BROADCAST_PER_MOVE, False, None),
+        ("tick", world_handlers.BROADCAST_TICK, False, None),
+        ("tick+delta", world_handlers.BROADCAST_TICK, True, None),
+    ]
+    if args.view_radius:
+        modes.append(("tick+delta+aoi", world_handlers.BROADCAST_TICK, True, args.view_radius))
+    print(f"players={args.players} moving={args.moving} move_hz={args.move_hz} tick_rate={args.tick_rate}")
+    print(f"{'mode':<16} {'bytes/s':>14} {'cpu s/s':>10}")
+    for label, mode, delta, view_radius in modes:
+        bps, cps = run_mode(mode, delta, view_radius, args)
+        print(f"{label:<16} {bps:>14,.0f} {cps:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,38 @@ import asyncio
 import grpc
 import configparser
 import time
+from chat_hub import ChatHub, CLOSED, DEFAULT_QUEUE_LIMIT
+from chat_history import ChatHistory, HISTORY_SIZE
 from generated import chatservice_pb2, chatservice_pb2_grpc
+import log
+
+logger = log.get_logger(__name__)
+
+# ChatManager publishes chat lines in batches (SendMessages): a batch goes
+# out once it holds BATCH_SIZE lines or FLUSH_INTERVAL seconds after its
+# first line. At most MAX_PENDING lines wait; beyond that new lines are dropped.
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 0.05
+MAX_PENDING = 4096
+RPC_TIMEOUT = 5.0
+# A dropped gRPC chat stream is reopened after RESUBSCRIBE_DELAY seconds,
+# doubling on each failed attempt up to RESUBSCRIBE_MAX_DELAY.
+RESUBSCRIBE_DELAY = 0.5
+RESUBSCRIBE_MAX_DELAY = 30.0
 
 
 # ---------------------------
 # gRPC Chat Service (server-side)
 # ---------------------------
 class ChatServiceServicer(chatservice_pb2_grpc.ChatServiceServicer):
-    def __init__(self, channels_file="channels.ini"):
+    def __init__(self, channels_file="channels.ini", queue_limit=DEFAULT_QUEUE_LIMIT, history_size=HISTORY_SIZE,
+                 history_dir=None):
         self.channels = self.load_channels(channels_file)
-        self.subscribers = {}  # channel -> set of asyncio.Queue
-        print(f"[CHAT SERVER] Initialized with channels: {list(self.channels.keys())}")
+        # channel -> subscribers, one bounded inbox per stream
+        self.hub = ChatHub(queue_limit, channel_policies=self.load_overflow_policies(channels_file))
+        # Last lines per channel for reconnecting streams, optionally logged to history_dir
+        self.history = ChatHistory(history_size, history_dir)
+        logger.info("[CHAT SERVER] Initialized with channels: %s", list(self.channels.keys()))
 
     def load_channels(self, filename):
         config = configparser.ConfigParser()
@@ -22,46 +43,84 @@ class ChatServiceServicer(chatservice_pb2_grpc.ChatServiceServicer):
             return dict(config["channels"])
         else:
             return {}
-    async def StreamMessages(self, request, context):
-        """Client subscribes to channels, server streams back messages."""
-        queue = asyncio.Queue()
 
-        for channel in request.channels:
-            self.subscribers.setdefault(channel, set()).add(queue)
+    def load_overflow_policies(self, filename):
+        """[overflow] channel = policy, for subscribers whose queue is full (see chat_hub)."""
+        config = configparser.ConfigParser()
+        config.read(filename)
+        return dict(config["overflow"]) if "overflow" in config else {}
+
+    def metrics(self):
+        metrics = self.hub.metrics()
+        metrics["history"] = self.history.metrics()
+        return metrics
 
+    async def StreamMessages(self, request, context):
+        """Client subscribes to channels, server streams back messages.
+
+        With a sinceSeq / sinceTimestamp cursor the kept lines it missed come
+        first, from the history rings; live lines queue meanwhile.
+        """
+        subscriber = self.hub.subscribe(request.playerId, request.channels)
+        # Taken right after subscribing: every line is either in it or queued, never both
+        backlog = self.history.catch_up(request)
         try:
+            for msg in backlog:
+                yield msg
             while True:
-                msg = await queue.get()
+                msg = await subscriber.inbox.get()
+                if msg is CLOSED:  # dropped as a slow consumer
+                    return
                 yield msg
-        except asyncio.CancelledError:
-            for channel in request.channels:
-                self.subscribers[channel].discard(queue)
-            raise
+        finally:
+            # Any disconnect: cancel, error or the stream being closed
+            self.hub.unsubscribe(subscriber)
 
-    async def SendMessage(self, request, context):
-        """Broadcast message to all subscribers of a channel."""
+    def publish(self, request):
+        """Publish one chat line to its channel; returns an error string, or None."""
         if request.channel not in self.channels:
-            return chatservice_pb2.Ack(success=False, error="Unknown channel")
+            return "Unknown channel"
 
-        msg = chatservice_pb2.ChatMessage(
-            channel=request.channel,
-            playerId=request.playerId,
-            text=request.text,
-            timestamp=int(time.time())
-        )
-
-        for q in self.subscribers.get(request.channel, []):
-            await q.put(msg)
+        # Batched lines keep the time they were sent at, not flushed at;
+        # such a line is complete and goes out as is
+        msg = request
+        if not request.timestamp:
+            msg = chatservice_pb2.ChatMessage(
+                channel=request.channel,
+                playerId=request.playerId,
+                text=request.text,
+                timestamp=int(time.time())
+            )
+        self.history.record(msg)
+        self.hub.publish(request.channel, msg)
+        return None
 
+    async def SendMessage(self, request, context):
+        """Broadcast message to all subscribers of a channel."""
+        error = self.publish(request)
+        if error is not None:
+            return chatservice_pb2.Ack(success=False, error=error)
         return chatservice_pb2.Ack(success=True)
 
+    async def SendMessages(self, request, context):
+        """Broadcast a batch of messages, in order."""
+        accepted = rejected = 0
+        first_error = ""
+        for message in request.messages:
+            error = self.publish(message)
+            if error is None:
+                accepted += 1
+            else:
+                rejected += 1
+                first_error = first_error or error
+        return chatservice_pb2.BatchAck(accepted=accepted, rejected=rejected, error=first_error)
+
     async def CreateChannel(self, request, context):
         """Create a new chat channel dynamically."""
         if request.name in self.channels:
             return chatservice_pb2.Ack(success=False, error="Channel already exists")
 
         self.channels[request.name] = f"Created by {request.creatorId}"
-        self.subscribers[request.name] = set()
         return chatservice_pb2.Ack(success=True)
 
     async def SendWhisper(self, request, context):
@@ -73,57 +132,208 @@ class ChatServiceServicer(chatservice_pb2_grpc.ChatServiceServicer):
             timestamp=int(time.time())
         )
 
-        # Whispers go to a pseudo-channel just for that user
-        for q in self.subscribers.get(f"whisper:{request.toPlayerId}", []):
-            await q.put(msg)
+        # Whispers go to a pseudo-channel just for that user (and are not kept in history)
+        self.hub.publish(f"whisper:{request.toPlayerId}", msg)
 
         return chatservice_pb2.Ack(success=True)
 
 
-async def start_chat_server(port=6000):
-    """Start gRPC chat service."""
+async def start_chat_server(port=6000, servicer=None):
+    """Start gRPC chat service (for `servicer`, or a new ChatServiceServicer)."""
     server = grpc.aio.server()
-    chatservice_pb2_grpc.add_ChatServiceServicer_to_server(ChatServiceServicer(), server)
+    chatservice_pb2_grpc.add_ChatServiceServicer_to_server(servicer or ChatServiceServicer(), server)
     server.add_insecure_port(f"[::]:{port}")
     await server.start()
-    print(f"[CHAT] gRPC ChatService running on port {port}")
+    logger.info("[CHAT] gRPC ChatService running on port %s", port)
     await server.wait_for_termination()
 
 
 # ---------------------------
 # ChatManager (used by MasterServer)
 # ---------------------------
+class ChatSendStats:
+    def __init__(self):
+        self.queued = 0
+        self.sent = 0  # accepted by the chat service
+        self.rejected = 0  # refused by the chat service (e.g. unknown channel)
+        self.failed = 0  # lost to RPC errors or a missing connection
+        self.dropped = 0  # not queued because MAX_PENDING lines were waiting
+        self.batches = 0
+        self.resubscribes = 0  # listener streams reopened after a disconnect
+
+
 class ChatManager:
-    # Change __init__ to accept the stub directly
-    def __init__(self, master_server, chat_stub): 
+    """Chat client used by MasterServer.
+
+    Over gRPC, send_message only queues the line; a flusher task publishes
+    queued lines with one SendMessages RPC per batch, so chat handling never
+    waits on a gRPC round trip. Failures are counted in `stats` (see
+    metrics()).
+
+    When the ChatServiceServicer runs in this process, use_local(servicer)
+    skips gRPC altogether: lines are published straight into its hub and
+    listen() reads from a hub subscription, with no protobuf encoding and
+    no loopback socket. The servicer still serves gRPC for other processes.
+    """
+
+    def __init__(self, master_server, chat_stub, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_pending=MAX_PENDING, servicer=None):
         self.master = master_server
-        self.stub = chat_stub # Now self.stub is the one created by MasterServer
+        self.stub = chat_stub  # set by MasterServer.init_chat_stub
+        self.servicer = servicer  # in-process ChatServiceServicer, see use_local()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = []  # ChatMessages waiting for the next batch
+        self.stats = ChatSendStats()
+        self._full = asyncio.Event()  # set when a whole batch is waiting
+        self._draining = False  # flush(): send without waiting for a full batch
+        self._flusher = None
 
+    def use_local(self, servicer):
+        """Talk to an in-process ChatServiceServicer directly instead of over gRPC."""
+        self.servicer = servicer
 
     async def send_message(self, player_id, text, channel="global"):
-        """Send a chat message via gRPC."""
-        if self.stub is None:
-            print("[CHAT ERROR] ChatManager not connected yet")
-            return
-
+        """Queue a chat line for the next batch (published at once when local)."""
         msg = chatservice_pb2.ChatMessage(
             channel=channel,
             playerId=player_id,
             text=text,
             timestamp=int(time.time())
         )
-        ack = await self.stub.SendMessage(msg)
-        if not ack.success:
-            print(f"[CHAT ERROR] {ack.error}")
-        else:
-            print(f"[CHAT] Sent {player_id}@{channel}: {text}")
+        if self.servicer is not None:
+            self.stats.queued += 1
+            if self.servicer.publish(msg) is None:
+                self.stats.sent += 1
+            else:
+                self.stats.rejected += 1
+            return
+        if len(self.pending) >= self.max_pending:
+            self.stats.dropped += 1
+            return
+        self.pending.append(msg)
+        self.stats.queued += 1
+        if len(self.pending) >= self.batch_size:
+            self._full.set()
+        self._start_flusher()
+
+    def _start_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self.pending:
+            if len(self.pending) < self.batch_size and not self._draining:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            batch = self.pending[:self.batch_size]
+            del self.pending[:self.batch_size]
+            await self._send_batch(batch)
+
+    async def _send_batch(self, batch):
+        stats = self.stats
+        if self.stub is None:
+            stats.failed += len(batch)
+            logger.debug("[CHAT ERROR] ChatManager not connected yet, %s lines lost", len(batch))
+            return
+        stats.batches += 1
+        try:
+            ack = await self.stub.SendMessages(chatservice_pb2.ChatBatch(messages=batch), timeout=RPC_TIMEOUT)
+        except grpc.RpcError as e:
+            stats.failed += len(batch)
+            logger.debug("[CHAT ERROR] SendMessages failed: %s", e)
+            return
+        stats.sent += ack.accepted
+        stats.rejected += ack.rejected
+        if ack.rejected:
+            logger.debug("[CHAT ERROR] %s lines rejected: %s", ack.rejected, ack.error)
+
+    async def flush(self):
+        """Send everything queued now (e.g. at shutdown), in order."""
+        self._draining = True
+        self._full.set()
+        try:
+            while self.pending or (self._flusher is not None and not self._flusher.done()):
+                self._start_flusher()
+                await self._flusher
+        finally:
+            self._draining = False
+
+    def metrics(self):
+        stats = self.stats
+        return {
+            "queued": stats.queued,
+            "pending": len(self.pending),
+            "batches": stats.batches,
+            "sent": stats.sent,
+            "rejected": stats.rejected,
+            "failed": stats.failed,
+            "dropped": stats.dropped,
+            "resubscribes": stats.resubscribes,
+        }
 
     async def listen(self, channels):
-        """Listen to gRPC chat streams and forward them to MasterServer clients."""
+        """Listen to gRPC chat streams and forward them to MasterServer clients.
+
+        If the stream is dropped (a channel's overflow policy is "disconnect"
+        and the relay fell behind, or over gRPC the chat service went away),
+        it is reopened from the last line relayed, so the history rings fill
+        the gap. gRPC reconnects back off exponentially until a line arrives.
+        """
+        if self.servicer is not None:
+            await self._listen_local(channels)
+            return
         if self.stub is None:
-            print("[CHAT ERROR] ChatManager not connected yet")
+            logger.error("[CHAT ERROR] ChatManager not connected yet")
             return
 
-        request = chatservice_pb2.StreamRequest(playerId="server", channels=channels)
-        async for msg in self.stub.StreamMessages(request):
-            await self.master.broadcast_chat(msg)
+        # Live only at first; a stream dropped before its first line resumes
+        # from when listening started
+        cursor = {}
+        started = int(time.time())
+        delay = RESUBSCRIBE_DELAY
+        while True:
+            request = chatservice_pb2.StreamRequest(playerId="server", channels=channels, **cursor)
+            try:
+                async for msg in self.stub.StreamMessages(request):
+                    cursor = {"sinceSeq": msg.seq}
+                    delay = RESUBSCRIBE_DELAY
+                    await self.master.broadcast_chat(msg)
+                reason = "stream closed"
+            except grpc.aio.AioRpcError as e:
+                reason = e.code().name
+            cursor = cursor or {"sinceTimestamp": started}
+            self._resubscribing(reason, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RESUBSCRIBE_MAX_DELAY)
+
+    async def _listen_local(self, channels):
+        servicer = self.servicer
+        last_seq = servicer.history.seq
+        resumed = False
+        while True:
+            subscriber = servicer.hub.subscribe("server", channels)
+            # Lines published while we were disconnected
+            backlog = servicer.history.since(channels, seq=last_seq) if resumed else []
+            try:
+                for msg in backlog:
+                    last_seq = msg.seq
+                    await self.master.broadcast_chat(msg)
+                while True:
+                    msg = await subscriber.inbox.get()
+                    if msg is CLOSED:
+                        break
+                    last_seq = msg.seq
+                    await self.master.broadcast_chat(msg)
+            finally:
+                servicer.hub.unsubscribe(subscriber)
+            resumed = True
+            self._resubscribing("fell behind", 0)
+
+    def _resubscribing(self, reason, delay):
+        self.stats.resubscribes += 1
+        logger.warning("[CHAT] Chat listener disconnected (%s); resubscribing in %.1fs", reason, delay)
@@ -0,0 +1,173 @@
+# chat_history.py
+"""Recent chat lines per channel, for streams that reconnect.
+
+Every published line gets the next sequence number (ChatMessage.seq) and is
+kept in its channel's ring of the last `size` lines. A StreamRequest with a
+sinceSeq or sinceTimestamp cursor is first sent the matching lines from the
+rings, straight from memory and by the stream itself, then goes live; the
+hub's fan-out never sees catch-up traffic. A client that resumes from the
+last seq it saw gets exactly the lines it missed, so a reconnect costs one
+ring scan instead of the client re-asking with / commands.
+
+With `log_dir` set, lines are also appended to a segment log on disk:
+JSON lines in chat-<first seq>.log files, a new file every `segment_size`
+lines, keeping the newest `keep_segments`. On start the kept segments are
+replayed into the rings and the sequence continues from the last logged
+line, so cursors stay valid across a restart. record() only queues the line
+in memory; flush() serializes and writes the queue, and flush_loop() runs
+it in a worker thread every FLUSH_INTERVAL seconds, so the event loop never
+does file I/O. close() flushes what is left: call it on shutdown. A crash
+can lose up to FLUSH_INTERVAL of lines.
+"""
+import asyncio
+import collections
+import json
+import os
+import threading
+
+from generated import chatservice_pb2
+
+HISTORY_SIZE = 256  # lines kept per channel
+SEGMENT_SIZE = 10000  # lines per log segment
+KEEP_SEGMENTS = 8
+FLUSH_INTERVAL = 1.0  # seconds between segment log writes
+
+
+class HistoryStats:
+    def __init__(self):
+        self.recorded = 0
+        self.catch_ups = 0
+        self.replayed = 0  # lines sent to catching-up streams
+        self.restored = 0  # lines read back from the segment log
+
+
+class ChatHistory:
+    def __init__(self, size=HISTORY_SIZE, log_dir=None, segment_size=SEGMENT_SIZE, keep_segments=KEEP_SEGMENTS):
+        self.size = size
+        self.rings = {}  # channel -> deque of ChatMessage, oldest first
+        self.seq = 0  # last sequence number handed out
+        self.stats = HistoryStats()
+        self.log_dir = log_dir
+        self.segment_size = segment_size
+        self.keep_segments = keep_segments
+        self._log = None
+        self._logged = 0  # lines in the current segment
+        self._unwritten = collections.deque()  # recorded lines not yet in the log (thread-safe ends)
+        self._write_lock = threading.Lock()  # one flush() at a time
+        if log_dir is not None:
+            os.makedirs(log_dir, exist_ok=True)
+            self._restore()
+
+    def record(self, msg):
+        """Number msg, keep it in its channel's ring and log it; returns its seq."""
+        self.seq += 1
+        msg.seq = self.seq
+        self._keep(msg)
+        self.stats.recorded += 1
+        if self.log_dir is not None:
+            self._unwritten.append((msg.seq, msg.channel, msg.playerId, msg.text, msg.timestamp))
+        return self.seq
+
+    def _keep(self, msg):
+        ring = self.rings.get(msg.channel)
+        if ring is None:
+            ring = self.rings[msg.channel] = collections.deque(maxlen=self.size)
+        ring.append(msg)
+
+    def since(self, channels, seq=None, timestamp=None):
+        """Kept lines of channels after seq and/or at or after timestamp, in seq order."""
+        if seq is None and timestamp is None:
+            return []
+        lines = []
+        for channel in dict.fromkeys(channels):
+            for msg in reversed(self.rings.get(channel, ())):
+                if seq is not None and msg.seq <= seq:
+                    break  # the ring is in seq order
+                if timestamp is None or msg.timestamp >= timestamp:
+                    lines.append(msg)
+        lines.sort(key=lambda m: m.seq)
+        self.stats.catch_ups += 1
+        self.stats.replayed += len(lines)
+        return lines
+
+    def catch_up(self, request):
+        """since() for a StreamRequest's channels and cursor fields."""
+        return self.since(request.channels,
+                          request.sinceSeq if request.HasField("sinceSeq") else None,
+                          request.sinceTimestamp if request.HasField("sinceTimestamp") else None)
+
+    def metrics(self):
+        stats = self.stats
+        return {
+            "seq": self.seq,
+            "kept": sum(len(ring) for ring in self.rings.values()),
+            "recorded": stats.recorded,
+            "catch_ups": stats.catch_ups,
+            "replayed": stats.replayed,
+            "restored": stats.restored,
+        }
+
+    def flush(self):
+        """Write the recorded lines to the segment log (blocking; see flush_loop)."""
+        with self._write_lock:
+            unwritten = self._unwritten
+            while unwritten:
+                self._append(unwritten.popleft())
+            if self._log is not None:
+                self._log.flush()
+
+    async def flush_loop(self, interval=FLUSH_INTERVAL):
+        """Flush the segment log from a worker thread every interval seconds."""
+        if self.log_dir is None:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.flush)
+
+    def close(self):
+        """Flush the remaining lines and close the segment log."""
+        if self.log_dir is None:
+            return
+        self.flush()
+        with self._write_lock:
+            self._close_segment()
+
+    # --- segment log ---
+
+    def _segments(self):
+        names = [n for n in os.listdir(self.log_dir) if n.startswith("chat-") and n.endswith(".log")]
+        return [os.path.join(self.log_dir, n) for n in sorted(names)]
+
+    def _restore(self):
+        for path in self._segments():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn last line of a crashed run
+                    msg = chatservice_pb2.ChatMessage(**entry)
+                    self._keep(msg)
+                    self.seq = max(self.seq, msg.seq)
+                    self.stats.restored += 1
+
+    def _append(self, entry):
+        seq, channel, player_id, text, timestamp = entry
+        if self._log is None or self._logged >= self.segment_size:
+            self._roll(seq)
+        self._log.write(json.dumps({"seq": seq, "channel": channel, "playerId": player_id,
+                                    "text": text, "timestamp": timestamp}) + "\n")
+        self._logged += 1
+
+    def _close_segment(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _roll(self, first_seq):
+        self._close_segment()
+        path = os.path.join(self.log_dir, f"chat-{first_seq:012d}.log")
+        self._log = open(path, "a", encoding="utf-8")
+        self._logged = 0
+        for old in self._segments()[:-self.keep_segments]:
+            os.remove(old)
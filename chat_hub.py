@@ -0,0 +1,165 @@
+# chat_hub.py
+"""Chat fan-out shared by the gRPC chat servicers.
+
+Each StreamMessages call is one Subscriber with a single inbox queue; every
+channel it subscribed to publishes into that same inbox. The stream loop is
+then a plain `await subscriber.inbox.get()`: no per-channel queues to
+multiplex and no helper tasks to create or cancel per message, and a
+message published once to several of a subscriber's channels still
+arrives once per publish, in publish order.
+
+Streams register with subscribe() and must unsubscribe() in a `finally`
+block, so the subscriber is dropped however the stream ends (client
+cancel, server shutdown, an error, or the generator being closed).
+Channels with no subscribers left are dropped too, so per-player
+pseudo-channels such as "whisper:<id>" don't accumulate.
+
+Inboxes are bounded (`queue_limit`) and publishing never waits: a stalled
+stream cannot grow the process or hold up the sender. When an inbox is
+full, the policy of the channel being published to applies:
+
+drop_newest - the new message is not queued for that subscriber.
+drop_oldest - the oldest queued message is evicted to make room.
+disconnect  - the subscriber is dropped and its stream ends; the client
+              can reconnect.
+
+Every drop is counted per channel and per subscriber (ChatHub.metrics()).
+"""
+import asyncio
+
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_DISCONNECT)
+
+DEFAULT_QUEUE_LIMIT = 1024
+# Queued in place of a message to end a disconnected subscriber's stream
+CLOSED = None
+
+
+class Subscriber:
+    __slots__ = ("player_id", "channels", "inbox", "dropped", "closed")
+
+    def __init__(self, player_id, channels, queue_limit=DEFAULT_QUEUE_LIMIT):
+        self.player_id = player_id
+        self.channels = tuple(dict.fromkeys(channels))  # de-duplicated, in order
+        self.inbox = asyncio.Queue(queue_limit)
+        self.dropped = 0  # messages this subscriber lost to overflow
+        self.closed = False
+
+    def __repr__(self):
+        return f"Subscriber({self.player_id!r}, {list(self.channels)})"
+
+
+class ChatStats:
+    def __init__(self):
+        self.published = 0
+        self.delivered = 0
+        self.dropped = {}  # channel -> messages not delivered (drop_newest / disconnect)
+        self.evicted = {}  # channel -> queued messages evicted to make room (drop_oldest)
+        self.disconnects = 0
+        self.peak_depth = 0
+
+
+class ChatHub:
+    def __init__(self, queue_limit=DEFAULT_QUEUE_LIMIT, policy=OVERFLOW_DROP_OLDEST, channel_policies=None):
+        for p in [policy, *(channel_policies or {}).values()]:
+            if p not in OVERFLOW_POLICIES:
+                raise ValueError(f"unknown chat overflow policy {p!r}")
+        self.queue_limit = queue_limit
+        self.policy = policy
+        self.channel_policies = dict(channel_policies or {})  # channel -> policy
+        self.stats = ChatStats()
+        self.channels = {}  # channel -> set of Subscriber
+        self._by_player = {}  # player_id -> set of Subscriber
+
+    def __len__(self):
+        """Number of live subscribers."""
+        return sum(len(subs) for subs in self._by_player.values())
+
+    def subscribe(self, player_id, channels):
+        subscriber = Subscriber(player_id, channels, self.queue_limit)
+        for channel in subscriber.channels:
+            self.channels.setdefault(channel, set()).add(subscriber)
+        self._by_player.setdefault(player_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        for channel in subscriber.channels:
+            members = self.channels.get(channel)
+            if members is not None:
+                members.discard(subscriber)
+                if not members:
+                    del self.channels[channel]
+        mine = self._by_player.get(subscriber.player_id)
+        if mine is not None:
+            mine.discard(subscriber)
+            if not mine:
+                del self._by_player[subscriber.player_id]
+
+    def subscribers(self, channel):
+        return self.channels.get(channel, ())
+
+    def publish(self, channel, message):
+        """Queue message for every subscriber of channel; returns how many got it."""
+        return self._fan_out(channel, self.channels.get(channel, ()), message)
+
+    def send_to(self, player_id, message, channel="whisper"):
+        """Queue message on every stream player_id has open; returns how many got it."""
+        return self._fan_out(channel, self._by_player.get(player_id, ()), message)
+
+    def _fan_out(self, channel, subscribers, message):
+        stats = self.stats
+        stats.published += 1
+        policy = self.channel_policies.get(channel, self.policy)
+        delivered = 0
+        for subscriber in list(subscribers):
+            inbox = subscriber.inbox
+            if inbox.full():
+                if policy == OVERFLOW_DROP_NEWEST:
+                    self._count(stats.dropped, channel, subscriber)
+                    continue
+                if policy == OVERFLOW_DISCONNECT:
+                    self._count(stats.dropped, channel, subscriber)
+                    self.disconnect(subscriber)
+                    continue
+                inbox.get_nowait()
+                self._count(stats.evicted, channel, subscriber)
+            inbox.put_nowait(message)
+            delivered += 1
+            if inbox.qsize() > stats.peak_depth:
+                stats.peak_depth = inbox.qsize()
+        stats.delivered += delivered
+        return delivered
+
+    @staticmethod
+    def _count(counter, channel, subscriber):
+        counter[channel] = counter.get(channel, 0) + 1
+        subscriber.dropped += 1
+
+    def disconnect(self, subscriber):
+        """Drop a subscriber and end its stream (its queued messages are discarded)."""
+        if subscriber.closed:
+            return
+        subscriber.closed = True
+        self.stats.disconnects += 1
+        self.unsubscribe(subscriber)
+        inbox = subscriber.inbox
+        while not inbox.empty():
+            inbox.get_nowait()
+        inbox.put_nowait(CLOSED)
+
+    def metrics(self, top=10):
+        stats = self.stats
+        subscribers = [s for subs in self._by_player.values() for s in subs]
+        slowest = sorted(subscribers, key=lambda s: s.inbox.qsize(), reverse=True)[:top]
+        return {
+            "subscribers": len(subscribers),
+            "published": stats.published,
+            "delivered": stats.delivered,
+            "dropped": dict(stats.dropped),
+            "evicted": dict(stats.evicted),
+            "disconnects": stats.disconnects,
+            "peak_depth": stats.peak_depth,
+            "deepest": [(s.player_id, s.inbox.qsize(), s.dropped) for s in slowest],
+        }
@@ -2,72 +2,70 @@ import asyncio
 import grpc
 import time
 from concurrent import futures
-from generated import chatservice_pb2, chatservice_pb2_grpc
+from chat_hub import ChatHub, CLOSED
+from generated import chatservice_pb2 as chat_pb2, chatservice_pb2_grpc as chat_pb2_grpc
 
 
 class ChatService(chat_pb2_grpc.ChatServiceServicer):
     def __init__(self):
-        # channel_name -> set of (playerId, queue)
-        self.channels = {}
-        # Preload channels from config
-        for name in ["global", "trade", "guild"]:
-            self.channels[name] = {}
+        # Known channel names; subscribers live in the hub
+        self.channels = {"global", "trade", "guild"}
+        self.hub = ChatHub()
 
-    async def _broadcast(self, channel, message):
-        """Send a message to all subscribers of a channel."""
-        if channel not in self.channels:
-            return
-        for queue in self.channels[channel].values():
-            await queue.put(message)
+    def publish(self, request):
+        """Publish one chat line to its channel; returns an error string, or None."""
+        if request.channel not in self.channels:
+            return "Unknown channel"
+        msg = chat_pb2.ChatMessage(
+            channel=request.channel,
+            playerId=request.playerId,
+            text=request.text,
+            # Batched lines keep the time they were sent at, not flushed at
+            timestamp=request.timestamp or int(time.time())
+        )
+        self.hub.publish(request.channel, msg)
+        return None
 
     async def _deliver_whisper(self, toPlayerId, message):
-        """Deliver whisper to a specific player (search across channels)."""
-        found = False
-        for chan, subs in self.channels.items():
-            if toPlayerId in subs:
-                await subs[toPlayerId].put(message)
-                found = True
-        return found
+        """Deliver whisper to every stream the player has open."""
+        return self.hub.send_to(toPlayerId, message) > 0
 
     async def StreamMessages(self, request, context):
         """Client subscribes to channels and gets a stream of messages."""
-        queues = []
-        player_id = request.playerId
-
-        for channel in request.channels:
-            if channel not in self.channels:
-                self.channels[channel] = {}
-            queue = asyncio.Queue()
-            self.channels[channel][player_id] = queue
-            queues.append(queue)
-
+        self.channels.update(request.channels)
+        # One inbox for all of the stream's channels, so there is nothing to
+        # multiplex and no per-message tasks
+        subscriber = self.hub.subscribe(request.playerId, request.channels)
         try:
             while True:
-                # Wait for any message from any subscribed channel
-                done, _ = await asyncio.wait(
-                    [asyncio.create_task(q.get()) for q in queues],
-                    return_when=asyncio.FIRST_COMPLETED,
-                )
-                for task in done:
-                    msg = task.result()
-                    yield msg
+                msg = await subscriber.inbox.get()
+                if msg is CLOSED:  # dropped as a slow consumer
+                    return
+                yield msg
         finally:
-            # Clean up on disconnect
-            for channel in request.channels:
-                if player_id in self.channels[channel]:
-                    del self.channels[channel][player_id]
+            # Clean up on disconnect, however the stream ended
+            self.hub.unsubscribe(subscriber)
 
     async def SendMessage(self, request, context):
         """Broadcast a chat message to a channel."""
-        msg = chat_pb2.ChatMessage(
-            channel=request.channel,
-            playerId=request.playerId,
-            text=request.text,
-            timestamp=int(time.time())
-        )
-        await self._broadcast(request.channel, msg)
+        error = self.publish(request)
+        if error is not None:
+            return chat_pb2.Ack(success=False, error=error)
         return chat_pb2.Ack(success=True)
 
+    async def SendMessages(self, request, context):
+        """Broadcast a batch of chat messages, in order."""
+        accepted = rejected = 0
+        first_error = ""
+        for message in request.messages:
+            error = self.publish(message)
+            if error is None:
+                accepted += 1
+            else:
+                rejected += 1
+                first_error = first_error or error
+        return chat_pb2.BatchAck(accepted=accepted, rejected=rejected, error=first_error)
+
     async def SendWhisper(self, request, context):
         """Send a private message (whisper)."""
         msg = chat_pb2.ChatMessage(
@@ -85,7 +83,7 @@ class ChatService(chat_pb2_grpc.ChatServiceServicer):
         """Create a new channel."""
         if request.name in self.channels:
             return chat_pb2.Ack(success=False, error="Channel already exists")
-        self.channels[request.name] = {}
+        self.channels.add(request.name)
         return chat_pb2.Ack(success=True)
 
 
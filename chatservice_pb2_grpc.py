@@ -45,6 +45,11 @@ class ChatServiceStub(object):
                 request_serializer=chatservice__pb2.ChatMessage.SerializeToString,
                 response_deserializer=chatservice__pb2.Ack.FromString,
                 _registered_method=True)
+        self.SendMessages = channel.unary_unary(
+                '/chat.ChatService/SendMessages',
+                request_serializer=chatservice__pb2.ChatBatch.SerializeToString,
+                response_deserializer=chatservice__pb2.BatchAck.FromString,
+                _registered_method=True)
         self.CreateChannel = channel.unary_unary(
                 '/chat.ChatService/CreateChannel',
                 request_serializer=chatservice__pb2.CreateChannelRequest.SerializeToString,
@@ -75,6 +80,13 @@ class ChatServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SendMessages(self, request, context):
+        """Send a batch of messages, delivered in order
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CreateChannel(self, request, context):
         """Create a new channel
         """
@@ -102,6 +114,11 @@ def add_ChatServiceServicer_to_server(servicer, server):
                     request_deserializer=chatservice__pb2.ChatMessage.FromString,
                     response_serializer=chatservice__pb2.Ack.SerializeToString,
             ),
+            'SendMessages': grpc.unary_unary_rpc_method_handler(
+                    servicer.SendMessages,
+                    request_deserializer=chatservice__pb2.ChatBatch.FromString,
+                    response_serializer=chatservice__pb2.BatchAck.SerializeToString,
+            ),
             'CreateChannel': grpc.unary_unary_rpc_method_handler(
                     servicer.CreateChannel,
                     request_deserializer=chatservice__pb2.CreateChannelRequest.FromString,
@@ -178,6 +195,33 @@ class ChatService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def SendMessages(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/chat.ChatService/SendMessages',
+            chatservice__pb2.ChatBatch.SerializeToString,
+            chatservice__pb2.BatchAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def CreateChannel(request,
             target,
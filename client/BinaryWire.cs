@@ -0,0 +1,285 @@
+using System;
+using System.Collections.Generic;
+using UnityEngine;
+
+// Binary wire encoding, mirrors wire.py on the server.
+// Frame: varint(length) | varint(packet id) | payload.
+// Incoming frames are turned back into the JSON text HandlePacket already
+// understands, and outgoing PacketFactory JSON is converted to frames, so only
+// the transport changes for the rest of the client.
+public static class BinaryWire
+{
+    public const string Encoding = "binary";
+
+    [Serializable]
+    private class Header
+    {
+        public int id;
+    }
+
+    [Serializable]
+    private class NpcPositionData
+    {
+        public string npcId;
+        public float x;
+        public float y;
+        public float z;
+    }
+
+    [Serializable]
+    private class PositionData
+    {
+        public float x;
+        public float y;
+        public float z;
+    }
+
+    // Sent in PLAYER_ID_ASSIGNED when the server quantizes positions: snapshot
+    // positions are then ushort step counts from origin instead of floats.
+    [Serializable]
+    public class Quantization
+    {
+        public float[] origin;
+        public float step;
+    }
+
+    public static void WriteVarint(List<byte> buf, int value)
+    {
+        uint v = (uint)value;
+        while (v > 0x7F)
+        {
+            buf.Add((byte)((v & 0x7F) | 0x80));
+            v >>= 7;
+        }
+        buf.Add((byte)v);
+    }
+
+    // Returns false if the varint is not complete within [pos, end)
+    public static bool TryReadVarint(byte[] buf, ref int pos, int end, out int value)
+    {
+        value = 0;
+        int shift = 0;
+        int p = pos;
+        while (p < end)
+        {
+            byte b = buf[p++];
+            value |= (b & 0x7F) << shift;
+            if ((b & 0x80) == 0)
+            {
+                pos = p;
+                return true;
+            }
+            shift += 7;
+        }
+        return false;
+    }
+
+    private static int ReadZigzag(byte[] buf, ref int pos, int end)
+    {
+        TryReadVarint(buf, ref pos, end, out int v);
+        return (int)((uint)v >> 1) ^ -(v & 1);
+    }
+
+    private static void WriteFloat(List<byte> buf, float f)
+    {
+        byte[] bytes = BitConverter.GetBytes(f);
+        if (!BitConverter.IsLittleEndian)
+            Array.Reverse(bytes);
+        buf.AddRange(bytes);
+    }
+
+    private static ushort ReadUInt16(byte[] buf, ref int pos)
+    {
+        ushort v = (ushort)(buf[pos] | (buf[pos + 1] << 8));
+        pos += 2;
+        return v;
+    }
+
+    private static float ReadFloat(byte[] buf, ref int pos)
+    {
+        float f;
+        if (BitConverter.IsLittleEndian)
+        {
+            f = BitConverter.ToSingle(buf, pos);
+        }
+        else
+        {
+            byte[] bytes = new byte[4];
+            Array.Copy(buf, pos, bytes, 0, 4);
+            Array.Reverse(bytes);
+            f = BitConverter.ToSingle(bytes, 0);
+        }
+        pos += 4;
+        return f;
+    }
+
+    public static byte[] Frame(int id, List<byte> payload)
+    {
+        var body = new List<byte>(payload.Count + 2);
+        WriteVarint(body, id);
+        body.AddRange(payload);
+        var frame = new List<byte>(body.Count + 2);
+        WriteVarint(frame, body.Count);
+        frame.AddRange(body);
+        return frame.ToArray();
+    }
+
+    // Convert a PacketFactory JSON packet ({"id":N,"data":{...}}) into a binary frame
+    public static byte[] FromJson(string json)
+    {
+        json = json.Trim();
+        int id = JsonUtility.FromJson<Header>(json).id;
+        var payload = new List<byte>();
+        switch (id)
+        {
+            case Protocol.PLAYER_MOVE:
+                var move = JsonUtility.FromJson<Packet<MoveData>>(json).data;
+                WriteFloat(payload, move.x);
+                WriteFloat(payload, move.y);
+                WriteFloat(payload, move.z);
+                break;
+            case Protocol.WORLD_ACK:
+                WriteVarint(payload, JsonUtility.FromJson<Packet<WorldAckData>>(json).data.seq);
+                break;
+            default:
+                // No binary layout: the frame carries the JSON data object
+                int start = json.IndexOf("\"data\":", StringComparison.Ordinal) + 7;
+                int end = json.LastIndexOf('}');
+                string data = start >= 7 && end > start ? json.Substring(start, end - start) : "{}";
+                payload.AddRange(System.Text.Encoding.UTF8.GetBytes(data));
+                break;
+        }
+        return Frame(id, payload);
+    }
+
+    // Decodes incoming frames; keeps the handle -> id table announced via INTERN
+    public class Decoder
+    {
+        private readonly Dictionary<int, string> names = new Dictionary<int, string>();
+
+        // Set from PLAYER_ID_ASSIGNED; null while positions are float32
+        public Quantization Quantization;
+
+        private string Name(int handle)
+        {
+            return names.TryGetValue(handle, out var name) ? name : handle.ToString();
+        }
+
+        private void ReadPosition(byte[] buf, ref int pos, out float x, out float y, out float z)
+        {
+            if (Quantization == null)
+            {
+                x = ReadFloat(buf, ref pos);
+                y = ReadFloat(buf, ref pos);
+                z = ReadFloat(buf, ref pos);
+                return;
+            }
+            float step = Quantization.step;
+            x = Quantization.origin[0] + ReadUInt16(buf, ref pos) * step;
+            y = Quantization.origin[1] + ReadUInt16(buf, ref pos) * step;
+            z = Quantization.origin[2] + ReadUInt16(buf, ref pos) * step;
+        }
+
+        private PlayerState[] ReadPlayers(byte[] buf, ref int pos, int end)
+        {
+            TryReadVarint(buf, ref pos, end, out int count);
+            var players = new PlayerState[count];
+            for (int i = 0; i < count; i++)
+            {
+                TryReadVarint(buf, ref pos, end, out int handle);
+                ReadPosition(buf, ref pos, out float x, out float y, out float z);
+                players[i] = new PlayerState { id = Name(handle), x = x, y = y, z = z };
+            }
+            return players;
+        }
+
+        // Returns the equivalent JSON packet, or null for frames handled here (INTERN)
+        public string Decode(int id, byte[] buf, int pos, int end)
+        {
+            switch (id)
+            {
+                case Protocol.INTERN:
+                {
+                    TryReadVarint(buf, ref pos, end, out int handle);
+                    names[handle] = System.Text.Encoding.UTF8.GetString(buf, pos, end - pos);
+                    return null;
+                }
+                case Protocol.WORLD_UPDATE:
+                {
+                    var data = new WorldUpdateData();
+                    TryReadVarint(buf, ref pos, end, out data.seq);
+                    data.players = ReadPlayers(buf, ref pos, end);
+                    return JsonUtility.ToJson(new Packet<WorldUpdateData> { id = id, data = data });
+                }
+                case Protocol.WORLD_DELTA:
+                {
+                    var data = new WorldDeltaData();
+                    TryReadVarint(buf, ref pos, end, out data.seq);
+                    TryReadVarint(buf, ref pos, end, out data.baseline);
+                    data.players = ReadPlayers(buf, ref pos, end);
+                    TryReadVarint(buf, ref pos, end, out int removedCount);
+                    data.removed = new string[removedCount];
+                    for (int i = 0; i < removedCount; i++)
+                    {
+                        TryReadVarint(buf, ref pos, end, out int handle);
+                        data.removed[i] = Name(handle);
+                    }
+                    return JsonUtility.ToJson(new Packet<WorldDeltaData> { id = id, data = data });
+                }
+                case Protocol.NPC_UPDATE:
+                {
+                    TryReadVarint(buf, ref pos, end, out int handle);
+                    ReadPosition(buf, ref pos, out float x, out float y, out float z);
+                    var data = new NpcPositionData { npcId = Name(handle), x = x, y = y, z = z };
+                    return JsonUtility.ToJson(new Packet<NpcPositionData> { id = id, data = data });
+                }
+                case Protocol.NPC_BATCH_UPDATE:
+                {
+                    // varint(quantum in micrometres, 0 = positions) | varint(count) | count * (handle | x y z)
+                    TryReadVarint(buf, ref pos, end, out int quantumMicrometres);
+                    float q = quantumMicrometres / 1e6f;
+                    TryReadVarint(buf, ref pos, end, out int count);
+                    var data = new NpcBatchData { npcs = new NpcBatchEntry[count] };
+                    for (int i = 0; i < count; i++)
+                    {
+                        TryReadVarint(buf, ref pos, end, out int handle);
+                        var npc = new NpcBatchEntry { npcId = Name(handle) };
+                        if (quantumMicrometres > 0)
+                        {
+                            npc.x = ReadZigzag(buf, ref pos, end) * q;
+                            npc.y = ReadZigzag(buf, ref pos, end) * q;
+                            npc.z = ReadZigzag(buf, ref pos, end) * q;
+                        }
+                        else
+                        {
+                            ReadPosition(buf, ref pos, out npc.x, out npc.y, out npc.z);
+                        }
+                        data.npcs[i] = npc;
+                    }
+                    return JsonUtility.ToJson(new Packet<NpcBatchData> { id = id, data = data });
+                }
+                case Protocol.NPC_DESPAWN:
+                {
+                    TryReadVarint(buf, ref pos, end, out int handle);
+                    var data = new NpcPositionData { npcId = Name(handle) };
+                    return JsonUtility.ToJson(new Packet<NpcPositionData> { id = id, data = data });
+                }
+                case Protocol.PLAYER_CORRECTION:
+                {
+                    var data = new PositionData
+                    {
+                        x = ReadFloat(buf, ref pos),
+                        y = ReadFloat(buf, ref pos),
+                        z = ReadFloat(buf, ref pos)
+                    };
+                    return JsonUtility.ToJson(new Packet<PositionData> { id = id, data = data });
+                }
+                default:
+                {
+                    string data = end > pos ? System.Text.Encoding.UTF8.GetString(buf, pos, end - pos) : "{}";
+                    return "{\"id\":" + id + ",\"data\":" + data + "}";
+                }
+            }
+        }
+    }
+}
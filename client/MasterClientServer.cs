@@ -57,6 +57,13 @@ public class MasterServerClient : MonoBehaviour
     private TaskCompletionSource<string> handshakeTcs;
     private string serverSecret = "dev-secret-change-me";
 
+    // Request the binary wire encoding when the server offers it (see BinaryWire.cs)
+    public bool useBinaryProtocol = true;
+    private string[] offeredEncodings;
+    private volatile bool binaryMode = false; // reading: set on PLAYER_ID_ASSIGNED
+    private volatile bool sendBinary = false; // writing: set once ENCODING_SWITCH is sent
+    private readonly BinaryWire.Decoder binaryDecoder = new BinaryWire.Decoder();
+
 
     private async Task ConnectToServer()
     {
@@ -112,7 +119,16 @@ public class MasterServerClient : MonoBehaviour
         string msg = nonce + playerId + ts.ToString(); // preferredId is playerId
         string hmac = CryptoUtils.ComputeHmacHex(serverSecret, msg);
 
-        var joinData = new PlayerJoinData { preferredId = playerId, nickname = "", ts = ts, hmac = hmac };
+        bool wantBinary = useBinaryProtocol && offeredEncodings != null
+                          && Array.IndexOf(offeredEncodings, BinaryWire.Encoding) >= 0;
+        var joinData = new PlayerJoinData
+        {
+            preferredId = playerId,
+            nickname = "",
+            ts = ts,
+            hmac = hmac,
+            encoding = wantBinary ? BinaryWire.Encoding : "json"
+        };
         var joinPacket = PacketFactory.Build(Protocol.PLAYER_JOIN, joinData);
         await SendPacket(joinPacket);
     }
@@ -125,8 +141,9 @@ public class MasterServerClient : MonoBehaviour
 
     private async Task ListenForMessages(CancellationToken token)
     {
-        byte[] buffer = new byte[1024];
-        StringBuilder incoming = new StringBuilder();
+        byte[] buffer = new byte[4096];
+        byte[] pending = new byte[8192];
+        int pendingCount = 0;
 
         try
         {
@@ -139,20 +156,24 @@ public class MasterServerClient : MonoBehaviour
                     break;
                 }
 
-                string chunk = Encoding.UTF8.GetString(buffer, 0, bytesRead);
-                incoming.Append(chunk);
+                if (pendingCount + bytesRead > pending.Length)
+                    Array.Resize(ref pending, Math.Max(pending.Length * 2, pendingCount + bytesRead));
+                Buffer.BlockCopy(buffer, 0, pending, pendingCount, bytesRead);
+                pendingCount += bytesRead;
 
-                // Split by newline since our server sends \n per packet
-                while (true)
+                // JSON packets are newline-delimited, binary ones length-prefixed.
+                // The mode can flip mid-buffer right after PLAYER_ID_ASSIGNED.
+                int pos = 0;
+                while (pos < pendingCount)
                 {
-                    string current = incoming.ToString();
-                    int newlineIndex = current.IndexOf('\n');
-                    if (newlineIndex == -1) break;
-
-                    string completePacket = current[..newlineIndex];
-                    incoming.Remove(0, newlineIndex + 1);
-                    HandlePacket(completePacket);
+                    int used = binaryMode
+                        ? ConsumeFrame(pending, pos, pendingCount)
+                        : ConsumeLine(pending, pos, pendingCount);
+                    if (used == 0) break;
+                    pos += used;
                 }
+                Buffer.BlockCopy(pending, pos, pending, 0, pendingCount - pos);
+                pendingCount -= pos;
             }
         }
         catch (OperationCanceledException)
@@ -165,6 +186,64 @@ public class MasterServerClient : MonoBehaviour
         }
     }
 
+    // Returns bytes consumed, 0 if no complete line is buffered yet
+    private int ConsumeLine(byte[] buf, int pos, int end)
+    {
+        int newlineIndex = Array.IndexOf(buf, (byte)'\n', pos, end - pos);
+        if (newlineIndex == -1) return 0;
+
+        string completePacket = Encoding.UTF8.GetString(buf, pos, newlineIndex - pos);
+        if (completePacket.Length > 0)
+        {
+            CheckEncodingSwitch(completePacket);
+            HandlePacket(completePacket);
+        }
+        return newlineIndex - pos + 1;
+    }
+
+    // Returns bytes consumed, 0 if no complete frame is buffered yet
+    private int ConsumeFrame(byte[] buf, int pos, int end)
+    {
+        int p = pos;
+        if (!BinaryWire.TryReadVarint(buf, ref p, end, out int length)) return 0;
+        if (end - p < length) return 0;
+
+        int frameEnd = p + length;
+        BinaryWire.TryReadVarint(buf, ref p, frameEnd, out int id);
+        string json = binaryDecoder.Decode(id, buf, p, frameEnd);
+        if (json != null)
+            HandlePacket(json);
+        return frameEnd - pos;
+    }
+
+    // The server switches encodings right after PLAYER_ID_ASSIGNED; so must we,
+    // before reading anything that follows it. It reads ours as JSON until
+    // our ENCODING_SWITCH.
+    private void CheckEncodingSwitch(string json)
+    {
+        if (!useBinaryProtocol || binaryMode) return;
+        if (JsonUtility.FromJson<PacketWrapper>(json).id != Protocol.PLAYER_ID_ASSIGNED) return;
+
+        var idPacket = JsonUtility.FromJson<Packet<PlayerIdData>>(json);
+        if (idPacket?.data != null && idPacket.data.encoding == BinaryWire.Encoding)
+        {
+            binaryMode = true;
+            var quantization = idPacket.data.quantization;
+            // JsonUtility leaves a missing object default-constructed rather than null
+            binaryDecoder.Quantization = quantization != null && quantization.step > 0 ? quantization : null;
+            // Our own packets switch after ENCODING_SWITCH, on the main thread
+            // like every other send, so nothing in flight changes encoding
+            QueueMainThreadAction(() =>
+            {
+                var switchPacket = PacketFactory.Build(Protocol.ENCODING_SWITCH,
+                                                       new EncodingSwitchData { encoding = BinaryWire.Encoding });
+                _ = SendPacket(switchPacket); // encoded as JSON before sendBinary flips
+                sendBinary = true;
+            });
+            Debug.Log("[CLIENT] Switched to binary wire encoding.");
+        }
+    }
+
     private void HandlePacket(string json)
     {
         try
@@ -186,6 +265,7 @@ public class MasterServerClient : MonoBehaviour
                             var hand = JsonUtility.FromJson<Packet<HandshakeData>>(json);
                             if (hand != null && hand.data != null && handshakeTcs != null)
                             {
+                                offeredEncodings = hand.data.encodings;
                                 handshakeTcs.TrySetResult(hand.data.nonce);
                                 Debug.Log("[CLIENT] Received handshake nonce from server.");
                             }
@@ -225,9 +305,15 @@ public class MasterServerClient : MonoBehaviour
                 case Protocol.WORLD_UPDATE:
                     try
                     {
-                        var worldPacket = JsonUtility.FromJson<Packet<WorldState>>(json);
+                        var worldPacket = JsonUtility.FromJson<Packet<WorldUpdateData>>(json);
                         if (worldPacket != null && worldPacket.data != null)
                         {
+                            // seq is only set when the server runs delta compression
+                            if (worldPacket.data.seq > 0)
+                            {
+                                worldSnapshots.ApplyFull(worldPacket.data);
+                                AckWorldSnapshot(worldPacket.data.seq);
+                            }
                             // Queue the update operation for the main thread
                             QueueMainThreadAction(() => UpdateOtherPlayers(worldPacket.data.players));
                         }
@@ -242,6 +328,33 @@ public class MasterServerClient : MonoBehaviour
                     }
                     break;
 
+                case Protocol.WORLD_DELTA:
+                    try
+                    {
+                        var deltaPacket = JsonUtility.FromJson<Packet<WorldDeltaData>>(json);
+                        if (deltaPacket != null && deltaPacket.data != null)
+                        {
+                            var players = worldSnapshots.ApplyDelta(deltaPacket.data);
+                            if (players == null)
+                            {
+                                // Unknown baseline: don't ack, the server will send a keyframe
+                                Debug.LogWarning($"[CLIENT] WORLD_DELTA baseline {deltaPacket.data.baseline} unknown, waiting for keyframe");
+                                break;
+                            }
+                            AckWorldSnapshot(deltaPacket.data.seq);
+                            QueueMainThreadAction(() => UpdateOtherPlayers(players));
+                        }
+                        else
+                        {
+                            Debug.LogError("[CLIENT] WORLD_DELTA parsed as null!");
+                        }
+                    }
+                    catch (Exception e)
+                    {
+                        Debug.LogError("[CLIENT] Failed to parse WORLD_DELTA: " + e.Message);
+                    }
+                    break;
+
                 default:
                     Debug.Log($"[CLIENT] Unknown packet ID: {basePacket.id}");
                     break;
@@ -261,6 +374,11 @@ public class MasterServerClient : MonoBehaviour
                                 return; // ignore our own echo
 
                             var console = FindObjectOfType<SimpleChatConsole>();
+                            // Membership changes take effect only once the server confirms them
+                            if (!string.IsNullOrEmpty(chatPacket.data.joined))
+                                console?.OnChannelJoined(chatPacket.data.joined);
+                            if (!string.IsNullOrEmpty(chatPacket.data.left))
+                                console?.OnChannelLeft(chatPacket.data.left);
                             console?.AppendChat($"[{channel}] {from}: {text}");
                         }
                     });
@@ -337,6 +455,22 @@ public class MasterServerClient : MonoBehaviour
                     });
                     break;
 
+                case Protocol.NPC_BATCH_UPDATE:
+                    QueueMainThreadAction(() =>
+                    {
+                        var batchPacket = JsonUtility.FromJson<Packet<NpcBatchData>>(json);
+                        if (batchPacket == null || batchPacket.data == null || batchPacket.data.npcs == null)
+                            return;
+
+                        batchPacket.data.Dequantize();
+                        foreach (var entry in batchPacket.data.npcs)
+                        {
+                            if (npcs.TryGetValue(entry.npcId, out GameObject npc))
+                                npc.transform.position = new Vector3(entry.x, entry.y, entry.z);
+                        }
+                    });
+                    break;
+
                 case Protocol.NPC_DESPAWN:
                     QueueMainThreadAction(() =>
                     {
@@ -378,7 +512,9 @@ public class MasterServerClient : MonoBehaviour
 
         try
         {
-            byte[] data = Encoding.UTF8.GetBytes(packet + "\n");
+            byte[] data = sendBinary
+                ? BinaryWire.FromJson(packet)
+                : Encoding.UTF8.GetBytes(packet + "\n");
             await stream.WriteAsync(data, 0, data.Length);
             // Debug.Log($"[CLIENT] Sent: {packet.Trim()}"); // Too noisy, commenting out
         }
@@ -406,6 +542,15 @@ public class MasterServerClient : MonoBehaviour
     }
 
     // --- Helpers for WORLD_UPDATE ---
+    private readonly WorldSnapshotBuffer worldSnapshots = new WorldSnapshotBuffer();
+
+    private void AckWorldSnapshot(int seq)
+    {
+        // Sends happen on the main thread so they never interleave with movement packets
+        var ackPacket = PacketFactory.Build(Protocol.WORLD_ACK, new WorldAckData { seq = seq });
+        QueueMainThreadAction(() => _ = SendPacket(ackPacket));
+    }
+
     private void UpdateOtherPlayers(PlayerState[] players)
     {
         if (!playerIdConfirmed)
@@ -511,21 +656,7 @@ public static class CryptoUtils
 }
 
 // --- Data Structures ---
-[System.Serializable]
-    public class PlayerState
-    {
-        public string id;
-        public float x;
-        public float y;
-        public float z;
-    }
-
-    [System.Serializable]
-    public class WorldState
-    {
-        public PlayerState[] players;
-    }
-
+// PlayerState / WorldUpdateData / WorldDeltaData live in WorldUpdateData.cs
     [System.Serializable]
     public class Packet<T>
     {
@@ -545,6 +676,12 @@ public static class CryptoUtils
         public string msg;
     }
 
+    [System.Serializable]
+    public class EncodingSwitchData
+    {
+        public string encoding;
+    }
+
     [System.Serializable]
     public class PlayerJoinData
     {
@@ -552,12 +689,14 @@ public static class CryptoUtils
         public string nickname; // NEW
         public int ts;
         public string hmac; // hex string
+        public string encoding; // "json" or "binary", picked from HandshakeData.encodings
     }
 
     [System.Serializable]
     public class HandshakeData
     {
         public string nonce;
+        public string[] encodings;
     }
 
     [System.Serializable]
@@ -565,6 +704,8 @@ public static class CryptoUtils
     {
         public string assignedId;
         public int spawnIndex;
+        public string encoding;
+        public BinaryWire.Quantization quantization; // binary only, when the server quantizes positions
     }
     private Dictionary<string, GameObject> npcs = new Dictionary<string, GameObject>();
     public GameObject npcPrefab;
@@ -577,6 +718,8 @@ public static class CryptoUtils
         public string nickname;   // add this
         public string text;
         public int timestamp;
+        public string joined; // system notices: channel a /join was accepted for
+        public string left;   // system notices: channel a /leave was accepted for
     }
     [System.Serializable]
     public class CorrectionData
@@ -0,0 +1,32 @@
+using System;
+
+// NPC_BATCH_UPDATE: every NPC move of one server NPC tick. When q > 0 the
+// coordinates are integer multiples of q; call Dequantize before use.
+[Serializable]
+public class NpcBatchEntry
+{
+    public string npcId;
+    public float x;
+    public float y;
+    public float z;
+}
+
+[Serializable]
+public class NpcBatchData
+{
+    public float q;
+    public NpcBatchEntry[] npcs;
+
+    public void Dequantize()
+    {
+        if (q <= 0 || npcs == null)
+            return;
+        foreach (var npc in npcs)
+        {
+            npc.x *= q;
+            npc.y *= q;
+            npc.z *= q;
+        }
+        q = 0;
+    }
+}
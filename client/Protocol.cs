@@ -12,5 +12,10 @@ public static class Protocol
     public const int NPC_SPAWN = 10;
     public const int NPC_UPDATE = 11;
     public const int NPC_DESPAWN = 12;
+    public const int WORLD_DELTA = 13;
+    public const int WORLD_ACK = 14;
+    public const int INTERN = 15; // binary encoding only: handle -> id mapping
+    public const int NPC_BATCH_UPDATE = 16; // all NPC moves of one server tick
+    public const int ENCODING_SWITCH = 17; // last JSON packet we send before switching encodings
     public const int HANDSHAKE_CHALLENGE = 100;
 }
@@ -27,6 +27,9 @@ public class SimpleChatConsole : MonoBehaviour
     private int maxLines = 200;
     private string logFilePath;
 
+    // Channel plain chat lines go to; follows the last /join the server confirmed
+    private string currentChannel = "global";
+
     // --- Tab Management ---
     private Button chatTabButton;
     private Button debugTabButton;
@@ -371,7 +374,7 @@ public class SimpleChatConsole : MonoBehaviour
             {
                 var chatData = new ChatSendData
                 {
-                    channel = "global",
+                    channel = currentChannel,
                     text = text
                 };
                 string chatPacket = PacketFactory.Build(Protocol.CHAT, chatData);
@@ -387,6 +390,19 @@ public class SimpleChatConsole : MonoBehaviour
         }
     }
 
+    // Called when the server confirms a /join: talk in that channel from now on
+    public void OnChannelJoined(string channel)
+    {
+        currentChannel = channel;
+    }
+
+    // Called when the server confirms a /leave; leaving the current channel goes back to global
+    public void OnChannelLeft(string channel)
+    {
+        if (channel == currentChannel)
+            currentChannel = "global";
+    }
+
     // ------------------------------------------------------------------------------------------------
     //                                         DATA STRUCTURES
     // ------------------------------------------------------------------------------------------------
@@ -1,4 +1,5 @@
 using System;
+using System.Collections.Generic;
 
 [Serializable]
 public class PlayerState
@@ -12,5 +13,71 @@ public class PlayerState
 [Serializable]
 public class WorldUpdateData
 {
+    public int seq; // snapshot sequence number (0 when delta compression is off)
     public PlayerState[] players;
 }
+
+// WORLD_DELTA: changes since the snapshot `baseline` this client acknowledged
+[Serializable]
+public class WorldDeltaData
+{
+    public int seq;
+    public int baseline;
+    public PlayerState[] players; // added or changed since baseline
+    public string[] removed;      // ids gone since baseline
+}
+
+// WORLD_ACK (client -> server)
+[Serializable]
+public class WorldAckData
+{
+    public int seq;
+}
+
+// Keeps recent snapshots so a WORLD_DELTA can be applied against whichever
+// baseline the server picked (the last one we acked when it built the packet).
+public class WorldSnapshotBuffer
+{
+    private const int MaxSnapshots = 64; // server keeps 32 baselines
+    private readonly Dictionary<int, Dictionary<string, PlayerState>> snapshots =
+        new Dictionary<int, Dictionary<string, PlayerState>>();
+
+    public PlayerState[] ApplyFull(WorldUpdateData full)
+    {
+        var snap = new Dictionary<string, PlayerState>();
+        foreach (var p in full.players)
+            snap[p.id] = p;
+        Store(full.seq, snap, full.seq - MaxSnapshots);
+        return full.players;
+    }
+
+    // Returns null when the baseline is unknown; the server falls back to a keyframe.
+    public PlayerState[] ApplyDelta(WorldDeltaData delta)
+    {
+        if (!snapshots.TryGetValue(delta.baseline, out var baseline))
+            return null;
+
+        var snap = new Dictionary<string, PlayerState>(baseline);
+        if (delta.players != null)
+            foreach (var p in delta.players)
+                snap[p.id] = p;
+        if (delta.removed != null)
+            foreach (var id in delta.removed)
+                snap.Remove(id);
+
+        // The server never diffs against a baseline older than one it already used
+        Store(delta.seq, snap, Math.Max(delta.baseline, delta.seq - MaxSnapshots));
+        return new List<PlayerState>(snap.Values).ToArray();
+    }
+
+    private void Store(int seq, Dictionary<string, PlayerState> snap, int oldest)
+    {
+        snapshots[seq] = snap;
+        var stale = new List<int>();
+        foreach (var s in snapshots.Keys)
+            if (s < oldest)
+                stale.Add(s);
+        foreach (var s in stale)
+            snapshots.Remove(s);
+    }
+}
@@ -0,0 +1,246 @@
+# colliders.py
+"""Static scene colliders for move validation and the NPC step.
+
+Colliders are boxes exported from the Unity scene: axis-aligned boxes
+(`aabb(min, max)`) or oriented boxes (`oriented_box(center, size,
+rotation)`, rotation as a Unity quaternion x, y, z, w). A ColliderGrid
+buckets them by their world-space footprint into square (x, z) cells, like
+interest.InterestGrid, so a query only tests the few boxes sharing its
+cell:
+
+- contains(x, y, z): is the point inside any box;
+- segment_hit(p0, p1): fraction along p0 -> p1 where it first enters a box
+  (cells are walked in order along the segment, stopping at the first hit);
+- contains_many(xs, ys, zs): contains() for many points, vectorized through
+  NumPy (when installed) over a flattened copy of the grid.
+
+load_colliders(path) reads a JSON export:
+
+    {"cell_size": 16, "colliders": [
+        {"min": [0, 0, 0], "max": [4, 3, 4]},
+        {"center": [10, 1.5, 2], "size": [4, 3, 6], "rotation": [0, 0.38, 0, 0.92]}]}
+"""
+import json
+import math
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+DEFAULT_CELL_SIZE = 16.0
+IDENTITY_AXES = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+
+
+class Box:
+    """Box collider; `axes` are its local x/y/z axes in world space (None when axis-aligned)."""
+
+    __slots__ = ("center", "half", "axes", "min", "max")
+
+    def __init__(self, center, half, axes=None):
+        self.center = tuple(float(v) for v in center)
+        self.half = tuple(abs(float(v)) for v in half)
+        self.axes = axes
+        # World-space bounds, used to place the box in the grid
+        if axes is None:
+            extent = self.half
+        else:
+            extent = tuple(sum(abs(axes[j][i]) * self.half[j] for j in range(3)) for i in range(3))
+        self.min = tuple(c - e for c, e in zip(self.center, extent))
+        self.max = tuple(c + e for c, e in zip(self.center, extent))
+
+    def __repr__(self):
+        return f"Box(center={self.center}, half={self.half}, oriented={self.axes is not None})"
+
+    def _local(self, x, y, z):
+        dx, dy, dz = x - self.center[0], y - self.center[1], z - self.center[2]
+        if self.axes is None:
+            return dx, dy, dz
+        (ax, ay, az), (bx, by, bz), (cx, cy, cz) = self.axes
+        return ax * dx + ay * dy + az * dz, bx * dx + by * dy + bz * dz, cx * dx + cy * dy + cz * dz
+
+    def contains(self, x, y, z):
+        lx, ly, lz = self._local(x, y, z)
+        hx, hy, hz = self.half
+        return -hx <= lx <= hx and -hy <= ly <= hy and -hz <= lz <= hz
+
+    def segment_entry(self, p0, p1):
+        """Smallest t in [0, 1] with p0 + t*(p1 - p0) inside the box, or None (slab test)."""
+        start = self._local(*p0)
+        end = self._local(*p1)
+        t_in, t_out = 0.0, 1.0
+        for s, e, h in zip(start, end, self.half):
+            d = e - s
+            if d == 0.0:
+                if s < -h or s > h:
+                    return None
+                continue
+            t0, t1 = (-h - s) / d, (h - s) / d
+            if t0 > t1:
+                t0, t1 = t1, t0
+            t_in, t_out = max(t_in, t0), min(t_out, t1)
+            if t_in > t_out:
+                return None
+        return t_in
+
+
+def aabb(min_corner, max_corner):
+    center = [(a + b) / 2 for a, b in zip(min_corner, max_corner)]
+    half = [(b - a) / 2 for a, b in zip(min_corner, max_corner)]
+    return Box(center, half)
+
+
+def oriented_box(center, size, rotation=None):
+    """Box of `size` centred on `center`, rotated by quaternion (x, y, z, w)."""
+    half = [s / 2 for s in size]
+    if rotation is None:
+        return Box(center, half)
+    x, y, z, w = rotation
+    n = math.sqrt(x * x + y * y + z * z + w * w)
+    x, y, z, w = x / n, y / n, z / n, w / n
+    # Columns of the rotation matrix: the box's local axes in world space
+    axes = (
+        (1 - 2 * (y * y + z * z), 2 * (x * y + w * z), 2 * (x * z - w * y)),
+        (2 * (x * y - w * z), 1 - 2 * (x * x + z * z), 2 * (y * z + w * x)),
+        (2 * (x * z + w * y), 2 * (y * z - w * x), 1 - 2 * (x * x + y * y)),
+    )
+    return Box(center, half, axes)
+
+
+class ColliderGrid:
+    def __init__(self, boxes, cell_size=DEFAULT_CELL_SIZE):
+        self.boxes = list(boxes)
+        self.cell_size = float(cell_size)
+        self._cells = {}  # (col, row) -> list of box indices
+        if self.boxes:
+            self.min_x = min(b.min[0] for b in self.boxes)
+            self.min_z = min(b.min[2] for b in self.boxes)
+            max_x = max(b.max[0] for b in self.boxes)
+            max_z = max(b.max[2] for b in self.boxes)
+        else:
+            self.min_x = self.min_z = max_x = max_z = 0.0
+        self.cols = max(1, math.floor((max_x - self.min_x) / self.cell_size) + 1)
+        self.rows = max(1, math.floor((max_z - self.min_z) / self.cell_size) + 1)
+        for i, box in enumerate(self.boxes):
+            c0, r0 = self._cell_of(box.min[0], box.min[2])
+            c1, r1 = self._cell_of(box.max[0], box.max[2])
+            for col in range(c0, c1 + 1):
+                for row in range(r0, r1 + 1):
+                    self._cells.setdefault((col, row), []).append(i)
+        self._arrays = self._build_arrays() if np is not None else None
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _cell_of(self, x, z):
+        return (math.floor((x - self.min_x) / self.cell_size),
+                math.floor((z - self.min_z) / self.cell_size))
+
+    def contains(self, x, y, z):
+        for i in self._cells.get(self._cell_of(x, z), ()):
+            if self.boxes[i].contains(x, y, z):
+                return True
+        return False
+
+    def segment_hit(self, p0, p1):
+        """Fraction t in [0, 1] where p0 -> p1 first enters a collider, or None."""
+        best = None
+        tested = set()
+        for t_exit, cell in self._walk(p0, p1):
+            for i in self._cells.get(cell, ()):
+                if i in tested:
+                    continue
+                tested.add(i)
+                t = self.boxes[i].segment_entry(p0, p1)
+                if t is not None and (best is None or t < best):
+                    best = t
+            # Later cells only hold boxes entered after this cell is left
+            if best is not None and best <= t_exit:
+                break
+        return best
+
+    def _walk(self, p0, p1):
+        """Yield (t_exit, cell) for every grid cell the segment crosses in (x, z), in order."""
+        x0, z0 = (p0[0] - self.min_x) / self.cell_size, (p0[2] - self.min_z) / self.cell_size
+        x1, z1 = (p1[0] - self.min_x) / self.cell_size, (p1[2] - self.min_z) / self.cell_size
+        col, row = math.floor(x0), math.floor(z0)
+        end_col, end_row = math.floor(x1), math.floor(z1)
+        dx, dz = x1 - x0, z1 - z0
+        step_c = 1 if dx > 0 else -1
+        step_r = 1 if dz > 0 else -1
+        # t at which the segment crosses the next column / row boundary
+        next_c = ((col + (step_c > 0)) - x0) / dx if dx else math.inf
+        next_r = ((row + (step_r > 0)) - z0) / dz if dz else math.inf
+        delta_c = abs(1 / dx) if dx else math.inf
+        delta_r = abs(1 / dz) if dz else math.inf
+        while True:
+            t_exit = min(next_c, next_r, 1.0)
+            yield t_exit, (col, row)
+            if (col, row) == (end_col, end_row) or t_exit >= 1.0:
+                return
+            if next_c < next_r:
+                col += step_c
+                next_c += delta_c
+            else:
+                row += step_r
+                next_r += delta_r
+
+    def _build_arrays(self):
+        """Flattened grid (CSR layout) and box parameters for contains_many."""
+        n_cells = self.cols * self.rows
+        counts = np.zeros(n_cells + 1, dtype=np.intp)
+        items = []
+        for key in range(n_cells):
+            row, col = divmod(key, self.cols)
+            cell = self._cells.get((col, row), ())
+            counts[key + 1] = len(cell)
+            items.extend(cell)
+        axes = [b.axes or IDENTITY_AXES for b in self.boxes]
+        return {
+            "start": np.cumsum(counts),
+            "items": np.asarray(items, dtype=np.intp),
+            "center": np.asarray([b.center for b in self.boxes], dtype=np.float64).reshape(-1, 3),
+            "half": np.asarray([b.half for b in self.boxes], dtype=np.float64).reshape(-1, 3),
+            "axes": np.asarray(axes, dtype=np.float64).reshape(-1, 3, 3),
+        }
+
+    def contains_many(self, xs, ys, zs):
+        """contains() for every point; a bool array with NumPy, else a list."""
+        if self._arrays is None:
+            return [self.contains(x, y, z) for x, y, z in zip(xs, ys, zs)]
+        a = self._arrays
+        points = np.column_stack([np.asarray(v, dtype=np.float64) for v in (xs, ys, zs)])
+        result = np.zeros(len(points), dtype=bool)
+        if not len(points) or not self.boxes:
+            return result
+        cols = np.floor((points[:, 0] - self.min_x) / self.cell_size)
+        rows = np.floor((points[:, 2] - self.min_z) / self.cell_size)
+        on_grid = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        idx = np.flatnonzero(on_grid)
+        keys = (rows[idx] * self.cols + cols[idx]).astype(np.intp)
+        first, counts = a["start"][keys], a["start"][keys + 1] - a["start"][keys]
+        total = int(counts.sum())
+        if not total:
+            return result
+        # One (point, candidate box) pair per box in the point's cell
+        pair_point = np.repeat(idx, counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_box = a["items"][np.repeat(first, counts) + offsets]
+        d = points[pair_point] - a["center"][pair_box]
+        local = np.einsum("nij,nj->ni", a["axes"][pair_box], d)
+        inside = np.all(np.abs(local) <= a["half"][pair_box], axis=1)
+        result[pair_point[inside]] = True
+        return result
+
+
+def load_colliders(path):
+    """ColliderGrid from a JSON export (see module docstring)."""
+    with open(path, "r") as f:
+        spec = json.load(f)
+    boxes = []
+    for entry in spec.get("colliders", []):
+        if "min" in entry:
+            boxes.append(aabb(entry["min"], entry["max"]))
+        else:
+            boxes.append(oriented_box(entry["center"], entry["size"], entry.get("rotation")))
+    return ColliderGrid(boxes, spec.get("cell_size", DEFAULT_CELL_SIZE))
@@ -0,0 +1,133 @@
+# dispatch.py
+"""Packet dispatch table.
+
+A Dispatcher is built once at startup: handlers register by PacketType and
+middleware by the packet types it cares about, and each packet type's
+(handler, pre, post) route is resolved once and cached. Dispatching a
+packet is then one dict lookup plus the calls themselves.
+
+Handlers keep the `async def handle_x(server, writer, packet_or_data)`
+signature and receive `{"id": packet_id, "data": data}`, where `data` is the
+typed packet itself (see packets.TypedPacket) or a read-only
+MappingProxyType over a generic packet's dict; either way, no copy.
+
+Middleware is `async def mw(server, writer, packet_id, data)`. A pre
+middleware returning False stops the packet before its handler (e.g. a
+failed join handshake); post middleware runs after the handler succeeds.
+
+Every dispatched type gets a PacketStats entry (count, errors, time spent
+in the handler), see Dispatcher.metrics().
+"""
+import time
+from types import MappingProxyType
+from protocol import PacketType
+from packets import TypedPacket
+import log
+
+logger = log.get_logger(__name__)
+
+_TYPE_NAMES = {v: k for k, v in vars(PacketType).items() if isinstance(v, int)}
+
+
+class PacketStats:
+    __slots__ = ("count", "errors", "total_time", "max_time")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+
+class Dispatcher:
+    def __init__(self):
+        self._handlers = {}  # packet_id -> handler
+        self._pre = []  # (middleware, packet_ids or None for all)
+        self._post = []
+        self._routes = {}  # packet_id -> (handler, pre tuple, post tuple, stats)
+        self.stats = {}  # packet_id -> PacketStats
+
+    def register(self, packet_id, handler=None):
+        """Register `handler` for packet_id; usable as a decorator when handler is omitted."""
+        def add(fn):
+            self._handlers[packet_id] = fn
+            self._routes.clear()
+            return fn
+        return add if handler is None else add(handler)
+
+    def add_pre(self, middleware, packet_ids=None):
+        self._pre.append((middleware, None if packet_ids is None else frozenset(packet_ids)))
+        self._routes.clear()
+
+    def add_post(self, middleware, packet_ids=None):
+        self._post.append((middleware, None if packet_ids is None else frozenset(packet_ids)))
+        self._routes.clear()
+
+    def _route(self, packet_id):
+        route = self._routes.get(packet_id)
+        if route is None:
+            handler = self._handlers.get(packet_id)
+            if handler is None:
+                return None
+            pre = tuple(mw for mw, ids in self._pre if ids is None or packet_id in ids)
+            post = tuple(mw for mw, ids in self._post if ids is None or packet_id in ids)
+            stats = self.stats.setdefault(packet_id, PacketStats())
+            route = self._routes[packet_id] = (handler, pre, post, stats)
+        return route
+
+    @staticmethod
+    def unpack(packet):
+        """Return (packet_id, data) for a parsed packet or raw dict, without copying.
+
+        Typed packets are their own data (slotted fields plus get()); anything
+        else is wrapped in a read-only view.
+        """
+        if isinstance(packet, TypedPacket):
+            return packet.packet_id, packet
+        data = getattr(packet, "_data", None)
+        if data is not None:
+            return getattr(packet, "packet_id", None) or data.get("_raw_id"), MappingProxyType(data)
+        return packet.get("id"), MappingProxyType(packet.get("data") or {})
+
+    async def dispatch(self, server, writer, packet):
+        if packet is None:
+            return
+        packet_id, data = self.unpack(packet)
+        route = self._route(packet_id)
+        if route is None:
+            logger.error("[ERROR] Unknown packet type: %s", packet_id)
+            logger.error("[ERROR] Packet data: %s", packet)
+            return
+
+        handler, pre, post, stats = route
+        for mw in pre:
+            if not await mw(server, writer, packet_id, data):
+                return
+
+        stats.count += 1
+        start = time.perf_counter()
+        try:
+            await handler(server, writer, {"id": packet_id, "data": data})
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.total_time += elapsed
+            if elapsed > stats.max_time:
+                stats.max_time = elapsed
+
+        for mw in post:
+            await mw(server, writer, packet_id, data)
+
+    def metrics(self):
+        """Per packet type: count, errors, mean and max handler time in ms."""
+        out = {}
+        for packet_id, s in self.stats.items():
+            out[_TYPE_NAMES.get(packet_id, str(packet_id))] = {
+                "count": s.count,
+                "errors": s.errors,
+                "avg_ms": (s.total_time / s.count * 1000) if s.count else 0.0,
+                "max_ms": s.max_time * 1000,
+            }
+        return out
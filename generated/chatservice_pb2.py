@@ -24,23 +24,27 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11\x63hatservice.proto\x12\x04\x63hat\"3\n\rStreamRequest\x12\x10\n\x08playerId\x18\x01 \x01(\t\x12\x10\n\x08\x63hannels\x18\x02 \x03(\t\"Q\n\x0b\x43hatMessage\x12\x0f\n\x07\x63hannel\x18\x01 \x01(\t\x12\x10\n\x08playerId\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x03\"[\n\x0eWhisperRequest\x12\x14\n\x0c\x66romPlayerId\x18\x01 \x01(\t\x12\x12\n\ntoPlayerId\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x03\"7\n\x14\x43reateChannelRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x11\n\tcreatorId\x18\x02 \x01(\t\"%\n\x03\x41\x63k\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t2\xde\x01\n\x0b\x43hatService\x12:\n\x0eStreamMessages\x12\x13.chat.StreamRequest\x1a\x11.chat.ChatMessage0\x01\x12+\n\x0bSendMessage\x12\x11.chat.ChatMessage\x1a\t.chat.Ack\x12\x36\n\rCreateChannel\x12\x1a.chat.CreateChannelRequest\x1a\t.chat.Ack\x12.\n\x0bSendWhisper\x12\x14.chat.WhisperRequest\x1a\t.chat.Ackb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11\x63hatservice.proto\x12\x04\x63hat\"\x87\x01\n\rStreamRequest\x12\x10\n\x08playerId\x18\x01 \x01(\t\x12\x10\n\x08\x63hannels\x18\x02 \x03(\t\x12\x15\n\x08sinceSeq\x18\x03 \x01(\x03H\x00\x88\x01\x01\x12\x1b\n\x0esinceTimestamp\x18\x04 \x01(\x03H\x01\x88\x01\x01\x42\x0b\n\t_sinceSeqB\x11\n\x0f_sinceTimestamp\"^\n\x0b\x43hatMessage\x12\x0f\n\x07\x63hannel\x18\x01 \x01(\t\x12\x10\n\x08playerId\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x03\x12\x0b\n\x03seq\x18\x05 \x01(\x03\"[\n\x0eWhisperRequest\x12\x14\n\x0c\x66romPlayerId\x18\x01 \x01(\t\x12\x12\n\ntoPlayerId\x18\x02 \x01(\t\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x03\"7\n\x14\x43reateChannelRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x11\n\tcreatorId\x18\x02 \x01(\t\"%\n\x03\x41\x63k\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t\"0\n\tChatBatch\x12#\n\x08messages\x18\x01 \x03(\x0b\x32\x11.chat.ChatMessage\"=\n\x08\x42\x61tchAck\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x01 \x01(\x05\x12\x10\n\x08rejected\x18\x02 \x01(\x05\x12\r\n\x05\x65rror\x18\x03 \x01(\t2\x8f\x02\n\x0b\x43hatService\x12:\n\x0eStreamMessages\x12\x13.chat.StreamRequest\x1a\x11.chat.ChatMessage0\x01\x12+\n\x0bSendMessage\x12\x11.chat.ChatMessage\x1a\t.chat.Ack\x12/\n\x0cSendMessages\x12\x0f.chat.ChatBatch\x1a\x0e.chat.BatchAck\x12\x36\n\rCreateChannel\x12\x1a.chat.CreateChannelRequest\x1a\t.chat.Ack\x12.\n\x0bSendWhisper\x12\x14.chat.WhisperRequest\x1a\t.chat.Ackb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'chatservice_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_STREAMREQUEST']._serialized_start=27
-  _globals['_STREAMREQUEST']._serialized_end=78
-  _globals['_CHATMESSAGE']._serialized_start=80
-  _globals['_CHATMESSAGE']._serialized_end=161
-  _globals['_WHISPERREQUEST']._serialized_start=163
-  _globals['_WHISPERREQUEST']._serialized_end=254
-  _globals['_CREATECHANNELREQUEST']._serialized_start=256
-  _globals['_CREATECHANNELREQUEST']._serialized_end=311
-  _globals['_ACK']._serialized_start=313
-  _globals['_ACK']._serialized_end=350
-  _globals['_CHATSERVICE']._serialized_start=353
-  _globals['_CHATSERVICE']._serialized_end=575
+  _globals['_STREAMREQUEST']._serialized_start=28
+  _globals['_STREAMREQUEST']._serialized_end=163
+  _globals['_CHATMESSAGE']._serialized_start=165
+  _globals['_CHATMESSAGE']._serialized_end=259
+  _globals['_WHISPERREQUEST']._serialized_start=261
+  _globals['_WHISPERREQUEST']._serialized_end=352
+  _globals['_CREATECHANNELREQUEST']._serialized_start=354
+  _globals['_CREATECHANNELREQUEST']._serialized_end=409
+  _globals['_ACK']._serialized_start=411
+  _globals['_ACK']._serialized_end=448
+  _globals['_CHATBATCH']._serialized_start=450
+  _globals['_CHATBATCH']._serialized_end=498
+  _globals['_BATCHACK']._serialized_start=500
+  _globals['_BATCHACK']._serialized_end=561
+  _globals['_CHATSERVICE']._serialized_start=564
+  _globals['_CHATSERVICE']._serialized_end=835
 # @@protoc_insertion_point(module_scope)
@@ -1,18 +1,55 @@
-import json
+from wire import EncodedPacket
+from outbound import deliver
+from .connection import drop_session
+import log
 
+logger = log.get_logger(__name__)
 
-async def broadcast_packet(server, packet_str: str):
+
+async def broadcast_packet(server, packet_id, data, recipients=None):
+    """Send a packet to `recipients` (writers), or to every client if None.
+
+    The packet is serialized once per wire encoding, not once per recipient.
+    """
+    await broadcast_encoded(server, EncodedPacket(packet_id, data), recipients)
+
+
+async def broadcast_encoded(server, packet, recipients=None, on_drop=None):
+    """Fan out an already-encoded packet.
+
+    `packet` is either an EncodedPacket (e.g. from a shared snapshot cache),
+    written in each recipient's negotiated encoding, or bytes / a memoryview
+    that is already in the recipients' encoding and is written as-is.
+
+    Packets are queued on each recipient's outbox and nothing here awaits a
+    client's drain(), so a slow client cannot delay the others. on_drop is
+    called for each recipient whose outbox drops the packet (see deliver).
+    """
     dead_clients = []
-    for w in list(server.clients.keys()):
+    targets = server.sessions.writers() if recipients is None else list(recipients)
+    raw = not isinstance(packet, EncodedPacket)
+    for w in targets:
         try:
-            w.write(packet_str.encode())
-            await w.drain()
+            if not raw:
+                deliver(server, w, packet, on_drop)
+            elif w in server.outboxes:
+                server.outboxes[w].put(packet)
+            else:
+                w.write(packet)
         except Exception as e:
-            print(f"[ERROR] Failed to broadcast to client: {e}")
+            logger.error("[ERROR] Failed to broadcast to client: %s", e)
             dead_clients.append(w)
 
+    remove_dead_clients(server, dead_clients)
+
+
+def remove_dead_clients(server, dead_clients):
+    """Drop the sessions of writers whose sends failed.
+
+    The player disappears from the next world update; handle_client
+    finishes the per-connection cleanup when its read loop ends.
+    """
     for w in dead_clients:
-        player_id = server.clients.pop(w, None)
-        if player_id and player_id in server.client_positions:
-            del server.client_positions[player_id]
-            print(f"[CLEANUP] Removed dead client {player_id}")
+        player_id = drop_session(server, w)
+        if player_id:
+            logger.info("[CLEANUP] Removed dead client %s", player_id)
@@ -1,6 +1,14 @@
 from protocol import PacketType
 from .broadcast import broadcast_packet
-import json
+import log
+
+logger = log.get_logger(__name__)
+
+# Channels the master relays from the chat service (see ChatManager.listen);
+# players receive only the ones they are members of. New players start in
+# AUTOJOIN_CHANNELS and use /join, /leave and /channels for the rest.
+CHAT_CHANNELS = ("global", "trade", "guild")
+AUTOJOIN_CHANNELS = ("global", "guild")
 
 
 def normalize(packet_or_data):
@@ -11,26 +19,29 @@ def normalize(packet_or_data):
 
 async def handle_chat(server, writer, packet_or_data):
     data = normalize(packet_or_data)
-    player_id = server.clients.get(writer, "unknown")
+    session = server.sessions.joined(writer)
+    player_id = session.player_id if session is not None else "unknown"
     msg_text = data.get("text", "")
     channel = data.get("channel", "global")
 
-    # Simple chat commands: /nick <name> and /whisper <playername> <message>
+    # Simple chat commands: /nick <name>, /whisper <playername> <message>,
+    # /join <channel>, /leave <channel> and /channels
+    if msg_text.strip() == "/channels" or msg_text.startswith(("/join ", "/leave ")):
+        await handle_channel_command(server, writer, session, msg_text)
+        return
+
     if msg_text.startswith("/nick "):
         parts = msg_text.split(None, 1)
         if len(parts) < 2:
             return
         new_nick = parts[1].strip()
-        # Check if nickname already in use
-        if new_nick in server.nickname_to_id:
+        if session is None:
+            return
+        # Fails if the nickname is already in use
+        if not server.sessions.rename(session, new_nick):
             # send a private correction/notice back to the user
             await server.send(writer, PacketType.CHAT, {"text": f"Nickname {new_nick} is already in use.", "channel": "system"})
             return
-        old = server.nicknames.get(player_id)
-        if old:
-            del server.nickname_to_id[old]
-        server.nicknames[player_id] = new_nick
-        server.nickname_to_id[new_nick] = player_id
         await server.send(writer, PacketType.CHAT, {"text": f"Nickname changed to {new_nick}", "channel": "system"})
         return
 
@@ -40,31 +51,61 @@ async def handle_chat(server, writer, packet_or_data):
             await server.send(writer, PacketType.CHAT, {"text": "Usage: /whisper <playername> <message>", "channel": "system"})
             return
         target, message = parts[1], parts[2]
-        target_id = server.nickname_to_id.get(target)
-        if not target_id:
+        # Sessions leave the table on disconnect, so unknown and offline are the same
+        target_session = server.sessions.by_nickname(target)
+        if target_session is None:
             await server.send(writer, PacketType.CHAT, {"text": f"Player {target} not found.", "channel": "system"})
             return
-        target_writer = server.writers_by_id.get(target_id)
-        if not target_writer:
-            await server.send(writer, PacketType.CHAT, {"text": f"Player {target} is offline.", "channel": "system"})
-            return
+        sender = (session.nickname if session is not None else None) or player_id
         # send private message to target and a confirmation to sender
-        await server.send(target_writer, PacketType.CHAT, {"text": message, "channel": f"whisper:{server.nicknames.get(player_id,player_id)}", "playerId": player_id})
+        await server.send(target_session.writer, PacketType.CHAT, {"text": message, "channel": f"whisper:{sender}", "playerId": player_id})
         await server.send(writer, PacketType.CHAT, {"text": f"(whisper to {target}) {message}", "channel": "system"})
         return
 
+    # Only members talk in a channel, so senders always see the replies
+    if session is None or channel not in session.chat_channels:
+        await server.send(writer, PacketType.CHAT, {"text": f"You are not in {channel}. Use /join {channel} first.", "channel": "system"})
+        return
+
     await server.chat.send_message(player_id, msg_text, channel)
 
 
+async def handle_channel_command(server, writer, session, msg_text):
+    parts = msg_text.split()
+    command = parts[0]
+    if session is None:
+        return
+    if command == "/channels":
+        joined = ", ".join(sorted(session.chat_channels)) or "none"
+        await server.send(writer, PacketType.CHAT, {
+            "text": f"Channels: {joined} (available: {', '.join(server.chat_channels)})", "channel": "system"})
+        return
+    if len(parts) != 2:
+        await server.send(writer, PacketType.CHAT, {"text": f"Usage: {command} <channel>", "channel": "system"})
+        return
+    channel = parts[1]
+    if channel not in server.chat_channels:
+        await server.send(writer, PacketType.CHAT, {"text": f"Unknown channel {channel}.", "channel": "system"})
+        return
+    # "joined" / "left" confirm the membership change to the client
+    if command == "/join":
+        changed = server.sessions.join_channel(session, channel)
+        notice = {"text": f"Joined {channel}." if changed else f"Already in {channel}.", "joined": channel}
+    else:
+        changed = server.sessions.leave_channel(session, channel)
+        notice = {"text": f"Left {channel}.", "left": channel} if changed else {"text": f"Not in {channel}."}
+    notice["channel"] = "system"
+    await server.send(writer, PacketType.CHAT, notice)
+
+
 async def broadcast_chat(server, msg):
-    packet = json.dumps({
-        "id": PacketType.CHAT,
-        "data": {
-            "channel": msg.channel,
-            "playerId": msg.playerId,
-            "text": msg.text,
-            "timestamp": msg.timestamp
-        }
-    }) + "\n"
-    print(f"[BROADCAST CHAT] Sending: {packet}")
-    await broadcast_packet(server, packet)
+    data = {
+        "channel": msg.channel,
+        "playerId": msg.playerId,
+        "text": msg.text,
+        "timestamp": msg.timestamp
+    }
+    recipients = server.sessions.channel_writers(msg.channel)
+    logger.debug("[BROADCAST CHAT] Sending to %d members: %s", len(recipients), data)
+    if recipients:
+        await broadcast_packet(server, PacketType.CHAT, data, recipients)
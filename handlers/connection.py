@@ -0,0 +1,80 @@
+import hashlib
+import hmac
+import time
+from protocol import PacketType
+import wire
+import log
+
+logger = log.get_logger(__name__)
+
+# Accepted clock skew for the PLAYER_JOIN timestamp, in seconds
+JOIN_TS_WINDOW = 30
+
+
+async def handle_ping(server, writer, packet_or_data):
+    await server.send(writer, PacketType.PONG, {"msg": "pong"})
+
+
+async def handle_encoding_switch(server, writer, packet_or_data):
+    """The client sends in the encoding negotiated at join from its next packet on.
+
+    The client sends this once it has read PLAYER_ID_ASSIGNED, so moves or
+    pings it wrote during the join round trip are still read as JSON.
+    """
+    session = server.sessions.joined(writer)
+    if session is None:
+        return
+    session.inbound_encoding = wire.codec_for(server, writer).name
+
+
+async def reject(writer):
+    writer.close()
+    await writer.wait_closed()
+    return False
+
+
+def drop_session(server, writer):
+    """Forget writer's session and the per-player state queued for it.
+
+    Returns the player id if it had joined, so the caller can announce the
+    player's removal; None if unknown or already dropped.
+    """
+    session = server.sessions.close(writer)
+    if session is None or session.player_id is None:
+        return None
+    player_id = session.player_id
+    server.pending_moves.pop(player_id, None)
+    server.move_stats.forget(player_id)
+    server.dirty_players.add(player_id)
+    return player_id
+
+
+async def verify_join(server, writer, packet_id, data):
+    """Pre-middleware for PLAYER_JOIN: the client must answer this connection's
+    HANDSHAKE_CHALLENGE with HMAC_SHA256(server_secret, nonce + preferredId + ts).
+    """
+    session = server.sessions.get(writer)
+    nonce = session.nonce if session is not None else None
+    if nonce is None:
+        logger.warning("[AUTH] No handshake nonce for client, rejecting join from %s", writer)
+        return await reject(writer)
+
+    try:
+        ts = int(data.get("ts"))
+    except Exception:
+        logger.warning("[AUTH] Invalid timestamp from client, rejecting")
+        return await reject(writer)
+
+    now = int(time.time())
+    if abs(now - ts) > JOIN_TS_WINDOW:
+        logger.warning("[AUTH] Timestamp outside allowed window: %s (now %s)", ts, now)
+        return await reject(writer)
+
+    proof = data.get("hmac")
+    session.nonce = None  # one join attempt per challenge
+    msg = (nonce + (data.get("preferredId") or "") + str(ts)).encode()
+    expected = hmac.new(server.server_secret.encode(), msg, hashlib.sha256).hexdigest()
+    if not proof or not hmac.compare_digest(expected, proof):
+        logger.warning("[AUTH] HMAC verification failed for client %s", writer)
+        return await reject(writer)
+    return True
@@ -1,28 +1,193 @@
-import json
 from protocol import PacketType
+from wire import EncodedPacket
+from .broadcast import broadcast_packet, broadcast_encoded
+import log
+
+logger = log.get_logger(__name__)
+
+
+def npc_spawn_data(server, npc_id, x, y, z):
+    data = {"npcId": npc_id, "x": x, "y": y, "z": z}
+    npc = server.npc_service.npcs.get(npc_id) if hasattr(server, "npc_service") else None
+    if npc:
+        data["state"] = npc.get("state", "idle")
+        data["name"] = npc.get("name", "")
+    return data
+
+
+def players_near(server, x, z):
+    """Writers whose player is within view_radius of (x, z)."""
+    writers = set()
+    for pid in server.player_grid.query(x, z, server.view_radius):
+        session = server.sessions.by_player(pid)
+        if session is not None:
+            writers.add(session.writer)
+    return writers
+
+
+async def npc_enter(server, npc_id, writers, x, y, z):
+    """NPC came into view for `writers`: spawn it on their side."""
+    watchers = server.npc_watchers.setdefault(npc_id, set())
+    for w in writers:
+        watchers.add(w)
+        server.visible_npcs.setdefault(w, set()).add(npc_id)
+    await broadcast_packet(server, PacketType.NPC_SPAWN, npc_spawn_data(server, npc_id, x, y, z), writers)
+
+
+async def npc_leave(server, npc_id, writers):
+    """NPC left the view of `writers`: despawn it on their side."""
+    watchers = server.npc_watchers.get(npc_id, set())
+    for w in writers:
+        watchers.discard(w)
+        server.visible_npcs.get(w, set()).discard(npc_id)
+    await broadcast_packet(server, PacketType.NPC_DESPAWN, {"npcId": npc_id}, writers)
 
 
 async def broadcast_npc_spawn(server, npc_id, x, y, z):
-    packet = json.dumps({
-        "id": PacketType.NPC_SPAWN,
-        "data": {"npcId": npc_id, "x": x, "y": y, "z": z}
-    }) + "\n"
+    server.handles.claim(npc_id)
+    if server.npc_grid is not None:
+        server.npc_grid.update(npc_id, x, z)
+        await npc_enter(server, npc_id, players_near(server, x, z), x, y, z)
+        logger.info("[NPC] NPC %s spawned at: %s %s %s", npc_id, x, y, z)
+        return
+
     # reuse server's _broadcast to send to all clients
-    await server._broadcast(packet)
-    print(f"[NPC] NPC {npc_id} spawned at: {x} {y} {z}")
+    await server._broadcast(PacketType.NPC_SPAWN, {"npcId": npc_id, "x": x, "y": y, "z": z})
+    logger.info("[NPC] NPC %s spawned at: %s %s %s", npc_id, x, y, z)
 
 
 async def broadcast_npc_update(server, npc_id, x, y, z):
-    packet = json.dumps({
-        "id": PacketType.NPC_UPDATE,
-        "data": {"npcId": npc_id, "x": x, "y": y, "z": z}
-    }) + "\n"
-    await server._broadcast(packet)
+    data = {"npcId": npc_id, "x": x, "y": y, "z": z}
+    # Sent outside a batch: the next batch must not skip this NPC as unchanged
+    server.npc_sent.pop(npc_id, None)
+    if server.npc_grid is None:
+        await server._broadcast(PacketType.NPC_UPDATE, data)
+        return
+
+    server.npc_grid.update(npc_id, x, z)
+    near = players_near(server, x, z)
+    watchers = server.npc_watchers.get(npc_id, set())
+    staying = near & watchers
+    entered = near - watchers
+    left = watchers - near
+    if staying:
+        await broadcast_packet(server, PacketType.NPC_UPDATE, data, staying)
+    if entered:
+        await npc_enter(server, npc_id, entered, x, y, z)
+    if left:
+        await npc_leave(server, npc_id, left)
+
+
+def npc_batch_packet(server, entries):
+    """NPC_BATCH_UPDATE for [(npc_id, x, y, z), ...], quantized if server.npc_quantum is set."""
+    q = server.npc_quantum
+    if q:
+        npcs = [{"npcId": nid, "x": qx, "y": qy, "z": qz} for nid, qx, qy, qz in entries]
+        return EncodedPacket(PacketType.NPC_BATCH_UPDATE, {"q": q, "npcs": npcs})
+    npcs = [{"npcId": nid, "x": x, "y": y, "z": z} for nid, x, y, z in entries]
+    return EncodedPacket(PacketType.NPC_BATCH_UPDATE, {"npcs": npcs})
+
+
+def batch_entries(server, moves):
+    """Entries worth sending for this tick's moves.
+
+    With quantization on, positions become integer multiples of npc_quantum
+    and NPCs whose quantized position hasn't changed since they were last
+    sent are dropped from the batch.
+    """
+    q = server.npc_quantum
+    if not q:
+        return moves
+    sent = server.npc_sent
+    entries = []
+    for npc_id, x, y, z in moves:
+        pos = (round(x / q), round(y / q), round(z / q))
+        if sent.get(npc_id) != pos:
+            sent[npc_id] = pos
+            entries.append((npc_id,) + pos)
+    return entries
+
+
+def resend_on_drop(server, entries):
+    """on_drop callback for a batch of entries: forget they were sent.
+
+    With quantization on, batch_entries skips NPCs whose quantized position
+    was already sent. If a client's outbox drops the batch, those NPCs must
+    go out again with the next one. Without quantization every moving NPC is
+    in every batch, so there is nothing to undo.
+    """
+    if not server.npc_quantum:
+        return None
+    ids = [e[0] for e in entries]
+
+    def forget():
+        for npc_id in ids:
+            server.npc_sent.pop(npc_id, None)
+    return forget
+
+
+async def broadcast_npc_updates(server, moves):
+    """Send one NPC tick's moves, [(npc_id, x, y, z), ...].
+
+    Each client gets a single NPC_BATCH_UPDATE with the NPCs it can see
+    instead of one NPC_UPDATE per NPC. With npc_batching off this falls back
+    to per-NPC broadcast_npc_update.
+    """
+    if not server.npc_batching:
+        for npc_id, x, y, z in moves:
+            await broadcast_npc_update(server, npc_id, x, y, z)
+        return
+
+    if server.npc_grid is None:
+        entries = batch_entries(server, moves)
+        if entries:
+            await broadcast_encoded(server, npc_batch_packet(server, entries),
+                                    on_drop=resend_on_drop(server, entries))
+        return
+
+    per_client = {}
+    entries = {e[0]: e for e in batch_entries(server, moves)}
+    for npc_id, x, y, z in moves:
+        server.npc_grid.update(npc_id, x, z)
+        near = players_near(server, x, z)
+        watchers = server.npc_watchers.get(npc_id, set())
+        entered = near - watchers
+        left = watchers - near
+        entry = entries.get(npc_id)
+        if entry is not None:
+            for w in near & watchers:
+                per_client.setdefault(w, []).append(entry)
+        if entered:
+            await npc_enter(server, npc_id, entered, x, y, z)
+        if left:
+            await npc_leave(server, npc_id, left)
+    for w, client_entries in per_client.items():
+        await broadcast_encoded(server, npc_batch_packet(server, client_entries), [w],
+                                resend_on_drop(server, client_entries))
 
 
 async def broadcast_npc_despawn(server, npc_id):
-    packet = json.dumps({
-        "id": PacketType.NPC_DESPAWN,
-        "data": {"npcId": npc_id}
-    }) + "\n"
-    await server._broadcast(packet)
+    data = {"npcId": npc_id}
+    server.npc_sent.pop(npc_id, None)
+    if server.npc_grid is None:
+        await server._broadcast(PacketType.NPC_DESPAWN, data)
+    else:
+        server.npc_grid.remove(npc_id)
+        watchers = server.npc_watchers.pop(npc_id, set())
+        for w in watchers:
+            server.visible_npcs.get(w, set()).discard(npc_id)
+        await broadcast_packet(server, PacketType.NPC_DESPAWN, data, watchers)
+    server.handles.release(npc_id)
+
+
+async def refresh_npc_interest(server, writer, x, z):
+    """Player moved to (x, z): spawn NPCs that came into view, despawn ones that left."""
+    near = server.npc_grid.query(x, z, server.view_radius)
+    visible = server.visible_npcs.setdefault(writer, set())
+    for npc_id in near - visible:
+        npc = server.npc_service.npcs.get(npc_id) if hasattr(server, "npc_service") else None
+        if npc is None:
+            continue
+        await npc_enter(server, npc_id, {writer}, npc["x"], npc["y"], npc["z"])
+    for npc_id in visible - near:
+        await npc_leave(server, npc_id, {writer})
@@ -1,6 +1,20 @@
 import time
 import math
 from protocol import PacketType
+import wire
+import movement
+from .connection import drop_session
+import log
+
+logger = log.get_logger(__name__)
+trace_move = log.Sampler(logger)
+
+# Moves are validated along the whole old -> new segment, not just at the
+# endpoint, so clients can send larger steps without tunnelling through
+# walls or hills.
+SWEEP_STEP = 1.0  # terrain sample spacing along a move (world units)
+MAX_SWEEP_SAMPLES = 64
+COLLIDER_SKIN = 0.05  # corrected positions stop this far short of a collider
 
 
 def normalize(packet_or_data):
@@ -12,31 +26,59 @@ def normalize(packet_or_data):
 async def handle_player_join(server, writer, packet_or_data):
     data = normalize(packet_or_data)
     preferred_id = data.get("preferredId")
+    if preferred_id and server.sessions.by_player(preferred_id) is None and server.sessions.ids.live(preferred_id):
+        # Players and NPCs share one handle table: taking a live NPC's id
+        # would give the player its entity_id, and release it on disconnect
+        logger.warning("[JOIN] preferredId %s belongs to a live entity, assigning a new id", preferred_id)
+        preferred_id = None
     assigned_id = preferred_id or str(__import__("uuid").uuid4())
 
-    spawn_index = len(server.client_positions) % len(server.spawn_points)
+    spawn_index = len(server.sessions) % len(server.spawn_points)
     spawn_pos = server.spawn_points[spawn_index]
 
-    server.clients[writer] = assigned_id
-    server.client_positions[assigned_id] = spawn_pos
-    server.last_move_times[assigned_id] = time.time()
-    # Register writer and default nickname
-    server.writers_by_id[assigned_id] = writer
-    default_nick = data.get("nickname") or assigned_id
-    server.nicknames[assigned_id] = default_nick
-    server.nickname_to_id[default_nick] = assigned_id
-
-    print(f"[JOIN] Player {assigned_id} joined at {spawn_pos}")
-    await server.send(writer, PacketType.PLAYER_ID_ASSIGNED, {
+    # Same player id on a new connection (e.g. a reconnect before the old
+    # socket timed out): the new connection replaces the old one
+    previous = server.sessions.by_player(assigned_id)
+    if previous is not None and previous.writer is not writer:
+        logger.info("[JOIN] Player %s joined again, closing its previous connection", assigned_id)
+        drop_session(server, previous.writer)
+        outbox = server.outboxes.get(previous.writer)
+        if outbox is not None:
+            outbox.close()  # closes the writer too
+        else:
+            previous.writer.close()
+        # Its read loop ends and handle_client finishes the cleanup
+
+    # Register the player with its default nickname and chat channels
+    server.sessions.join(writer, assigned_id, spawn_pos, time.time(), nickname=data.get("nickname"),
+                         channels=server.chat_autojoin)
+
+    # Wire encoding negotiation: the client picks one of the encodings offered
+    # in HANDSHAKE_CHALLENGE. We send in it after PLAYER_ID_ASSIGNED; the
+    # client sends in it after its ENCODING_SWITCH.
+    encoding = data.get("encoding", wire.ENCODING_JSON)
+    if encoding not in server.encodings:
+        encoding = wire.ENCODING_JSON
+
+    logger.info("[JOIN] Player %s joined at %s", assigned_id, spawn_pos)
+    assigned = {
         "assignedId": assigned_id,
-        "spawnIndex": spawn_index
-    })
-
-    await server.broadcast_world_state()
-
-    if hasattr(server, "npc_service"):
+        "spawnIndex": spawn_index,
+        "encoding": encoding
+    }
+    quantizer = server.quantizer if encoding == wire.ENCODING_BINARY else None
+    if quantizer is not None:
+        assigned["quantization"] = quantizer.spec()
+    await server.send(writer, PacketType.PLAYER_ID_ASSIGNED, assigned)
+    if encoding == wire.ENCODING_BINARY:
+        server.codecs[writer] = wire.BinaryCodec(server.handles, quantizer)
+
+    await server.world_changed(assigned_id)
+
+    # With interest management NPCs are spawned as they come into view instead
+    if hasattr(server, "npc_service") and server.npc_grid is None:
         for npc_id, npc in server.npc_service.npcs.items():
-            print(f"[DEBUG] Sending NPC_SPAWN for {npc_id} to player {assigned_id}")
+            logger.debug("[DEBUG] Sending NPC_SPAWN for %s to player %s", npc_id, assigned_id)
             await server.send(writer, PacketType.NPC_SPAWN, {
                 "npcId": npc_id,
                 "x": npc["x"],
@@ -47,69 +89,111 @@ async def handle_player_join(server, writer, packet_or_data):
             })
 
 
+def terrain_clear(server, old_pos, new_pos):
+    """False when the terrain between two positions rises more than
+    VERTICAL_TOLERANCE above the straight path (walking through a hill)."""
+    (x0, y0, z0), (x1, y1, z1) = old_pos, new_pos
+    samples = min(MAX_SWEEP_SAMPLES, int(math.hypot(x1 - x0, z1 - z0) / SWEEP_STEP))
+    if samples < 1:
+        return True
+    ts = [(i + 1) / (samples + 1) for i in range(samples)]
+    heights = server.heights_at([x0 + (x1 - x0) * t for t in ts], [z0 + (z1 - z0) * t for t in ts])
+    return all(h - (y0 + (y1 - y0) * t) <= movement.VERTICAL_TOLERANCE for t, h in zip(ts, heights))
+
+
+def stop_short(old_pos, new_pos, hit):
+    """Last free position along old -> new before the collider entered at fraction `hit`."""
+    length = math.dist(old_pos, new_pos)
+    t = max(0.0, hit - COLLIDER_SKIN / length) if length else 0.0
+    return tuple(a + (b - a) * t for a, b in zip(old_pos, new_pos))
+
+
 async def handle_player_move(server, writer, packet_or_data):
+    """Queue the move; process_moves validates it with the rest of the tick's batch.
+
+    Only the latest move per player is kept. With server.move_batching off
+    the move is validated right away, as a batch of one.
+    """
     data = normalize(packet_or_data)
 
-    player_id = server.clients.get(writer)
+    player_id = server.sessions.player_id(writer)
     if not player_id:
-        print("[WARN] Move packet from unregistered client")
+        logger.warning("[WARN] Move packet from unregistered client")
         return
 
-    old_pos = server.client_positions.get(player_id, (0, 0, 0))
-    old_x, old_y, old_z = old_pos
-
-    new_x, new_y, new_z = data.get("x", 0), data.get("y", 0), data.get("z", 0)
-
-    current_time = time.time()
-    last_time = server.last_move_times.get(player_id, current_time)
-    time_elapsed = current_time - last_time
-
-    dx, dy, dz = new_x - old_x, new_y - old_y, new_z - old_z
-    dist = math.sqrt(dx * dx + dy * dy + dz * dz)
-
-    if time_elapsed > 0.001:
-        speed = dist / time_elapsed
-        if speed > server.max_speed * 1.5:
-            print(f"[CHEAT?] {player_id} Speed hack detected! Speed: {speed:.2f} > {server.max_speed}")
-            await server.send(writer, PacketType.PLAYER_CORRECTION, {"x": old_x, "y": old_y, "z": old_z})
-            return
-    else:
-        MAX_SINGLE_MOVE_DIST = server.max_speed * 0.2
-        if dist > MAX_SINGLE_MOVE_DIST:
-            print(f"[CHEAT?] {player_id} Teleport/Max dist detected! Dist: {dist:.2f} > {MAX_SINGLE_MOVE_DIST}")
-            await server.send(writer, PacketType.PLAYER_CORRECTION, {"x": old_x, "y": old_y, "z": old_z})
-            return
-
-    if not (server.world_bounds["min_x"] <= new_x <= server.world_bounds["max_x"] and
-            server.world_bounds["min_y"] <= new_y <= server.world_bounds["max_y"] and
-            server.world_bounds["min_z"] <= new_z <= server.world_bounds["max_z"]):
-        print(f"[CHEAT?] {player_id} Out of bounds at ({new_x:.2f}, {new_y:.2f}, {new_z:.2f})")
-        await server.send(writer, PacketType.PLAYER_CORRECTION, {"x": old_x, "y": old_y, "z": old_z})
-        return
+    stats = server.move_stats
+    stats.received += 1
+    if player_id in server.pending_moves:
+        stats.superseded += 1
+    server.pending_moves[player_id] = (writer, (data.get("x", 0), data.get("y", 0), data.get("z", 0)), time.time())
+    if not server.move_batching:
+        await process_moves(server)
 
-    expected_y = server.get_height_at(new_x, new_z)
-    VERTICAL_TOLERANCE = 5.0
-    if abs(new_y - expected_y) > VERTICAL_TOLERANCE:
-        print(f"[CHEAT?] {player_id} Invalid Y (expected {expected_y:.2f}, got {new_y:.2f}). Reverting Y only.")
-        await server.send(writer, PacketType.PLAYER_CORRECTION, {"x": new_x, "y": expected_y, "z": new_z})
-        return
 
-    if server.is_inside_collider(new_x, new_y, new_z):
-        print(f"[CHEAT?] {player_id} Inside collider at ({new_x:.2f}, {new_y:.2f}, {new_z:.2f})")
-        await server.send(writer, PacketType.PLAYER_CORRECTION, {"x": old_x, "y": old_y, "z": old_z})
+async def process_moves(server):
+    """Validate every queued move in one pass and flush the corrections together."""
+    pending = server.pending_moves
+    if not pending:
         return
-
-    server.client_positions[player_id] = (new_x, new_y, new_z)
-    server.last_move_times[player_id] = current_time
-    print(f"[MOVE] Player {player_id} -> ({new_x:.2f}, {new_y:.2f}, {new_z:.2f})")
-    await server.broadcast_world_state()
+    server.pending_moves = {}
+    # Players that disconnected since queueing are dropped
+    batch = []
+    for pid, (writer, new_pos, received) in pending.items():
+        session = server.sessions.by_player(pid)
+        if session is not None and session.writer is writer:
+            batch.append((session, new_pos, received))
+    stats = server.move_stats
+    stats.batches += 1
+    stats.largest_batch = max(stats.largest_batch, len(batch))
+
+    olds = [session.position for session, _, _ in batch]
+    news = [new_pos for _, new_pos, _ in batch]
+    elapsed = [received - session.last_move_time for session, _, received in batch]
+    verdicts, expected_ys = movement.check_moves(server, olds, news, elapsed)
+
+    corrections = []
+    for (session, new_pos, received), old_pos, verdict, expected_y in zip(batch, olds, verdicts, expected_ys):
+        pid, writer = session.player_id, session.writer
+        correction = old_pos
+        if verdict == movement.VERDICT_HEIGHT:
+            correction = (new_pos[0], expected_y, new_pos[2])  # fix Y only
+        elif verdict == movement.VERDICT_OK:
+            verdict, correction = sweep_move(server, old_pos, new_pos)
+
+        if verdict != movement.VERDICT_OK:
+            stats.reject(pid, verdict)
+            logger.warning("[CHEAT?] %s %s: (%.2f, %.2f, %.2f) -> (%.2f, %.2f, %.2f)",
+                           pid, verdict, *old_pos, *new_pos)
+            corrections.append((writer, correction))
+            continue
+
+        stats.accepted += 1
+        session.position = tuple(new_pos)
+        session.last_move_time = received
+        trace_move("[MOVE] Player %s -> (%.2f, %.2f, %.2f)", pid, *new_pos)
+        await server.world_changed(pid)
+
+    for writer, (x, y, z) in corrections:
+        await server.send(writer, PacketType.PLAYER_CORRECTION, {"x": x, "y": y, "z": z})
+
+
+def sweep_move(server, old_pos, new_pos):
+    """Terrain and collider sweeps along old -> new; returns (verdict, correction)."""
+    if not terrain_clear(server, old_pos, new_pos):
+        return movement.VERDICT_TERRAIN, old_pos
+
+    hit = server.collider_hit(old_pos, new_pos)
+    if hit == 0.0 and server.is_inside_collider(*old_pos) and not server.is_inside_collider(*new_pos):
+        hit = None  # already stuck inside a collider: let the player walk out
+    if hit is not None:
+        return movement.VERDICT_COLLIDER, stop_short(old_pos, new_pos, hit)
+    return movement.VERDICT_OK, None
 
 
 async def handle_player_correction(server, writer, packet_or_data):
     # If client tries to send correction, disconnect them
-    player_id = server.clients.get(writer, "unknown")
-    print(f"[SECURITY] {player_id} attempted to send PLAYER_CORRECTION. Disconnecting.")
-    if writer in server.clients:
-        del server.clients[writer]
+    player_id = server.sessions.player_id(writer) or "unknown"
+    logger.warning("[SECURITY] %s attempted to send PLAYER_CORRECTION. Disconnecting.", player_id)
+    drop_session(server, writer)
     writer.close()
     await writer.wait_closed()
@@ -1,30 +1,233 @@
-import json
+import asyncio
+import time
 from protocol import PacketType
+from snapshots import diff_snapshots
+from wire import EncodedPacket
+from outbound import deliver
+from . import npc as npc_handlers
+from . import player as player_handlers
+from . import broadcast as broadcast_handlers
+import log
 
+logger = log.get_logger(__name__)
 
-async def broadcast_world_state(server):
-    players = [
+# World broadcast modes.
+# "tick": moves only mark the world dirty; one coalesced WORLD_UPDATE goes out
+#         per simulation tick (see world_tick_loop).
+# "per_move": legacy behaviour, a full WORLD_UPDATE after every accepted move.
+BROADCAST_TICK = "tick"
+BROADCAST_PER_MOVE = "per_move"
+
+
+def normalize(packet_or_data):
+    if hasattr(packet_or_data, "_data"):
+        return packet_or_data.to_data()
+    return packet_or_data.get("data", {}) if isinstance(packet_or_data, dict) else dict()
+
+
+def player_entries(positions):
+    return [
         {"id": pid, "x": pos[0], "y": pos[1], "z": pos[2]}
-        for pid, pos in server.client_positions.items()
+        for pid, pos in positions.items()
     ]
-    packet = json.dumps({
-        "id": PacketType.WORLD_UPDATE,
-        "data": {"players": players}
-    }) + "\n"
 
-    print(f"[BROADCAST] {len(players)} players")
+
+def visible_players(server, writer):
+    """Player ids within view_radius of writer's player, or None when interest management is off."""
+    if server.player_grid is None:
+        return None
+    pos = server.player_grid.position(server.sessions.player_id(writer))
+    if pos is None:
+        return set()
+    return server.player_grid.query(pos[0], pos[1], server.view_radius)
+
+
+def filter_snapshot(snapshot, visible):
+    if visible is None:
+        return snapshot
+    return {eid: snapshot[eid] for eid in visible if eid in snapshot}
+
+
+async def update_interest(server, player_ids):
+    """Move players in the interest grid and refresh which NPCs they can see."""
+    if server.player_grid is None:
+        return
+    for pid in player_ids:
+        session = server.sessions.by_player(pid)
+        if session is None:
+            server.player_grid.remove(pid)
+            continue
+        x, _, z = session.position
+        server.player_grid.update(pid, x, z)
+        if server.npc_grid is not None:
+            await npc_handlers.refresh_npc_interest(server, session.writer, x, z)
+
+
+async def broadcast_world_state(server):
+    positions = server.sessions.positions()
+    shared = EncodedPacket(PacketType.WORLD_UPDATE, {"players": player_entries(positions)})
+
+    logger.debug("[BROADCAST] %s players", len(shared.data['players']))
 
     dead_clients = []
-    for w in list(server.clients.keys()):
+    for w in server.sessions.writers():
+        visible = visible_players(server, w)
+        packet = shared
+        if visible is not None:
+            packet = EncodedPacket(PacketType.WORLD_UPDATE, {
+                "players": player_entries(filter_snapshot(positions, visible))
+            })
         try:
-            w.write(packet.encode())
-            await w.drain()
+            deliver(server, w, packet)
         except Exception as e:
-            print(f"[ERROR] Broadcast to client failed: {e}")
+            logger.error("[ERROR] Broadcast to client failed: %s", e)
             dead_clients.append(w)
 
+    remove_dead_clients(server, dead_clients)
+
+
+def remove_dead_clients(server, dead_clients):
+    broadcast_handlers.remove_dead_clients(server, dead_clients)
     for w in dead_clients:
-        player_id = server.clients.pop(w, None)
-        if player_id and player_id in server.client_positions:
-            del server.client_positions[player_id]
-            print(f"[CLEANUP] Removed dead client {player_id}")
+        forget_client(server, w)
+
+
+def forget_client(server, writer):
+    """Drop per-connection world state (delta baselines, interest sets)."""
+    server.world_acks.pop(writer, None)
+    server.world_sent.pop(writer, None)
+    server.world_keyframes.pop(writer, None)
+    server.world_visible.pop(writer, None)
+    for npc_id in server.visible_npcs.pop(writer, ()):
+        server.npc_watchers.get(npc_id, set()).discard(writer)
+
+
+def world_packet(seq, baseline_seq, baseline, view):
+    """Build the WORLD_UPDATE (no baseline) or WORLD_DELTA turning baseline into view.
+
+    Returns None when the delta would be empty.
+    """
+    if baseline_seq is None:
+        return EncodedPacket(PacketType.WORLD_UPDATE, {"seq": seq, "players": player_entries(view)})
+    changed, removed = diff_snapshots(baseline, view)
+    if not changed and not removed:
+        return None
+    return EncodedPacket(PacketType.WORLD_DELTA, {
+        "seq": seq, "baseline": baseline_seq, "players": player_entries(changed), "removed": removed
+    })
+
+
+async def send_world_deltas(server):
+    """Send every client the newest snapshot, diffed against its acked baseline.
+
+    Clients without a usable baseline (new, never acked, or baseline evicted
+    from history) and clients due for a periodic keyframe get a full
+    WORLD_UPDATE. With interest management on, each client's view (and the
+    view its baseline was built from) is limited to players within
+    view_radius, so players entering or leaving view show up as added or
+    removed. Without it, packets come from the snapshot history's shared
+    cache, so clients sharing a baseline cost one serialization per encoding.
+    """
+    history = server.world_history
+    seq = history.seq
+    current = history.latest
+    if current is None:
+        return
+
+    dead_clients = []
+    for w in server.sessions.writers():
+        if server.world_sent.get(w, 0) >= seq:
+            continue
+
+        acked = server.world_acks.get(w, 0)
+        baseline = history.get(acked)
+        visible = visible_players(server, w)
+        if visible is not None:
+            # Remember what this client could see at each seq so later deltas
+            # can rebuild the exact view it acked.
+            seen = server.world_visible.setdefault(w, {})
+            seen[seq] = frozenset(visible)
+            for old in [s for s in seen if s <= seq - history.size]:
+                del seen[old]
+            if baseline is not None:
+                base_visible = seen.get(acked)
+                baseline = None if base_visible is None else filter_snapshot(baseline, base_visible)
+        if baseline is None or seq - server.world_keyframes.get(w, 0) >= server.keyframe_interval:
+            acked = None
+
+        if visible is None:
+            packet = history.cached(acked, lambda: world_packet(seq, acked, baseline, current))
+        else:
+            packet = world_packet(seq, acked, baseline, filter_snapshot(current, visible))
+        if packet is None:
+            # Nothing this client can see changed; its baseline stays valid
+            server.world_sent[w] = seq
+            continue
+
+        try:
+            deliver(server, w, packet)
+        except Exception as e:
+            logger.error("[ERROR] World delta to client failed: %s", e)
+            dead_clients.append(w)
+            continue
+
+        server.world_sent[w] = seq
+        if acked is None:
+            server.world_keyframes[w] = seq
+
+    remove_dead_clients(server, dead_clients)
+
+
+async def handle_world_ack(server, writer, packet_or_data):
+    """Client confirms it applied snapshot `seq`; use it as the next baseline."""
+    data = normalize(packet_or_data)
+    try:
+        seq = int(data.get("seq", 0))
+    except (TypeError, ValueError):
+        return
+    # Ignore acks for snapshots we never sent to this client
+    if 0 < seq <= server.world_sent.get(writer, 0) and seq > server.world_acks.get(writer, 0):
+        server.world_acks[writer] = seq
+
+
+async def world_changed(server, player_id):
+    """Record that player_id was added, moved or removed.
+
+    In per_move mode this broadcasts immediately; in tick mode the change is
+    coalesced into the next world tick.
+    """
+    if server.broadcast_mode == BROADCAST_PER_MOVE:
+        await update_interest(server, [player_id])
+        await broadcast_world_state(server)
+    else:
+        server.dirty_players.add(player_id)
+
+
+async def world_tick(server):
+    """Run one simulation tick: validate queued moves, then flush a single
+    world update if anything changed."""
+    await player_handlers.process_moves(server)
+    dirty = server.dirty_players
+    if dirty:
+        server.dirty_players = set()
+        await update_interest(server, dirty)
+
+    if server.delta_compression:
+        if dirty:
+            server.world_history.push(server.sessions.positions())
+        await send_world_deltas(server)
+    elif dirty:
+        await broadcast_world_state(server)
+
+
+async def world_tick_loop(server):
+    """Fixed-rate tick driving world snapshots at server.tick_rate Hz."""
+    while True:
+        interval = 1.0 / server.tick_rate
+        start = time.perf_counter()
+        try:
+            await world_tick(server)
+        except Exception as e:
+            logger.error("[ERROR] World tick failed: %s", e)
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(max(0, interval - elapsed))
@@ -0,0 +1,75 @@
+# interest.py
+"""Uniform-grid spatial index used for area-of-interest filtering.
+
+Entities are bucketed by (x, z) into square cells of `cell_size`, clamped to
+the map's world_bounds. With cell_size >= view radius a radius query only has
+to look at the 3x3 block of cells around the centre.
+"""
+import math
+
+
+class InterestGrid:
+    def __init__(self, world_bounds, cell_size):
+        self.min_x = world_bounds["min_x"]
+        self.min_z = world_bounds["min_z"]
+        self.cell_size = float(cell_size)
+        self.cols = max(1, math.ceil((world_bounds["max_x"] - self.min_x) / self.cell_size))
+        self.rows = max(1, math.ceil((world_bounds["max_z"] - self.min_z) / self.cell_size))
+        self._cells = {}  # (col, row) -> set of entity ids
+        self._entity_cell = {}  # entity id -> (col, row)
+        self._positions = {}  # entity id -> (x, z)
+
+    def __contains__(self, entity_id):
+        return entity_id in self._positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell_of(self, x, z):
+        col = int((x - self.min_x) // self.cell_size)
+        row = int((z - self.min_z) // self.cell_size)
+        return min(max(col, 0), self.cols - 1), min(max(row, 0), self.rows - 1)
+
+    def update(self, entity_id, x, z):
+        """Insert or move an entity. Only touches cell sets when it changes cell."""
+        self._positions[entity_id] = (x, z)
+        cell = self._cell_of(x, z)
+        old = self._entity_cell.get(entity_id)
+        if old == cell:
+            return
+        if old is not None:
+            self._discard(entity_id, old)
+        self._entity_cell[entity_id] = cell
+        self._cells.setdefault(cell, set()).add(entity_id)
+
+    def remove(self, entity_id):
+        self._positions.pop(entity_id, None)
+        old = self._entity_cell.pop(entity_id, None)
+        if old is not None:
+            self._discard(entity_id, old)
+
+    def _discard(self, entity_id, cell):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(entity_id)
+            if not members:
+                del self._cells[cell]
+
+    def position(self, entity_id):
+        return self._positions.get(entity_id)
+
+    def query(self, x, z, radius):
+        """Return the set of entity ids within `radius` of (x, z) on the XZ plane."""
+        c0, r0 = self._cell_of(x - radius, z - radius)
+        c1, r1 = self._cell_of(x + radius, z + radius)
+        r2 = radius * radius
+        found = set()
+        positions = self._positions
+        for col in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                for eid in self._cells.get((col, row), ()):
+                    ex, ez = positions[eid]
+                    dx, dz = ex - x, ez - z
+                    if dx * dx + dz * dz <= r2:
+                        found.add(eid)
+        return found
@@ -0,0 +1,88 @@
+# log.py
+"""Leveled server logging.
+
+Modules get a logger with `log.get_logger(__name__)` and keep the usual
+`[TAG] message` style, passing arguments instead of f-strings so nothing is
+formatted unless the level is enabled:
+
+    logger.debug("[RECV] From %s: %s", addr, message)
+
+configure() routes every record through a QueueHandler that enqueues it
+unformatted, message arguments and all, so the event loop only enqueues; the
+QueueListener thread formats it and writes it to stdout. Arguments are
+therefore rendered a moment later, off the loop: pass values, not objects
+that are about to change.
+Per-packet trace lines go through a Sampler, which checks the level first
+and then lets through one call in `every`.
+
+The level comes from configure(level=...) or the LOG_LEVEL environment
+variable (default INFO); LOG_SAMPLE sets the default sampling interval.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+ROOT = "wildwest"
+DEFAULT_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE", "100"))
+
+_listener = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # The stock prepare() formats the record here, on the calling thread;
+        # leave that to the listener's handler
+        return record
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def configure(level=None, stream=None):
+    """Install the non-blocking queue handler on the server's root logger (idempotent)."""
+    global _listener
+    root = logging.getLogger(ROOT)
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if _listener is not None:
+        return root
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    records = queue.SimpleQueue()
+    root.addHandler(_QueueHandler(records))
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    atexit.register(shutdown)
+    return root
+
+
+def shutdown():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class Sampler:
+    """Logs one call in `every` at `level`; costs one level check when disabled."""
+
+    def __init__(self, logger, every=DEFAULT_SAMPLE_EVERY, level=logging.DEBUG):
+        self.logger = logger
+        self.every = max(1, every)
+        self.level = level
+        self._count = 0
+
+    def __call__(self, msg, *args):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        self._count += 1
+        if (self._count - 1) % self.every:
+            return
+        self.logger.log(self.level, msg, *args)
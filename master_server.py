@@ -7,29 +7,59 @@ import time
 import math
 import threading 
 import os
-import hmac
-import hashlib
 from protocol import PacketType
 from packets import parse_raw_packet
 from generated import chatservice_pb2, chatservice_pb2_grpc
-from chat import start_chat_server, ChatManager # ChatManager added
+from chat import start_chat_server, ChatManager, ChatServiceServicer # ChatManager added
 from handlers import player as player_handlers
 from handlers import chat as chat_handlers
 from handlers import world as world_handlers
 from handlers import npc as npc_handlers
+from handlers import connection as connection_handlers
 from NPCService import serve as npc_serve
+from snapshots import SnapshotHistory
+from interest import InterestGrid
+import wire
+import outbound
+from dispatch import Dispatcher
+import terrain
+import movement
+from sessions import SessionTable
+from colliders import load_colliders
+import log
+
+logger = log.get_logger(__name__)
+# Per-packet receive trace: DEBUG only, and sampled (see log.Sampler)
+trace_recv = log.Sampler(logger)
+
+DEFAULT_HEIGHT = 6.989525
+
+
+def build_dispatcher():
+    """Packet routes, built once per server (see dispatch.py)."""
+    dispatcher = Dispatcher()
+    dispatcher.register(PacketType.PING, connection_handlers.handle_ping)
+    dispatcher.register(PacketType.PLAYER_JOIN, player_handlers.handle_player_join)
+    dispatcher.register(PacketType.PLAYER_MOVE, player_handlers.handle_player_move)
+    dispatcher.register(PacketType.PLAYER_CORRECTION, player_handlers.handle_player_correction)
+    dispatcher.register(PacketType.CHAT, chat_handlers.handle_chat)
+    dispatcher.register(PacketType.WORLD_ACK, world_handlers.handle_world_ack)
+    dispatcher.register(PacketType.ENCODING_SWITCH, connection_handlers.handle_encoding_switch)
+    # Handshake: PLAYER_JOIN must answer this connection's HANDSHAKE_CHALLENGE
+    dispatcher.add_pre(connection_handlers.verify_join, [PacketType.PLAYER_JOIN])
+    return dispatcher
+
 
 class MasterServer:
-    def __init__(self):
-        self.clients = {}  # writer -> player_id
-        self.client_positions = {}  # player_id -> (x, y, z)
-        # New: Track last move time for velocity/speed check
-        self.last_move_times = {} # player_id -> timestamp
-        # writer registry for quick lookup: player_id -> writer
-        self.writers_by_id = {}
-        # nicknames
-        self.nicknames = {}  # player_id -> nickname
-        self.nickname_to_id = {}  # nickname -> player_id
+    def __init__(self, tick_rate=20, broadcast_mode=world_handlers.BROADCAST_TICK,
+                 delta_compression=True, keyframe_interval=100, view_radius=None,
+                 send_queue_limit=256, send_queue_policy=outbound.OVERFLOW_DROP_OLDEST,
+                 npc_batching=True, npc_quantum=None, heightmap=None,
+                 colliders=None, move_batching=True, position_precision=None):
+        # One record per connection: handshake nonce, player id, nickname,
+        # position and last move time (see sessions.py)
+        self.handles = wire.HandleTable()  # entity id <-> binary handle / session entity_id
+        self.sessions = SessionTable(self.handles)
         
         self.spawn_points = [
             (208.6597, 6.989525, 545.12),  # spawnpoint1
@@ -40,6 +70,9 @@ class MasterServer:
         self.chat_stub = None
         # Pass 'self' (the master_server) and None (for the chat_stub, to be set later)
         self.chat = ChatManager(self, None) 
+        # Relayed chat channels and the ones players start in (see handlers/chat.py)
+        self.chat_channels = chat_handlers.CHAT_CHANNELS
+        self.chat_autojoin = chat_handlers.AUTOJOIN_CHANNELS
         
         # World Sanity checks
         # Max speed in units/second. Set to a reasonable sprint speed.
@@ -54,24 +87,92 @@ class MasterServer:
             "max_y": 50,
         }
         
-        self.heightmap = None
-        self.colliders = []
-
-        # Handshake state: writer -> nonce
-        self.handshake_nonces = {}
+        # Inbound moves: latest per player, validated in one batch per tick
+        # (see handlers/player.process_moves); False validates each on arrival.
+        # per_move broadcasting needs moves applied as they arrive, so it
+        # always validates each on arrival.
+        self.move_batching = move_batching and broadcast_mode != world_handlers.BROADCAST_PER_MOVE
+        self.pending_moves = {}  # player_id -> (writer, (x, y, z), received_at)
+        self.move_stats = movement.MoveStats()
+
+        # World snapshot tick (see handlers/world.py)
+        self.tick_rate = tick_rate  # Hz
+        self.broadcast_mode = broadcast_mode  # "tick" or "per_move"
+        self.dirty_players = set()  # player ids changed since the last tick
+        # Delta-compressed snapshots against per-client acked baselines
+        self.delta_compression = delta_compression
+        self.keyframe_interval = keyframe_interval  # snapshots between forced full updates
+        self.world_history = SnapshotHistory()
+        self.world_acks = {}  # writer -> last acked snapshot seq
+        self.world_sent = {}  # writer -> last snapshot seq sent
+        self.world_keyframes = {}  # writer -> seq of last full snapshot sent
+
+        # Area-of-interest filtering: clients only receive players/NPCs within
+        # view_radius (world units). None disables it and broadcasts everything.
+        self.view_radius = view_radius
+        self.player_grid = InterestGrid(self.world_bounds, view_radius) if view_radius else None
+        self.npc_grid = InterestGrid(self.world_bounds, view_radius) if view_radius else None
+        self.world_visible = {}  # writer -> {seq: frozenset of visible player ids}
+        self.visible_npcs = {}  # writer -> set of npc ids spawned on that client
+        self.npc_watchers = {}  # npc_id -> set of writers that have it spawned
+        # NPC ticks go out as one NPC_BATCH_UPDATE per client (False: one
+        # NPC_UPDATE per NPC). npc_quantum (world units) quantizes batched
+        # positions and skips NPCs whose quantized position didn't change.
+        self.npc_batching = npc_batching
+        self.npc_quantum = npc_quantum
+        self.npc_sent = {}  # npc_id -> last batched quantized position
+
+        # terrain.Heightmap / TiledHeightmap; None keeps the flat spawn-area height
+        self.heightmap = heightmap
+        # colliders.ColliderGrid of static scene boxes; None means open terrain
+        self.colliders = colliders
+
+        # Wire encodings offered in HANDSHAKE_CHALLENGE (see wire.py)
+        self.encodings = list(wire.ENCODINGS)
+        self.codecs = {}  # writer -> codec negotiated at join (JSON if absent)
+        # position_precision (centimetres) sends binary snapshot positions as
+        # 16-bit steps from the world_bounds minimum instead of float32
+        self.quantizer = (wire.PositionQuantizer.for_bounds(self.world_bounds, position_precision)
+                          if position_precision else None)
+        # Per-connection send queues (see outbound.py); broadcasts only enqueue
+        self.send_queue_limit = send_queue_limit
+        self.send_queue_policy = send_queue_policy
+        self.outboxes = {}  # writer -> ClientOutbox
+        self.outbox_stats = outbound.OutboxStats()
         # Server secret for HMAC (in a real deployment store this securely)
         self.server_secret = "dev-secret-change-me"
+        self.dispatcher = build_dispatcher()
         
     def get_height_at(self, x, z):
-        """Placeholder for heightmap lookup."""
-        # For the spawn area (around z=545), a height of 6.989525 seems right.
-        # This function would normally use bilinear interpolation on your heightmap data.
-        return 6.989525
+        """Terrain height at (x, z), bilinearly interpolated from the heightmap."""
+        if self.heightmap is None:
+            # No terrain loaded: flat at the spawn area's height (around z=545)
+            return DEFAULT_HEIGHT
+        return self.heightmap.height_at(x, z)
     
+    def heights_at(self, xs, zs):
+        """Batched get_height_at: one height per (x, z) pair."""
+        if self.heightmap is None:
+            return [DEFAULT_HEIGHT] * len(xs)
+        return self.heightmap.heights_at(xs, zs)
+
     def is_inside_collider(self, x, y, z):
-        """Placeholder for detailed collider check."""
-        # This function would normally use 3D geometry tests (e.g., raycasting, point-in-mesh)
-        return False
+        """True when (x, y, z) is inside a scene collider."""
+        if self.colliders is None:
+            return False
+        return self.colliders.contains(x, y, z)
+
+    def colliders_contain(self, xs, ys, zs):
+        """Batched is_inside_collider: one bool per point."""
+        if self.colliders is None:
+            return [False] * len(xs)
+        return self.colliders.contains_many(xs, ys, zs)
+
+    def collider_hit(self, p0, p1):
+        """Fraction along p0 -> p1 where it first enters a collider, or None."""
+        if self.colliders is None:
+            return None
+        return self.colliders.segment_hit(p0, p1)
         
     
     async def init_chat_stub(self):
@@ -80,19 +181,44 @@ class MasterServer:
         self.chat_stub = chatservice_pb2_grpc.ChatServiceStub(channel)
         self.chat.stub = self.chat_stub # Inject the stub into the ChatManager
 
-        print("[CHAT] gRPC stub initialized")
+        logger.info("[CHAT] gRPC stub initialized")
 
     async def handle_client(self, reader, writer):
         addr = writer.get_extra_info("peername")
-        print(f"[CONNECT] {addr}")
+        logger.info("[CONNECT] %s", addr)
+        outbox = self.outboxes[writer] = outbound.ClientOutbox(
+            writer, self.send_queue_limit, self.send_queue_policy, self.outbox_stats)
+        outbox.start()
 
         # Issue handshake challenge (nonce) immediately on new connection
         nonce = os.urandom(16).hex()
-        self.handshake_nonces[writer] = nonce
-        await self.send(writer, PacketType.HANDSHAKE_CHALLENGE, {"nonce": nonce})
+        self.sessions.connect(writer).nonce = nonce
+        await self.send(writer, PacketType.HANDSHAKE_CHALLENGE, {"nonce": nonce, "encodings": self.encodings})
 
         try:
             while True:
+                # Inbound switches on the client's ENCODING_SWITCH, not at join:
+                # its packets sent before PLAYER_ID_ASSIGNED arrived are still JSON
+                session = self.sessions.get(writer)
+                if session is not None and session.inbound_encoding == wire.ENCODING_BINARY:
+                    try:
+                        frame = await wire.read_frame(reader)
+                    except asyncio.IncompleteReadError:
+                        break
+                    except ValueError as e:  # oversized frame: drop the client
+                        logger.warning("[WIRE] Closing %s: %s", addr, e)
+                        break
+                    if frame is None:
+                        break
+                    packet_id, payload = frame
+                    trace_recv("[RECV] From %s: packet %s (%s bytes)", addr, packet_id, len(payload))
+                    try:
+                        packet = parse_raw_packet({"id": packet_id, "data": wire.decode_payload(packet_id, payload)})
+                        await self.handle_packet(packet, writer)
+                    except Exception as e:
+                        logger.error("[ERROR] Failed to process packet from %s: %s", addr, e)
+                    continue
+
                 data = await reader.readline()
                 if not data:
                     break
@@ -101,108 +227,50 @@ class MasterServer:
                 if not message:
                     continue
 
-                print(f"[RECV] From {addr}: {message}")
+                trace_recv("[RECV] From %s: %s", addr, message)
                 try:
                     packet_raw = json.loads(message)
                     packet = parse_raw_packet(packet_raw)
                     # pass either the object (preferred) or raw dict to keep compatibility
                     await self.handle_packet(packet, writer)
                 except Exception as e:
-                    print(f"[ERROR] Failed to process packet from {addr}: {e}")
+                    logger.error("[ERROR] Failed to process packet from %s: %s", addr, e)
 
         finally:
             # Cleanup on disconnect
-            player_id = self.clients.get(writer)
+            player_id = connection_handlers.drop_session(self, writer)
             if player_id:
-                print(f"[DISCONNECT] {addr}, player {player_id}")
-                if player_id in self.client_positions:
-                    del self.client_positions[player_id]
-                if player_id in self.last_move_times:
-                    del self.last_move_times[player_id] # Clean up time data
-                del self.clients[writer]
-                await self.broadcast_world_state()
+                logger.info("[DISCONNECT] %s, player %s", addr, player_id)
+                await self.world_changed(player_id)
+            world_handlers.forget_client(self, writer)
+            self.codecs.pop(writer, None)
+            self.outboxes.pop(writer).close()
             writer.close()
             await writer.wait_closed()
 
     async def handle_packet(self, packet, writer):
         # packet may be a parsed packet object or a raw dict
-        if packet is None:
-            return
-
-        # Normalize accessors
-        if hasattr(packet, "_data"):
-            # parsed packet object
-            data = packet.to_data()
-            packet_id = getattr(packet, "packet_id", packet._data.get("_raw_id"))
-        else:
-            # raw dict fallback
-            packet_id = packet.get("id")
-            data = packet.get("data", {})
-
-        if packet_id == PacketType.PING:
-            await self.send(writer, PacketType.PONG, {"msg": "pong"})
-
-        # Handshake/Authentication: expect PLAYER_JOIN to include 'ts' and 'hmac' proving possession of secret
-        if packet_id == PacketType.PLAYER_JOIN:
-            # Data may be parsed from packet object or dict
-            ts = data.get("ts")
-            proof = data.get("hmac")
-            preferred_id = data.get("preferredId")
-            nonce = self.handshake_nonces.pop(writer, None)
-            if nonce is None:
-                print(f"[AUTH] No handshake nonce for client, rejecting join from {writer}")
-                # Disconnect
-                writer.close()
-                await writer.wait_closed()
-                return
-
-            # Validate timestamp
-            try:
-                ts = int(ts)
-            except Exception:
-                print(f"[AUTH] Invalid timestamp from client, rejecting")
-                writer.close()
-                await writer.wait_closed()
-                return
-
-            now = int(time.time())
-            if abs(now - ts) > 30:
-                print(f"[AUTH] Timestamp outside allowed window: {ts} (now {now})")
-                writer.close()
-                await writer.wait_closed()
-                return
-
-            # Validate HMAC: HMAC_SHA256(server_secret, nonce + preferredId + ts)
-            msg = (nonce + (preferred_id or "") + str(ts)).encode()
-            expected = hmac.new(self.server_secret.encode(), msg, hashlib.sha256).hexdigest()
-            if not proof or not hmac.compare_digest(expected, proof):
-                print(f"[AUTH] HMAC verification failed for client {writer}")
-                writer.close()
-                await writer.wait_closed()
-                return
-
-        # Handler map lookup (overrides inline logic)
-        HANDLERS = {
-            PacketType.PLAYER_JOIN: player_handlers.handle_player_join,
-            PacketType.PLAYER_MOVE: player_handlers.handle_player_move,
-            PacketType.PLAYER_CORRECTION: player_handlers.handle_player_correction,
-            PacketType.CHAT: chat_handlers.handle_chat,
-        }
+        await self.dispatcher.dispatch(self, writer, packet)
 
-        handler = HANDLERS.get(packet_id)
-        if handler:
-            await handler(self, writer, packet if hasattr(packet, "_data") else {"id": packet_id, "data": data})
-            return
-        else:
-            print(f"[ERROR] Unknown packet type: {packet_id}")
-            print(f"[ERROR] Packet data: {packet}")
-            
     # Player move/correction/join logic moved to handlers/player.py
             
     async def send(self, writer, packet_id, data):
-        packet = json.dumps({"id": packet_id, "data": data}) + "\n"
-        writer.write(packet.encode())
-        await writer.drain()
+        # Queued on the client's outbox; its writer task does the drain()
+        outbound.deliver(self, writer, wire.EncodedPacket(packet_id, data))
+
+    def queue_metrics(self):
+        return outbound.queue_metrics(self)
+
+    def packet_metrics(self):
+        return self.dispatcher.metrics()
+
+    def move_metrics(self):
+        return self.move_stats.metrics()
+
+    def chat_metrics(self):
+        metrics = self.chat.metrics()
+        metrics["members"] = self.sessions.channel_sizes()
+        return metrics
 
    
 
@@ -210,6 +278,11 @@ class MasterServer:
         # Delegates to handler implementation
         await world_handlers.broadcast_world_state(self)
 
+    async def world_changed(self, player_id):
+        await world_handlers.world_changed(self, player_id)
+
+    async def world_tick_loop(self):
+        await world_handlers.world_tick_loop(self)
 
     async def broadcast_chat(self, msg):
         # Delegate to handler implementation
@@ -221,17 +294,37 @@ class MasterServer:
     async def broadcast_npc_update(self, npc_id, x, y, z):
         await npc_handlers.broadcast_npc_update(self, npc_id, x, y, z)
 
+    async def broadcast_npc_updates(self, moves):
+        await npc_handlers.broadcast_npc_updates(self, moves)
+
     async def broadcast_npc_despawn(self, npc_id):
         await npc_handlers.broadcast_npc_despawn(self, npc_id)
 
-    async def _broadcast(self, packet):
-        # Delegate to broadcast helper (packet is string)
+    async def _broadcast(self, packet_id, data):
+        # Delegate to broadcast helper (encodes per recipient's wire codec)
         from handlers.broadcast import broadcast_packet
-        await broadcast_packet(self, packet)
+        await broadcast_packet(self, packet_id, data)
 
 async def main():
-    server = MasterServer()
-    await server.init_chat_stub()
+    log.configure()
+    # HEIGHTMAP: path to a terrain descriptor (see terrain.load_heightmap)
+    heightmap_path = os.environ.get("HEIGHTMAP")
+    heightmap = terrain.load_heightmap(heightmap_path) if heightmap_path else None
+    # COLLIDERS: path to a collider export (see colliders.load_colliders)
+    colliders_path = os.environ.get("COLLIDERS")
+    scene_colliders = load_colliders(colliders_path) if colliders_path else None
+    # POSITION_PRECISION: binary position step in centimetres (e.g. 1)
+    precision = os.environ.get("POSITION_PRECISION")
+    server = MasterServer(heightmap=heightmap, colliders=scene_colliders,
+                          position_precision=float(precision) if precision else None)
+    # CHAT_HISTORY_DIR: also keep a segment log of chat lines there (see chat_history.py)
+    chat_servicer = ChatServiceServicer(history_dir=os.environ.get("CHAT_HISTORY_DIR"))
+    # CHAT_TRANSPORT: "local" (default) publishes and listens in-process;
+    # "grpc" goes through the ChatService on port 6000 like any other client
+    if os.environ.get("CHAT_TRANSPORT", "local") == "grpc":
+        await server.init_chat_stub()
+    else:
+        server.chat.use_local(chat_servicer)
 
     # Set the loop first
     server.loop = asyncio.get_running_loop()
@@ -244,20 +337,26 @@ async def main():
 
     # TCP server setup
     tcp_server = await asyncio.start_server(server.handle_client, "127.0.0.1", 5000)
-    print("[SERVER] Running MasterServer on 127.0.0.1:5000")
+    logger.info("[SERVER] Running MasterServer on 127.0.0.1:5000")
 
     # Start Chat gRPC service
-    chat_server_task = asyncio.create_task(start_chat_server(6000))
-    print("[CHAT] Waiting for gRPC ChatService to start...")
+    chat_server_task = asyncio.create_task(start_chat_server(6000, chat_servicer))
+    logger.info("[CHAT] Waiting for gRPC ChatService to start...")
     await asyncio.sleep(0.1)
 
     # Run TCP + Chat + Chat Listener
-    async with tcp_server:
-        await asyncio.gather(
-            tcp_server.serve_forever(),
-            chat_server_task,
-            server.chat.listen(["global", "trade", "guild"])
-        )
+    try:
+        async with tcp_server:
+            await asyncio.gather(
+                tcp_server.serve_forever(),
+                chat_server_task,
+                server.world_tick_loop(),
+                server.chat.listen(list(server.chat_channels)),
+                chat_servicer.history.flush_loop()
+            )
+    finally:
+        # Write out the chat lines the history log has not flushed yet
+        chat_servicer.history.close()
 
 
 if __name__ == "__main__":
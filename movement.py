@@ -0,0 +1,111 @@
+# movement.py
+"""Per-tick batched checks for queued player moves.
+
+handle_player_move only records each player's latest PLAYER_MOVE; once per
+simulation tick handlers.player.process_moves validates every queued move
+together. The cheap per-move checks (speed / teleport distance, world
+bounds, height against the terrain) run here as array math over the whole
+batch, with a single batched heightmap lookup; only moves that pass go on
+to the per-move terrain and collider sweeps.
+
+MoveStats counts what came in and why moves were rejected, per reason and
+per player, for cheat detection.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+VERDICT_OK = "ok"
+VERDICT_SPEED = "speed"
+VERDICT_TELEPORT = "teleport"
+VERDICT_BOUNDS = "bounds"
+VERDICT_HEIGHT = "height"
+VERDICT_TERRAIN = "terrain"
+VERDICT_COLLIDER = "collider"
+
+SPEED_TOLERANCE = 1.5  # accepted speed is up to max_speed * SPEED_TOLERANCE
+MIN_ELAPSED = 0.001  # moves closer together than this are checked by distance
+TELEPORT_WINDOW = 0.2  # max distance for such moves is max_speed * TELEPORT_WINDOW
+VERTICAL_TOLERANCE = 5.0
+
+
+class MoveStats:
+    __slots__ = ("received", "superseded", "accepted", "batches", "largest_batch", "rejected", "offenders")
+
+    def __init__(self):
+        self.received = 0
+        self.superseded = 0  # queued moves replaced by a newer one before the tick
+        self.accepted = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.rejected = {}  # verdict -> count
+        self.offenders = {}  # player_id -> rejected moves this session
+
+    def reject(self, player_id, verdict):
+        self.rejected[verdict] = self.rejected.get(verdict, 0) + 1
+        self.offenders[player_id] = self.offenders.get(player_id, 0) + 1
+
+    def forget(self, player_id):
+        self.offenders.pop(player_id, None)
+
+    def metrics(self, top=10):
+        worst = sorted(self.offenders.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            "received": self.received,
+            "superseded": self.superseded,
+            "accepted": self.accepted,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "rejected": dict(self.rejected),
+            "top_offenders": worst,
+        }
+
+
+def check_moves(server, olds, news, elapsed):
+    """Speed, bounds and height verdicts for a batch of moves.
+
+    olds/news are (x, y, z) positions and elapsed the seconds since each
+    player's last accepted move. Returns (verdicts, expected_ys).
+    """
+    if np is None:
+        return check_moves_scalar(server, olds, news, elapsed)
+    old = np.asarray(olds, dtype=np.float64).reshape(-1, 3)
+    new = np.asarray(news, dtype=np.float64).reshape(-1, 3)
+    elapsed = np.asarray(elapsed, dtype=np.float64)
+    x, y, z = new[:, 0], new[:, 1], new[:, 2]
+
+    dist = np.linalg.norm(new - old, axis=1)
+    timed = elapsed > MIN_ELAPSED
+    too_fast = timed & (dist > server.max_speed * SPEED_TOLERANCE * elapsed)
+    teleport = ~timed & (dist > server.max_speed * TELEPORT_WINDOW)
+    wb = server.world_bounds
+    outside = ~((wb["min_x"] <= x) & (x <= wb["max_x"]) & (wb["min_y"] <= y) & (y <= wb["max_y"])
+                & (wb["min_z"] <= z) & (z <= wb["max_z"]))
+    expected_y = np.asarray(server.heights_at(x, z), dtype=np.float64)
+    bad_height = np.abs(y - expected_y) > VERTICAL_TOLERANCE
+
+    verdicts = np.select([too_fast, teleport, outside, bad_height],
+                         [VERDICT_SPEED, VERDICT_TELEPORT, VERDICT_BOUNDS, VERDICT_HEIGHT], VERDICT_OK)
+    return verdicts.tolist(), expected_y.tolist()
+
+
+def check_moves_scalar(server, olds, news, elapsed):
+    wb = server.world_bounds
+    expected_ys = list(server.heights_at([p[0] for p in news], [p[2] for p in news]))
+    verdicts = []
+    for old, (x, y, z), dt, expected_y in zip(olds, news, elapsed, expected_ys):
+        dist = math.dist(old, (x, y, z))
+        if dt > MIN_ELAPSED:
+            verdict = VERDICT_SPEED if dist > server.max_speed * SPEED_TOLERANCE * dt else VERDICT_OK
+        else:
+            verdict = VERDICT_TELEPORT if dist > server.max_speed * TELEPORT_WINDOW else VERDICT_OK
+        if verdict == VERDICT_OK and not (wb["min_x"] <= x <= wb["max_x"] and wb["min_y"] <= y <= wb["max_y"]
+                                          and wb["min_z"] <= z <= wb["max_z"]):
+            verdict = VERDICT_BOUNDS
+        if verdict == VERDICT_OK and abs(y - expected_y) > VERTICAL_TOLERANCE:
+            verdict = VERDICT_HEIGHT
+        verdicts.append(verdict)
+    return verdicts, expected_ys
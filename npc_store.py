@@ -0,0 +1,236 @@
+# npc_store.py
+"""NPC state storage and the per-tick wander step.
+
+NPCService keeps its NPCs in `self.npcs`. Without NumPy that is a plain dict
+of per-NPC dicts, moved one by one in Python. With NumPy it is an
+ArrayNpcStore: x/y/z/yaw/speed/state live in contiguous arrays (one row per
+NPC), so wander, bounds reflection, height sampling and collider checks run
+as a handful of vectorized operations over every NPC at once.
+
+The array store still behaves like the dict: `store[npc_id]` is a live,
+dict-like view of that NPC's row, so handle_player_join, the NPC handlers
+and the gRPC RPCs work unchanged.
+"""
+import math
+import random
+import threading
+from collections.abc import MutableMapping
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+# Heading change per second, radians (uniform in +-WANDER_TURN)
+WANDER_TURN = 0.6
+DEFAULT_SPEED = 1.5
+
+ARRAY_FIELDS = ("x", "y", "z", "yaw", "speed")
+
+
+def make_npc_store(vectorized=None):
+    """ArrayNpcStore when NumPy is available (or vectorized=True), else a dict."""
+    if vectorized is False or (vectorized is None and np is None):
+        return {}
+    if np is None:
+        raise RuntimeError("vectorized NPC store requires numpy")
+    return ArrayNpcStore()
+
+
+def step_npcs(npcs, dt, server):
+    """Advance every NPC one wander step; returns [(npc_id, x, y, z), ...] of NPCs that moved."""
+    if isinstance(npcs, ArrayNpcStore):
+        return npcs.step(dt, server)
+    return step_dict_npcs(npcs, dt, server)
+
+
+def step_dict_npcs(npcs, dt, server):
+    wb = server.world_bounds
+    moves = []
+    for npc_id, npc in list(npcs.items()):
+        # wandering heading change
+        npc['yaw'] = npc.get('yaw', random.random() * 2 * math.pi) + random.uniform(-WANDER_TURN, WANDER_TURN) * dt
+        speed = npc.get('speed', DEFAULT_SPEED)
+        new_x = npc['x'] + math.cos(npc['yaw']) * speed * dt
+        new_z = npc['z'] + math.sin(npc['yaw']) * speed * dt
+        new_y = server.get_height_at(new_x, new_z)
+
+        # Bounds check
+        if not (wb["min_x"] <= new_x <= wb["max_x"] and wb["min_z"] <= new_z <= wb["max_z"]):
+            npc['yaw'] += math.pi  # reverse direction
+            continue
+
+        # Collider check
+        if server.is_inside_collider(new_x, new_y, new_z):
+            npc['yaw'] += math.pi / 2
+            continue
+
+        npc.update({"x": new_x, "y": new_y, "z": new_z, "state": "walking"})
+        moves.append((npc_id, new_x, new_y, new_z))
+    return moves
+
+
+class NpcView(MutableMapping):
+    """Dict-like view of one NPC's row in an ArrayNpcStore."""
+
+    __slots__ = ("_store", "_npc_id")
+
+    def __init__(self, store, npc_id):
+        self._store = store
+        self._npc_id = npc_id
+
+    def __getitem__(self, key):
+        return self._store._get_field(self._npc_id, key)
+
+    def __setitem__(self, key, value):
+        self._store._set_field(self._npc_id, key, value)
+
+    def update(self, *args, **kwargs):
+        # One lock hold, so step() never sees (or overwrites) half an update
+        with self._store._lock:
+            super().update(*args, **kwargs)
+
+    def __delitem__(self, key):
+        if key in ARRAY_FIELDS or key == "state":
+            raise KeyError(f"cannot delete array field {key!r}")
+        with self._store._lock:
+            del self._store._extra[self._store._rows[self._npc_id]][key]
+
+    def __iter__(self):
+        yield from ARRAY_FIELDS
+        yield "state"
+        yield from self._store._extra[self._store._rows[self._npc_id]]
+
+    def __len__(self):
+        return len(ARRAY_FIELDS) + 1 + len(self._store._extra[self._store._rows[self._npc_id]])
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ArrayNpcStore(MutableMapping):
+    """Structure-of-arrays NPC store; rows [0, len) are live, removal swaps in the last row."""
+
+    def __init__(self, capacity=64, seed=None):
+        self._lock = threading.RLock()  # gRPC RPCs mutate from worker threads
+        self._ids = []  # row -> npc_id
+        self._rows = {}  # npc_id -> row
+        self._extra = []  # row -> dict of non-array fields (name, type, ...)
+        self._state_names = ["idle", "walking"]
+        self._state_codes = {name: i for i, name in enumerate(self._state_names)}
+        self._arrays = {name: np.zeros(capacity) for name in ARRAY_FIELDS}
+        self._arrays["state"] = np.zeros(capacity, dtype=np.int16)
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(list(self._ids))
+
+    def __contains__(self, npc_id):
+        return npc_id in self._rows
+
+    def __getitem__(self, npc_id):
+        if npc_id not in self._rows:
+            raise KeyError(npc_id)
+        return NpcView(self, npc_id)
+
+    def __setitem__(self, npc_id, data):
+        with self._lock:
+            if npc_id not in self._rows:
+                self._append(npc_id)
+            for key, value in dict(data).items():
+                self._set_field(npc_id, key, value)
+
+    def __delitem__(self, npc_id):
+        with self._lock:
+            row = self._rows.pop(npc_id)
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                for arr in self._arrays.values():
+                    arr[row] = arr[last]
+                self._ids[row] = moved
+                self._extra[row] = self._extra[last]
+                self._rows[moved] = row
+            self._ids.pop()
+            self._extra.pop()
+
+    def column(self, name):
+        """Live array of a field for rows [0, len)."""
+        return self._arrays[name][:len(self._ids)]
+
+    def _append(self, npc_id):
+        row = len(self._ids)
+        if row == len(self._arrays["x"]):
+            for name, arr in self._arrays.items():
+                grown = np.zeros(row * 2, dtype=arr.dtype)
+                grown[:row] = arr
+                self._arrays[name] = grown
+        for arr in self._arrays.values():
+            arr[row] = 0
+        self._arrays["speed"][row] = DEFAULT_SPEED
+        self._arrays["yaw"][row] = self._rng.random() * 2 * math.pi
+        self._ids.append(npc_id)
+        self._extra.append({})
+        self._rows[npc_id] = row
+
+    def _state_code(self, name):
+        code = self._state_codes.get(name)
+        if code is None:
+            code = self._state_codes[name] = len(self._state_names)
+            self._state_names.append(name)
+        return code
+
+    def _get_field(self, npc_id, key):
+        with self._lock:  # a removal may move npc_id to another row
+            row = self._rows[npc_id]
+            if key in ARRAY_FIELDS:
+                return float(self._arrays[key][row])
+            if key == "state":
+                return self._state_names[self._arrays["state"][row]]
+            return self._extra[row][key]
+
+    def _set_field(self, npc_id, key, value):
+        with self._lock:
+            row = self._rows[npc_id]
+            if key in ARRAY_FIELDS:
+                self._arrays[key][row] = value
+            elif key == "state":
+                self._arrays["state"][row] = self._state_code(value)
+            else:
+                self._extra[row][key] = value
+
+    def step(self, dt, server):
+        """Vectorized equivalent of step_dict_npcs over every row."""
+        with self._lock:
+            n = len(self._ids)
+            if not n:
+                return []
+            x, y, z = self.column("x"), self.column("y"), self.column("z")
+            yaw, speed = self.column("yaw"), self.column("speed")
+
+            yaw += self._rng.uniform(-WANDER_TURN, WANDER_TURN, n) * dt
+            new_x = x + np.cos(yaw) * speed * dt
+            new_z = z + np.sin(yaw) * speed * dt
+
+            wb = server.world_bounds
+            inside = ((new_x >= wb["min_x"]) & (new_x <= wb["max_x"])
+                      & (new_z >= wb["min_z"]) & (new_z <= wb["max_z"]))
+            yaw[~inside] += math.pi  # reverse direction
+            rows = np.flatnonzero(inside)
+            new_x, new_z = new_x[rows], new_z[rows]
+            new_y = np.asarray(server.heights_at(new_x, new_z), dtype=np.float64)
+
+            blocked = np.asarray(server.colliders_contain(new_x, new_y, new_z), dtype=bool)
+            if blocked.any():
+                yaw[rows[blocked]] += math.pi / 2
+                free = ~blocked
+                rows, new_x, new_y, new_z = rows[free], new_x[free], new_y[free], new_z[free]
+
+            x[rows], y[rows], z[rows] = new_x, new_y, new_z
+            self.column("state")[rows] = self._state_codes["walking"]
+            ids = self._ids
+            return [(ids[r], px, py, pz) for r, px, py, pz
+                    in zip(rows.tolist(), new_x.tolist(), new_y.tolist(), new_z.tolist())]
@@ -0,0 +1,190 @@
+# outbound.py
+"""Per-connection bounded send queues.
+
+Every connection gets a ClientOutbox with its own writer task. Broadcasts
+only enqueue (never await a client's drain()), so one slow client cannot
+stall delivery to everyone else. When a queue is full its overflow policy
+decides what happens:
+
+drop_oldest - drop the oldest queued position update (world snapshot,
+              NPC_UPDATE or NPC_BATCH_UPDATE); newer state supersedes it
+              anyway.
+coalesce    - a new position update replaces the queued one for the same
+              entity; on overflow fall back to drop_oldest.
+disconnect  - close the connection.
+
+Reliable packets (spawns, chat, INTERN frames, ...) are never dropped; if a
+queue is full of them the client is disconnected. A droppable packet can be
+queued with an on_drop callback, run if it is dropped or coalesced away, so
+the sender can resend what the client missed.
+"""
+import asyncio
+import collections
+from protocol import PacketType
+from wire import codec_for
+import log
+
+logger = log.get_logger(__name__)
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_DISCONNECT = "disconnect"
+
+
+def coalesce_key(packet):
+    """Key under which newer packets supersede older ones, or None if it must be delivered."""
+    pid = packet.packet_id
+    if pid == PacketType.WORLD_UPDATE or pid == PacketType.WORLD_DELTA:
+        # Safe to drop: deltas are always built against the client's acked baseline
+        return "world"
+    if pid == PacketType.NPC_UPDATE:
+        return ("npc", packet.data.get("npcId"))
+    if pid == PacketType.NPC_BATCH_UPDATE:
+        # One batch per NPC tick; most NPCs move every tick, so the next batch supersedes it
+        return "npc_batch"
+    return None
+
+
+class OutboxStats:
+    """Server-wide counters shared by every ClientOutbox."""
+
+    def __init__(self):
+        self.dropped = 0
+        self.coalesced = 0
+        self.overflow_disconnects = 0
+        self.peak_depth = 0
+
+
+class ClientOutbox:
+    def __init__(self, writer, limit=256, policy=OVERFLOW_DROP_OLDEST, stats=None):
+        self.writer = writer
+        self.limit = limit
+        self.policy = policy
+        self.stats = stats or OutboxStats()
+        self.depth = 0  # live (not dropped) queued items
+        self.closed = False
+        self._items = collections.deque()  # [key, data, on_drop]; data is None once dropped
+        self._latest = {}  # coalesce key -> newest queued item
+        self._ready = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, data, key=None, on_drop=None):
+        """Queue bytes for this client. Returns False if they were not queued.
+
+        on_drop is called with no arguments if keyed data is later dropped.
+        """
+        if self.closed:
+            return False
+        if key is not None and self.policy == OVERFLOW_COALESCE:
+            old = self._latest.get(key)
+            if old is not None and old[1] is not None:
+                self._drop(old)
+                self.stats.coalesced += 1
+        if self.depth >= self.limit and not self._make_room():
+            return False
+
+        if len(self._items) >= 2 * self.limit:
+            # Drop tombstones so a stalled client can't grow the deque unbounded
+            self._items = collections.deque(i for i in self._items if i[1] is not None)
+        item = [key, data, on_drop]
+        self._items.append(item)
+        if key is not None:
+            self._latest[key] = item
+        self.depth += 1
+        if self.depth > self.stats.peak_depth:
+            self.stats.peak_depth = self.depth
+        self._ready.set()
+        return True
+
+    def _make_room(self):
+        if self.policy != OVERFLOW_DISCONNECT:
+            for item in self._items:
+                if item[0] is not None and item[1] is not None:
+                    self._drop(item)
+                    self.stats.dropped += 1
+                    return True
+        # Disconnect policy, or a queue full of packets we may not drop
+        self.stats.overflow_disconnects += 1
+        logger.warning("[OUTBOX] Send queue overflow (%s queued), disconnecting %s", self.depth, self.writer.get_extra_info('peername'))
+        self.close()
+        return False
+
+    def _drop(self, item):
+        item[1] = None
+        self.depth -= 1
+        on_drop = item[2]
+        if on_drop is not None:
+            item[2] = None
+            on_drop()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                chunks = []
+                while self._items:
+                    item = self._items.popleft()
+                    if item[0] is not None and self._latest.get(item[0]) is item:
+                        del self._latest[item[0]]
+                    if item[1] is not None:
+                        chunks.append(item[1])
+                self.depth = 0
+                if not chunks:
+                    continue
+                for chunk in chunks:
+                    self.writer.write(chunk)
+                # Packets queued while we wait here go out in the next batch
+                await self.writer.drain()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("[ERROR] Outbound write failed: %s", e)
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._items.clear()
+        self._latest.clear()
+        self.depth = 0
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self.writer.close()
+
+
+def deliver(server, writer, packet, on_drop=None):
+    """Queue an EncodedPacket for writer in its negotiated encoding. Never awaits.
+
+    Writers without an outbox are written to directly. on_drop is passed to
+    ClientOutbox.put for droppable packets.
+    """
+    codec = codec_for(server, writer)
+    outbox = server.outboxes.get(writer)
+    if outbox is None:
+        codec.write_packet(writer, packet)
+        return True
+    preamble, body = codec.packet_chunks(packet)
+    if preamble:
+        outbox.put(preamble)
+    key = coalesce_key(packet)
+    return outbox.put(body, key, on_drop if key is not None else None)
+
+
+def queue_metrics(server):
+    """Snapshot of send-queue depths and overflow counters."""
+    depths = [o.depth for o in server.outboxes.values()]
+    stats = server.outbox_stats
+    return {
+        "clients": len(depths),
+        "total_depth": sum(depths),
+        "max_depth": max(depths, default=0),
+        "peak_depth": stats.peak_depth,
+        "dropped": stats.dropped,
+        "coalesced": stats.coalesced,
+        "overflow_disconnects": stats.overflow_disconnects,
+    }
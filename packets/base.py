@@ -0,0 +1,109 @@
+import math
+
+
+class BasePacket:
+    packet_id: int = None
+
+    def __init__(self, **kwargs):
+        self._data = dict(kwargs)
+
+    @classmethod
+    def from_data(cls, data: dict):
+        return cls(**data)
+
+    def to_data(self) -> dict:
+        return dict(self._data)
+
+    def __getattr__(self, item):
+        if item in self._data:
+            return self._data[item]
+        raise AttributeError(item)
+
+
+class PacketError(ValueError):
+    """A packet's data failed schema validation."""
+
+
+REQUIRED = object()
+
+
+def as_float(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise PacketError(f"expected a number, got {value!r}")
+    value = float(value)
+    if not math.isfinite(value):
+        raise PacketError(f"expected a finite number, got {value!r}")
+    return value
+
+
+def as_int(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise PacketError(f"expected an integer, got {value!r}")
+    return value
+
+
+def as_str(value):
+    if not isinstance(value, str):
+        raise PacketError(f"expected a string, got {value!r}")
+    return value
+
+
+def as_list(value):
+    if not isinstance(value, list):
+        raise PacketError(f"expected a list, got {value!r}")
+    return value
+
+
+def field_names(fields):
+    return tuple(name for name, _, _ in fields)
+
+
+class TypedPacket:
+    """Packet with a declared schema and slotted fields.
+
+    Subclasses list `fields` as (name, validator, default) and set
+    `__slots__ = field_names(fields)`. from_data() validates incoming data
+    from either wire encoding (a missing REQUIRED field or a wrong type
+    raises PacketError); unknown keys are ignored. Handlers can read fields
+    as attributes or through the dict-style get().
+    """
+
+    __slots__ = ()
+    packet_id: int = None
+    fields = ()
+
+    def __init__(self, **values):
+        for name, _, default in self.fields:
+            setattr(self, name, values.get(name, None if default is REQUIRED else default))
+
+    @classmethod
+    def from_data(cls, data: dict):
+        packet = cls.__new__(cls)
+        for name, validate, default in cls.fields:
+            value = data.get(name)
+            if value is None:
+                if default is REQUIRED:
+                    raise PacketError(f"{cls.__name__}: missing field {name!r}")
+                value = default
+            else:
+                try:
+                    value = validate(value)
+                except PacketError as e:
+                    raise PacketError(f"{cls.__name__}.{name}: {e}") from None
+            setattr(packet, name, value)
+        return packet
+
+    def to_data(self) -> dict:
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None) if name in self.__slots__ else None
+        return default if value is None else value
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_data()})"
@@ -1,8 +1,16 @@
 from protocol import PacketType
-from . import BasePacket
+from .base import TypedPacket, as_int, as_str, field_names
 from .registry import register_packet
 
 
 @register_packet
-class ChatPacket(BasePacket):
+class ChatPacket(TypedPacket):
     packet_id = PacketType.CHAT
+    fields = (
+        ("text", as_str, ""),
+        ("channel", as_str, "global"),
+        # Set on server -> client messages
+        ("playerId", as_str, None),
+        ("timestamp", as_int, None),
+    )
+    __slots__ = field_names(fields)
@@ -1,18 +1,55 @@
 from protocol import PacketType
-from . import BasePacket
+from .base import TypedPacket, REQUIRED, as_float, as_list, as_str, field_names
 from .registry import register_packet
 
 
+def as_entity_id(value):
+    # NPC ids are strings from NPCService, but older builds used integers
+    return value if isinstance(value, int) and not isinstance(value, bool) else as_str(value)
+
+
 @register_packet
-class NpcSpawnPacket(BasePacket):
+class NpcSpawnPacket(TypedPacket):
     packet_id = PacketType.NPC_SPAWN
+    fields = (
+        ("npcId", as_entity_id, REQUIRED),
+        ("x", as_float, REQUIRED),
+        ("y", as_float, REQUIRED),
+        ("z", as_float, REQUIRED),
+        ("state", as_str, None),
+        ("name", as_str, None),
+    )
+    __slots__ = field_names(fields)
 
 
 @register_packet
-class NpcUpdatePacket(BasePacket):
+class NpcUpdatePacket(TypedPacket):
     packet_id = PacketType.NPC_UPDATE
+    fields = (
+        ("npcId", as_entity_id, REQUIRED),
+        ("x", as_float, REQUIRED),
+        ("y", as_float, REQUIRED),
+        ("z", as_float, REQUIRED),
+    )
+    __slots__ = field_names(fields)
+
+
+@register_packet
+class NpcBatchUpdatePacket(TypedPacket):
+    packet_id = PacketType.NPC_BATCH_UPDATE
+    fields = (
+        # [{"npcId", "x", "y", "z"}, ...]; with "q" set, coordinates are
+        # integer multiples of q
+        ("npcs", as_list, REQUIRED),
+        ("q", as_float, None),
+    )
+    __slots__ = field_names(fields)
 
 
 @register_packet
-class NpcDespawnPacket(BasePacket):
+class NpcDespawnPacket(TypedPacket):
     packet_id = PacketType.NPC_DESPAWN
+    fields = (
+        ("npcId", as_entity_id, REQUIRED),
+    )
+    __slots__ = field_names(fields)
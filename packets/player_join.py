@@ -1,5 +1,5 @@
 from protocol import PacketType
-from . import BasePacket
+from .base import BasePacket
 from .registry import register_packet
 
 
@@ -1,8 +1,14 @@
 from protocol import PacketType
-from . import BasePacket
+from .base import TypedPacket, REQUIRED, as_float, field_names
 from .registry import register_packet
 
 
 @register_packet
-class PlayerMovePacket(BasePacket):
+class PlayerMovePacket(TypedPacket):
     packet_id = PacketType.PLAYER_MOVE
+    fields = (
+        ("x", as_float, REQUIRED),
+        ("y", as_float, REQUIRED),
+        ("z", as_float, REQUIRED),
+    )
+    __slots__ = field_names(fields)
@@ -1,16 +1,61 @@
-from typing import Type, Dict, Any
+import importlib
+from protocol import PacketType
+from .base import BasePacket
 
 
-class _Reg:
-    pass
+_registry: dict = {}  # packet id -> class
 
+# Packet id -> submodule defining its class. Submodules are imported the
+# first time one of their ids is parsed, which registers their classes.
+_modules: dict = {
+    PacketType.PING: "ping",
+    PacketType.PONG: "ping",
+    PacketType.PLAYER_JOIN: "player_join",
+    PacketType.PLAYER_ID_ASSIGNED: "player_join",
+    PacketType.PLAYER_MOVE: "player_move",
+    PacketType.PLAYER_CORRECTION: "other",
+    PacketType.CHAT: "chat",
+    PacketType.NPC_SPAWN: "npc",
+    PacketType.NPC_UPDATE: "npc",
+    PacketType.NPC_BATCH_UPDATE: "npc",
+    PacketType.NPC_DESPAWN: "npc",
+    PacketType.WORLD_UPDATE: "world_update",
+    PacketType.WORLD_DELTA: "world_update",
+    PacketType.WORLD_ACK: "world_update",
+}
 
-_registry: Dict[int, Type] = {}
 
-
-def register_packet(cls: Type):
+def register_packet(cls: type):
     pid = getattr(cls, "packet_id", None)
     if pid is None:
         raise ValueError("packet class must define packet_id")
+    existing = _registry.get(pid)
+    if existing is not None and existing.__qualname__ != cls.__qualname__:
+        raise ValueError(f"packet id {pid} already registered to {existing.__name__}")
     _registry[pid] = cls
     return cls
+
+
+def packet_class(pid):
+    """Class registered for pid, importing its module on first use; None if unknown."""
+    cls = _registry.get(pid)
+    if cls is None:
+        module = _modules.get(pid)
+        if module is None:
+            return None
+        importlib.import_module(f"{__package__}.{module}")
+        cls = _registry.get(pid)
+    return cls
+
+
+def parse_raw_packet(raw: dict):
+    if not raw:
+        return None
+    pid = raw.get("id")
+    data = raw.get("data", {}) or {}
+    cls = packet_class(pid)
+    if cls:
+        return cls.from_data(data)
+    p = BasePacket(**data)
+    p._data["_raw_id"] = pid
+    return p
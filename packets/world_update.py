@@ -1,8 +1,34 @@
 from protocol import PacketType
-from . import BasePacket
+from .base import TypedPacket, REQUIRED, as_int, as_list, field_names
 from .registry import register_packet
 
 
 @register_packet
-class WorldUpdatePacket(BasePacket):
+class WorldUpdatePacket(TypedPacket):
     packet_id = PacketType.WORLD_UPDATE
+    fields = (
+        ("seq", as_int, None),
+        ("players", as_list, REQUIRED),
+    )
+    __slots__ = field_names(fields)
+
+
+@register_packet
+class WorldDeltaPacket(TypedPacket):
+    packet_id = PacketType.WORLD_DELTA
+    fields = (
+        ("seq", as_int, REQUIRED),
+        ("baseline", as_int, REQUIRED),
+        ("players", as_list, ()),
+        ("removed", as_list, ()),
+    )
+    __slots__ = field_names(fields)
+
+
+@register_packet
+class WorldAckPacket(TypedPacket):
+    packet_id = PacketType.WORLD_ACK
+    fields = (
+        ("seq", as_int, REQUIRED),
+    )
+    __slots__ = field_names(fields)
@@ -11,5 +11,14 @@ class PacketType:
     NPC_SPAWN = 10
     NPC_UPDATE = 11
     NPC_DESPAWN = 12
+    # Delta-compressed world snapshot (server -> client) and its acknowledgement (client -> server)
+    WORLD_DELTA = 13
+    WORLD_ACK = 14
+    # Binary encoding only: announces an entity handle -> id string mapping
+    INTERN = 15
+    # All NPC moves of one NPC tick for one client (replaces per-NPC NPC_UPDATE)
+    NPC_BATCH_UPDATE = 16
+    # Client -> server, last packet in JSON: what follows is in the encoding agreed at join
+    ENCODING_SWITCH = 17
     # Handshake packet (server -> client) containing a nonce to prevent unauthenticated clients
     HANDSHAKE_CHALLENGE = 100
\ No newline at end of file
@@ -0,0 +1,180 @@
+# sessions.py
+"""Connection / player session table.
+
+Every open connection has one Session record, created when the client
+connects (holding its handshake nonce) and filled in at PLAYER_JOIN
+(player id, nickname, position, last move time). Joined sessions are also
+indexed by player id and nickname, and each gets a small integer
+entity_id: the player's handle in the wire HandleTable, released again
+when the session closes, so ids stay bounded by peak concurrency.
+
+Joined sessions also carry their chat channel membership, indexed the
+other way round too (channel -> writers), so chat is fanned out only to
+a channel's members.
+
+close(writer) removes a session from every index at once, so nothing keyed
+by a connection or player outlives it, however many connect/disconnect
+cycles the server sees.
+
+players() / writers() iterate joined sessions in join order, the order
+broadcasts and snapshots use.
+"""
+from wire import ENCODING_JSON, HandleTable
+
+
+class Session:
+    __slots__ = ("writer", "entity_id", "player_id", "nickname", "position", "last_move_time", "nonce",
+                 "chat_channels", "inbound_encoding")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.entity_id = None
+        self.player_id = None  # None until PLAYER_JOIN
+        self.nickname = None
+        self.position = None  # (x, y, z)
+        self.last_move_time = None
+        self.nonce = None  # outstanding HANDSHAKE_CHALLENGE nonce
+        self.chat_channels = set()
+        self.inbound_encoding = ENCODING_JSON  # what the client sends; see ENCODING_SWITCH
+
+    def __repr__(self):
+        return f"Session({self.entity_id}, {self.player_id!r}, {self.position})"
+
+
+class SessionTable:
+    def __init__(self, ids=None):
+        self.ids = ids if ids is not None else HandleTable()  # player_id <-> entity_id
+        self._by_writer = {}  # writer -> Session, every open connection
+        self._by_player = {}  # player_id -> Session, joined only, in join order
+        self._by_nickname = {}  # nickname -> Session
+        self._by_channel = {}  # chat channel -> {writer: None}, members in join order
+
+    def __len__(self):
+        """Number of joined players."""
+        return len(self._by_player)
+
+    def connections(self):
+        return len(self._by_writer)
+
+    def connect(self, writer):
+        session = self._by_writer.get(writer)
+        if session is None:
+            session = self._by_writer[writer] = Session(writer)
+        return session
+
+    def join(self, writer, player_id, position, now, nickname=None, channels=()):
+        """Register writer's player; a player id already joined elsewhere moves to this connection.
+
+        The nickname falls back to player_id when missing or taken, and to
+        player_id with a numeric suffix if someone already goes by that. The
+        player starts as a member of the given chat channels.
+        """
+        session = self.connect(writer)
+        if session.player_id is not None:
+            self._unjoin(session)
+        previous = self._by_player.get(player_id)
+        if previous is not None:
+            self._unjoin(previous)
+        session.entity_id = self.ids.claim(player_id)
+        session.player_id = player_id
+        session.position = position
+        session.last_move_time = now
+        self._by_player[player_id] = session
+        if not nickname or nickname in self._by_nickname:
+            nickname = player_id
+        n = 1
+        while nickname in self._by_nickname:  # player_id taken as someone's /nick
+            n += 1
+            nickname = f"{player_id}-{n}"
+        session.nickname = nickname
+        self._by_nickname[nickname] = session
+        for channel in channels:
+            self.join_channel(session, channel)
+        return session
+
+    def _unjoin(self, session):
+        for channel in list(session.chat_channels):
+            self.leave_channel(session, channel)
+        self._by_player.pop(session.player_id, None)
+        if session.nickname is not None and self._by_nickname.get(session.nickname) is session:
+            del self._by_nickname[session.nickname]
+        if session.entity_id is not None:
+            self.ids.release(session.player_id)
+        session.entity_id = session.player_id = session.nickname = None
+
+    def close(self, writer):
+        """Forget writer's session entirely; returns it (or None if unknown)."""
+        session = self._by_writer.pop(writer, None)
+        if session is not None and session.player_id is not None:
+            player_id = session.player_id
+            self._unjoin(session)
+            session.player_id = player_id  # keep it readable for the caller's cleanup
+        return session
+
+    def get(self, writer):
+        return self._by_writer.get(writer)
+
+    def joined(self, writer):
+        """writer's session if its player has joined, else None."""
+        session = self._by_writer.get(writer)
+        return session if session is not None and session.player_id is not None else None
+
+    def player_id(self, writer):
+        session = self._by_writer.get(writer)
+        return session.player_id if session is not None else None
+
+    def by_player(self, player_id):
+        return self._by_player.get(player_id)
+
+    def by_nickname(self, nickname):
+        return self._by_nickname.get(nickname)
+
+    def rename(self, session, nickname):
+        """Give session a new nickname; False if another player has it."""
+        owner = self._by_nickname.get(nickname)
+        if owner is not None and owner is not session:
+            return False
+        if session.nickname is not None and self._by_nickname.get(session.nickname) is session:
+            del self._by_nickname[session.nickname]
+        session.nickname = nickname
+        self._by_nickname[nickname] = session
+        return True
+
+    def join_channel(self, session, channel):
+        """Add session to a chat channel; False if it was already a member."""
+        if channel in session.chat_channels:
+            return False
+        session.chat_channels.add(channel)
+        self._by_channel.setdefault(channel, {})[session.writer] = None
+        return True
+
+    def leave_channel(self, session, channel):
+        """Remove session from a chat channel; False if it wasn't a member."""
+        if channel not in session.chat_channels:
+            return False
+        session.chat_channels.discard(channel)
+        members = self._by_channel.get(channel)
+        if members is not None:
+            members.pop(session.writer, None)
+            if not members:
+                del self._by_channel[channel]
+        return True
+
+    def channel_writers(self, channel):
+        """Writers of the chat channel's members, in the order they joined it."""
+        return list(self._by_channel.get(channel, ()))
+
+    def channel_sizes(self):
+        """{channel: member count} for every chat channel with members."""
+        return {channel: len(members) for channel, members in self._by_channel.items()}
+
+    def players(self):
+        """Joined sessions in join order (a copy, safe to mutate the table while iterating)."""
+        return list(self._by_player.values())
+
+    def writers(self):
+        return [s.writer for s in self._by_player.values()]
+
+    def positions(self):
+        """{player_id: (x, y, z)} snapshot of every joined player."""
+        return {pid: s.position for pid, s in self._by_player.items()}
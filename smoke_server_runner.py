@@ -3,8 +3,10 @@ import threading
 from master_server import MasterServer
 from chat import start_chat_server
 from NPCService import serve as npc_serve
+import log
 
 async def run_server():
+    log.configure()
     server = MasterServer()
     # Skip chat stub init which requires network grpc; start chat service in-process
     server.loop = asyncio.get_running_loop()
@@ -28,6 +30,7 @@ async def run_server():
         await asyncio.gather(
             tcp_server.serve_forever(),
             chat_task,
+            server.world_tick_loop(),
             server.chat.listen(['global'])
         )
 
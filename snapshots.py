@@ -0,0 +1,53 @@
+# snapshots.py
+"""Snapshot history used for delta-compressed WORLD_UPDATEs.
+
+Each world tick that changed something pushes a snapshot ({entity_id: state})
+under a new sequence number. Clients acknowledge the sequence numbers they
+have applied, and the server diffs the current snapshot against the last
+acknowledged one (the client's baseline).
+"""
+
+
+class SnapshotHistory:
+    def __init__(self, size=32):
+        self.size = size  # how many snapshots are kept as possible baselines
+        self.seq = 0
+        self._snapshots = {}  # seq -> {entity_id: state}
+        self._encoded = {}  # key -> encoded packet for the latest seq
+
+    def push(self, snapshot):
+        self.seq += 1
+        self._snapshots[self.seq] = snapshot
+        self._snapshots.pop(self.seq - self.size, None)
+        self._encoded.clear()
+        return self.seq
+
+    def cached(self, key, build):
+        """Shared encoded-packet cache for the latest snapshot.
+
+        Returns the value stored under key (e.g. the baseline seq a delta is
+        built against), calling build() on first use. Cleared on every push.
+        """
+        try:
+            return self._encoded[key]
+        except KeyError:
+            value = self._encoded[key] = build()
+            return value
+
+    def get(self, seq):
+        return self._snapshots.get(seq)
+
+    @property
+    def latest(self):
+        return self._snapshots.get(self.seq)
+
+
+def diff_snapshots(baseline, current):
+    """Return (changed, removed) needed to turn baseline into current.
+
+    changed maps entity ids that were added or whose state differs; removed
+    lists ids present in baseline but gone from current.
+    """
+    changed = {eid: state for eid, state in current.items() if baseline.get(eid) != state}
+    removed = [eid for eid in baseline if eid not in current]
+    return changed, removed
@@ -0,0 +1,231 @@
+# terrain.py
+"""Heightmaps sampled by move validation and the NPC step.
+
+A Heightmap memory-maps a raw terrain export (Unity "Export Raw": 16-bit
+unsigned, or 32-bit float) instead of reading it into Python lists; the OS
+pages in only the parts that get sampled. Samples are laid out row-major,
+one row per z step, row 0 at origin z (`flip_z=True` for top-down files).
+
+    height = raw * height_scale + height_offset
+
+For a Unity 16-bit export height_scale is terrainData.size.y / 65535.
+
+height_at(x, z) samples one point with bilinear interpolation;
+heights_at(xs, zs) samples many, vectorized when NumPy is installed.
+Points outside the map clamp to the nearest edge sample.
+
+Large maps can be split into equally sized tiles (TiledHeightmap); a tile
+file is only mapped the first time a point on it is sampled, and at most
+`max_open` tiles stay mapped.
+
+load_heightmap(path) builds either from a JSON descriptor:
+
+    {"file": "terrain.raw", "format": "uint16", "resolution": [513, 513],
+     "size": [100, 100], "origin": [150, 500], "height_scale": 0.000763}
+
+or, for tiles, "tiles": "tiles/{col}_{row}.raw" and "tile_count": [4, 4]
+with resolution/size given per tile. Relative paths are resolved against
+the descriptor's directory.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+FORMAT_UINT16 = "uint16"
+FORMAT_FLOAT32 = "float32"
+FORMATS = {FORMAT_UINT16: "H", FORMAT_FLOAT32: "f"}
+BYTE_ORDERS = {"little": "<", "big": ">"}
+
+
+class Heightmap:
+    def __init__(self, path, resolution, size, origin=(0.0, 0.0), fmt=FORMAT_UINT16,
+                 height_scale=1.0, height_offset=0.0, byte_order="little", flip_z=False):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown heightmap format {fmt!r}")
+        if byte_order not in BYTE_ORDERS:
+            raise ValueError(f"unknown byte order {byte_order!r}")
+        self.cols, self.rows = (int(n) for n in resolution)
+        if self.cols < 2 or self.rows < 2:
+            raise ValueError("heightmap needs at least 2x2 samples")
+        self.path = path
+        self.min_x, self.min_z = (float(v) for v in origin)
+        self.size_x, self.size_z = (float(v) for v in size)
+        self.step_x = self.size_x / (self.cols - 1)
+        self.step_z = self.size_z / (self.rows - 1)
+        self.height_scale = height_scale
+        self.height_offset = height_offset
+        self.flip_z = flip_z
+
+        code = FORMATS[fmt]
+        itemsize = struct.calcsize(code)
+        expected = self.cols * self.rows * itemsize
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) != expected:
+            actual = len(self._mmap)
+            self._mmap.close()
+            raise ValueError(f"{path}: expected {expected} bytes for {self.cols}x{self.rows} {fmt}, got {actual}")
+
+        # Scalar lookups index a memoryview directly when the file is in
+        # native byte order, otherwise unpack each sample.
+        order = BYTE_ORDERS[byte_order]
+        if byte_order == sys.byteorder:
+            self._samples = memoryview(self._mmap).cast(code)
+            self._sample = self._samples.__getitem__
+        else:
+            self._samples = None
+            unpack = struct.Struct(order + code).unpack_from
+            self._sample = lambda i: unpack(self._mmap, i * itemsize)[0]
+        self._array = None
+        if np is not None:
+            dtype = np.dtype(order + code)
+            self._array = np.frombuffer(self._mmap, dtype=dtype).reshape(self.rows, self.cols)
+
+    @property
+    def max_x(self):
+        return self.min_x + self.size_x
+
+    @property
+    def max_z(self):
+        return self.min_z + self.size_z
+
+    def close(self):
+        self._array = None
+        if self._samples is not None:
+            self._samples.release()
+            self._samples = None
+        self._mmap.close()
+
+    def _grid(self, x, z):
+        """Cell (col, row) and fractions within it for a world point, clamped to the map."""
+        fx = min(max((x - self.min_x) / self.step_x, 0.0), self.cols - 1)
+        fz = min(max((z - self.min_z) / self.step_z, 0.0), self.rows - 1)
+        if self.flip_z:
+            fz = self.rows - 1 - fz
+        col = min(int(fx), self.cols - 2)
+        row = min(int(fz), self.rows - 2)
+        return col, row, fx - col, fz - row
+
+    def height_at(self, x, z):
+        col, row, tx, tz = self._grid(x, z)
+        sample = self._sample
+        i = row * self.cols + col
+        h00, h10 = sample(i), sample(i + 1)
+        h01, h11 = sample(i + self.cols), sample(i + self.cols + 1)
+        top = h00 + (h10 - h00) * tx
+        bottom = h01 + (h11 - h01) * tx
+        return (top + (bottom - top) * tz) * self.height_scale + self.height_offset
+
+    def heights_at(self, xs, zs):
+        if self._array is None:
+            return [self.height_at(x, z) for x, z in zip(xs, zs)]
+        fx = np.clip((np.asarray(xs, dtype=np.float64) - self.min_x) / self.step_x, 0.0, self.cols - 1)
+        fz = np.clip((np.asarray(zs, dtype=np.float64) - self.min_z) / self.step_z, 0.0, self.rows - 1)
+        if self.flip_z:
+            fz = self.rows - 1 - fz
+        col = np.minimum(fx.astype(np.intp), self.cols - 2)
+        row = np.minimum(fz.astype(np.intp), self.rows - 2)
+        tx, tz = fx - col, fz - row
+        a = self._array
+        h00, h10 = a[row, col], a[row, col + 1]
+        h01, h11 = a[row + 1, col], a[row + 1, col + 1]
+        top = h00 + (h10 - h00) * tx
+        bottom = h01 + (h11 - h01) * tx
+        return (top + (bottom - top) * tz) * self.height_scale + self.height_offset
+
+
+class TiledHeightmap:
+    """Grid of equally sized Heightmap tiles, mapped on first use.
+
+    `pattern` is formatted with col/row (e.g. "tiles/{col}_{row}.raw"), col
+    along x and row along z from `origin`. Neighbouring tiles share their
+    edge samples, as Unity terrain tiles do.
+    """
+
+    def __init__(self, pattern, tile_count, resolution, size, origin=(0.0, 0.0), max_open=64, **tile_kwargs):
+        self.pattern = pattern
+        self.tile_cols, self.tile_rows = (int(n) for n in tile_count)
+        self.resolution = resolution
+        self.size_x, self.size_z = (float(v) for v in size)
+        self.min_x, self.min_z = (float(v) for v in origin)
+        self.max_open = max(1, max_open)
+        self.tile_kwargs = tile_kwargs
+        self._tiles = OrderedDict()  # (col, row) -> Heightmap, least recently used first
+
+    def __len__(self):
+        """Number of tiles currently mapped."""
+        return len(self._tiles)
+
+    def close(self):
+        for tile in self._tiles.values():
+            tile.close()
+        self._tiles.clear()
+
+    def _tile_of(self, x, z):
+        col = min(max(math.floor((x - self.min_x) / self.size_x), 0), self.tile_cols - 1)
+        row = min(max(math.floor((z - self.min_z) / self.size_z), 0), self.tile_rows - 1)
+        return col, row
+
+    def tile(self, col, row):
+        key = (col, row)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        origin = (self.min_x + col * self.size_x, self.min_z + row * self.size_z)
+        tile = Heightmap(self.pattern.format(col=col, row=row), self.resolution,
+                         (self.size_x, self.size_z), origin, **self.tile_kwargs)
+        self._tiles[key] = tile
+        while len(self._tiles) > self.max_open:
+            _, evicted = self._tiles.popitem(last=False)
+            evicted.close()
+        return tile
+
+    def height_at(self, x, z):
+        return self.tile(*self._tile_of(x, z)).height_at(x, z)
+
+    def heights_at(self, xs, zs):
+        if np is None:
+            return [self.height_at(x, z) for x, z in zip(xs, zs)]
+        xs = np.asarray(xs, dtype=np.float64)
+        zs = np.asarray(zs, dtype=np.float64)
+        cols = np.clip(np.floor((xs - self.min_x) / self.size_x), 0, self.tile_cols - 1).astype(np.intp)
+        rows = np.clip(np.floor((zs - self.min_z) / self.size_z), 0, self.tile_rows - 1).astype(np.intp)
+        keys = rows * self.tile_cols + cols
+        out = np.empty(len(xs))
+        # One vectorized lookup per tile touched
+        for key in np.unique(keys).tolist():
+            mask = keys == key
+            row, col = divmod(key, self.tile_cols)
+            out[mask] = self.tile(col, row).heights_at(xs[mask], zs[mask])
+        return out
+
+
+def load_heightmap(path):
+    """Heightmap or TiledHeightmap from a JSON descriptor (see module docstring)."""
+    with open(path, "r") as f:
+        spec = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    kwargs = {
+        "resolution": spec["resolution"],
+        "size": spec["size"],
+        "origin": spec.get("origin", (0.0, 0.0)),
+        "fmt": spec.get("format", FORMAT_UINT16),
+        "height_scale": spec.get("height_scale", 1.0),
+        "height_offset": spec.get("height_offset", 0.0),
+        "byte_order": spec.get("byte_order", "little"),
+        "flip_z": spec.get("flip_z", False),
+    }
+    if "tiles" in spec:
+        return TiledHeightmap(os.path.join(base, spec["tiles"]), spec["tile_count"],
+                              max_open=spec.get("max_open", 64), **kwargs)
+    return Heightmap(os.path.join(base, spec["file"]), **kwargs)
@@ -0,0 +1,430 @@
+import unittest
+import asyncio
+import os
+import tempfile
+from unittest import mock
+
+import grpc
+
+import chat
+from chat import ChatManager, ChatServiceServicer
+import chat_hub
+from chat_history import ChatHistory
+from chat_hub import ChatHub
+from chat_service import ChatService
+from generated import chatservice_pb2
+
+CHANNELS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "channels.ini")
+
+
+def message(channel, text):
+    return chatservice_pb2.ChatMessage(channel=channel, playerId="p1", text=text)
+
+
+class TestChatHub(unittest.TestCase):
+    def test_one_inbox_for_all_channels(self):
+        async def run():
+            hub = ChatHub()
+            sub = hub.subscribe("p1", ["global", "trade", "global"])
+            self.assertEqual(hub.publish("global", "a"), 1)
+            self.assertEqual(hub.publish("trade", "b"), 1)
+            self.assertEqual(hub.publish("guild", "c"), 0)
+            self.assertEqual([sub.inbox.get_nowait(), sub.inbox.get_nowait()], ["a", "b"])
+            self.assertTrue(sub.inbox.empty())
+
+        asyncio.run(run())
+
+    def test_unsubscribe_drops_empty_channels(self):
+        async def run():
+            hub = ChatHub()
+            a = hub.subscribe("a", ["global", "whisper:a"])
+            b = hub.subscribe("b", ["global"])
+            hub.unsubscribe(a)
+            self.assertEqual(set(hub.channels), {"global"})
+            self.assertEqual(hub.send_to("a", "x"), 0)
+            self.assertEqual(hub.send_to("b", "x"), 1)
+            hub.unsubscribe(b)
+            self.assertEqual((hub.channels, len(hub)), ({}, 0))
+
+        asyncio.run(run())
+
+
+class TestOverflow(unittest.TestCase):
+    def fill(self, policy):
+        hub = ChatHub(queue_limit=2, channel_policies={"trade": policy})
+        stalled = hub.subscribe("stalled", ["trade"])
+        reader = hub.subscribe("reader", ["trade"])
+        for i in range(3):
+            hub.publish("trade", i)
+            reader.inbox.get_nowait()
+        return hub, stalled
+
+    def drain(self, sub):
+        items = []
+        while not sub.inbox.empty():
+            items.append(sub.inbox.get_nowait())
+        return items
+
+    def test_drop_newest(self):
+        async def run():
+            hub, stalled = self.fill(chat_hub.OVERFLOW_DROP_NEWEST)
+            self.assertEqual(self.drain(stalled), [0, 1])
+            self.assertEqual((hub.stats.dropped, stalled.dropped), ({"trade": 1}, 1))
+            self.assertEqual(hub.stats.delivered, 5)
+
+        asyncio.run(run())
+
+    def test_drop_oldest(self):
+        async def run():
+            hub, stalled = self.fill(chat_hub.OVERFLOW_DROP_OLDEST)
+            self.assertEqual(self.drain(stalled), [1, 2])
+            self.assertEqual(hub.metrics()["evicted"], {"trade": 1})
+
+        asyncio.run(run())
+
+    def test_disconnect_ends_the_stream(self):
+        async def run():
+            hub, stalled = self.fill(chat_hub.OVERFLOW_DISCONNECT)
+            self.assertEqual(self.drain(stalled), [chat_hub.CLOSED])
+            self.assertEqual(len(hub), 1)
+            self.assertEqual(hub.stats.disconnects, 1)
+
+        asyncio.run(run())
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            ChatHub(channel_policies={"trade": "block"})
+
+
+class TestStreamMessages(unittest.TestCase):
+    def check_stream(self, servicer):
+        async def run():
+            request = chatservice_pb2.StreamRequest(playerId="p1", channels=["global", "trade"])
+            stream = servicer.StreamMessages(request, None)
+            first = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)
+            tasks = len(asyncio.all_tasks())
+            await servicer.SendMessage(message("trade", "hi"), None)
+            self.assertEqual((await first).text, "hi")
+            for i in range(20):
+                await servicer.SendMessage(message("global", str(i)), None)
+            self.assertEqual([(await stream.__anext__()).text for _ in range(20)], [str(i) for i in range(20)])
+            self.assertLessEqual(len(asyncio.all_tasks()), tasks)
+            await stream.aclose()
+            self.assertEqual(len(servicer.hub), 0)
+
+            # a cancelled stream cleans up too
+            reader = asyncio.ensure_future(servicer.StreamMessages(request, None).__anext__())
+            await asyncio.sleep(0)
+            self.assertEqual(len(servicer.hub), 1)
+            reader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await reader
+            self.assertEqual(len(servicer.hub), 0)
+
+        asyncio.run(run())
+
+    def test_chat_servicer(self):
+        self.check_stream(ChatServiceServicer(CHANNELS_FILE))
+
+    def test_standalone_chat_service(self):
+        self.check_stream(ChatService())
+
+    def test_slow_consumer_is_disconnected(self):
+        async def run():
+            servicer = ChatServiceServicer(CHANNELS_FILE, queue_limit=4)
+            servicer.hub.channel_policies["global"] = chat_hub.OVERFLOW_DISCONNECT
+            request = chatservice_pb2.StreamRequest(playerId="slow", channels=["global"])
+            stream = servicer.StreamMessages(request, None)
+            first = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)
+            for i in range(10):
+                ack = await servicer.SendMessage(message("global", str(i)), None)
+                self.assertTrue(ack.success)
+            # the stream never got to read, so it ends without the backlog
+            with self.assertRaises(StopAsyncIteration):
+                await first
+            self.assertEqual(servicer.metrics()["subscribers"], 0)
+
+        asyncio.run(run())
+
+
+class RecordingStub:
+    def __init__(self, servicer=None, fail=False):
+        self.servicer = servicer
+        self.fail = fail
+        self.batches = []
+
+    async def SendMessages(self, batch, timeout=None):
+        self.batches.append([m.text for m in batch.messages])
+        if self.fail:
+            raise grpc.RpcError("unavailable")
+        return await self.servicer.SendMessages(batch, None)
+
+
+def unavailable():
+    return grpc.aio.AioRpcError(grpc.StatusCode.UNAVAILABLE, grpc.aio.Metadata(), grpc.aio.Metadata(), "down")
+
+
+class FlakyStreamStub:
+    """StreamMessages plays one script per call: lines to yield, then an error or a clean end."""
+
+    def __init__(self, scripts):
+        self.scripts = list(scripts)
+        self.requests = []
+
+    def StreamMessages(self, request):
+        self.requests.append(request)
+        return self._stream(self.scripts.pop(0) if self.scripts else None)
+
+    async def _stream(self, script):
+        if script is None:
+            await asyncio.Event().wait()  # stays open
+        for item in script:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+class DelayRecordingManager(ChatManager):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delays = []
+
+    def _resubscribing(self, reason, delay):
+        self.delays.append(delay)
+        super()._resubscribing(reason, delay)
+
+
+class TestChatManager(unittest.TestCase):
+    def test_lines_are_batched_by_size_and_time(self):
+        async def run():
+            servicer = ChatServiceServicer(CHANNELS_FILE)
+            stub = RecordingStub(servicer)
+            manager = ChatManager(None, stub, batch_size=3, flush_interval=0.01)
+            for i in range(4):
+                await manager.send_message("p1", str(i))
+            await manager.send_message("p1", "lost", channel="nowhere")
+            self.assertEqual(stub.batches, [])  # nothing sent inline
+            await asyncio.sleep(0.05)
+            self.assertEqual(stub.batches, [["0", "1", "2"], ["3", "lost"]])
+            self.assertEqual(manager.metrics(), {"queued": 5, "pending": 0, "batches": 2, "sent": 4,
+                                                 "rejected": 1, "failed": 0, "dropped": 0,
+                                                 "resubscribes": 0})
+
+        asyncio.run(run())
+
+    def test_grpc_listener_reconnects_with_backoff(self):
+        line = chatservice_pb2.ChatMessage(channel="global", playerId="p1", text="hi", seq=7)
+        stub = FlakyStreamStub([[unavailable()], [unavailable()], [unavailable()], [line, unavailable()], []])
+
+        async def run():
+            master = RecordingMaster()
+            manager = DelayRecordingManager(master, stub)
+            listener = asyncio.ensure_future(manager.listen(["global"]))
+            while len(stub.requests) < 6:
+                await asyncio.sleep(0.001)
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            return master, manager
+
+        with mock.patch.object(chat, "RESUBSCRIBE_DELAY", 0.001), mock.patch.object(chat, "RESUBSCRIBE_MAX_DELAY", 0.002):
+            master, manager = asyncio.run(run())
+        self.assertEqual(master.chat, [("global", "hi")])
+        # Doubling up to the cap, back to the start once a line got through
+        self.assertEqual(manager.delays, [0.001, 0.002, 0.002, 0.001, 0.002])
+        self.assertEqual(manager.metrics()["resubscribes"], 5)
+        first, *before_line, after_error, after_close = stub.requests
+        self.assertFalse(first.HasField("sinceSeq") or first.HasField("sinceTimestamp"))
+        # Dropped before the first line: catch up from when listening started
+        self.assertEqual(len({r.sinceTimestamp for r in before_line}), 1)
+        self.assertTrue(all(r.HasField("sinceTimestamp") for r in before_line))
+        self.assertEqual((after_error.sinceSeq, after_close.sinceSeq), (7, 7))
+
+    def test_failures_are_counted(self):
+        async def run():
+            manager = ChatManager(None, RecordingStub(fail=True), batch_size=10, max_pending=3)
+            for i in range(5):
+                await manager.send_message("p1", str(i))
+            await manager.flush()
+            metrics = manager.metrics()
+            self.assertEqual((metrics["failed"], metrics["dropped"], metrics["pending"]), (3, 2, 0))
+
+        asyncio.run(run())
+
+    def test_batch_rpc_keeps_order_and_timestamps(self):
+        for servicer in (ChatServiceServicer(CHANNELS_FILE), ChatService()):
+            with self.subTest(servicer=type(servicer).__name__):
+                self.check_batch_rpc(servicer)
+
+    def check_batch_rpc(self, servicer):
+        async def run():
+            sub = servicer.hub.subscribe("p2", ["global"])
+            batch = chatservice_pb2.ChatBatch(messages=[
+                chatservice_pb2.ChatMessage(channel="global", playerId="p1", text=str(i), timestamp=100 + i)
+                for i in range(3)])
+            batch.messages.add(channel="nowhere", playerId="p1", text="lost", timestamp=103)
+            ack = await servicer.SendMessages(batch, None)
+            self.assertEqual((ack.accepted, ack.rejected, ack.error), (3, 1, "Unknown channel"))
+            got = [sub.inbox.get_nowait() for _ in range(3)]
+            self.assertEqual([(m.text, m.timestamp) for m in got], [("0", 100), ("1", 101), ("2", 102)])
+            self.assertTrue(sub.inbox.empty())
+
+        asyncio.run(run())
+
+
+class TestChatHistory(unittest.TestCase):
+    def record(self, history, channel, text, timestamp=0):
+        msg = chatservice_pb2.ChatMessage(channel=channel, playerId="p1", text=text, timestamp=timestamp)
+        history.record(msg)
+        return msg
+
+    def test_rings_and_cursors(self):
+        history = ChatHistory(size=3)
+        for i in range(5):
+            self.record(history, "global", f"g{i}", timestamp=100 + i)
+            self.record(history, "trade", f"t{i}", timestamp=100 + i)
+        self.assertEqual(history.seq, 10)
+        self.assertEqual([m.text for m in history.since(["global"], seq=0)], ["g2", "g3", "g4"])
+        self.assertEqual([m.seq for m in history.since(["trade", "global"], seq=7)], [8, 9, 10])
+        self.assertEqual([m.text for m in history.since(["global"], timestamp=104)], ["g4"])
+        self.assertEqual(history.since(["global"]), [])  # no cursor: live only
+
+    def test_segment_log_survives_restart(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            history = ChatHistory(size=4, log_dir=log_dir, segment_size=3, keep_segments=2)
+            for i in range(10):
+                self.record(history, "global", str(i))
+            history.close()
+            self.assertEqual(sorted(os.listdir(log_dir)), ["chat-000000000007.log", "chat-000000000010.log"])
+
+            restarted = ChatHistory(size=4, log_dir=log_dir)
+            self.assertEqual((restarted.seq, restarted.stats.restored), (10, 4))
+            self.assertEqual([m.text for m in restarted.since(["global"], seq=7)], ["7", "8", "9"])
+            self.assertEqual(self.record(restarted, "global", "next").seq, 11)
+            restarted.close()
+
+
+    def test_log_is_written_off_the_record_path(self):
+        async def run(log_dir):
+            history = ChatHistory(log_dir=log_dir)
+            for i in range(5):
+                self.record(history, "global", str(i))
+            self.assertEqual(os.listdir(log_dir), [])  # nothing written yet
+            flusher = asyncio.ensure_future(history.flush_loop(interval=0.01))
+            await asyncio.sleep(0.1)
+            flusher.cancel()
+            with open(os.path.join(log_dir, "chat-000000000001.log")) as f:
+                self.assertEqual(len(f.readlines()), 5)
+            history.close()
+
+        with tempfile.TemporaryDirectory() as log_dir:
+            asyncio.run(run(log_dir))
+
+    def test_clean_close_keeps_every_line(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            history = ChatHistory(size=1000, log_dir=log_dir, segment_size=64)
+            for i in range(500):
+                self.record(history, ("global", "trade")[i % 2], str(i))
+            history.close()  # never flushed before
+
+            restarted = ChatHistory(size=1000, log_dir=log_dir)
+            self.assertEqual((restarted.seq, restarted.stats.restored), (500, 500))
+            lines = restarted.since(["global", "trade"], seq=0)
+            self.assertEqual([m.text for m in lines], [str(i) for i in range(500)])
+            restarted.close()
+
+
+class TestCatchUp(unittest.TestCase):
+    def test_stream_resumes_from_cursor(self):
+        async def run():
+            servicer = ChatServiceServicer(CHANNELS_FILE)
+            for i in range(3):
+                await servicer.SendMessage(message("global", str(i)), None)
+            published = servicer.hub.stats.published
+            request = chatservice_pb2.StreamRequest(playerId="p1", channels=["global"], sinceSeq=1)
+            stream = servicer.StreamMessages(request, None)
+            backlog = [await stream.__anext__(), await stream.__anext__()]
+            self.assertEqual([(m.text, m.seq) for m in backlog], [("1", 2), ("2", 3)])
+            self.assertEqual(servicer.hub.stats.published, published)  # not fanned out again
+            await servicer.SendMessage(message("global", "live"), None)
+            self.assertEqual((await stream.__anext__()).seq, 4)
+            await stream.aclose()
+            self.assertEqual(servicer.metrics()["history"]["replayed"], 2)
+
+        asyncio.run(run())
+
+
+class RecordingMaster:
+    def __init__(self):
+        self.chat = []
+
+    async def broadcast_chat(self, msg):
+        self.chat.append((msg.channel, msg.text))
+
+
+class TestLocalTransport(unittest.TestCase):
+    def test_send_and_listen_in_process(self):
+        async def run():
+            servicer = ChatServiceServicer(CHANNELS_FILE)
+            master = RecordingMaster()
+            manager = ChatManager(master, None, servicer=servicer)
+            listener = asyncio.ensure_future(manager.listen(["global", "trade"]))
+            await asyncio.sleep(0)
+            await manager.send_message("p1", "hi")
+            await manager.send_message("p1", "wts", channel="trade")
+            await manager.send_message("p1", "lost", channel="nowhere")
+            self.assertEqual(manager.pending, [])  # nothing queued for a flusher
+            await asyncio.sleep(0)
+            self.assertEqual(master.chat, [("global", "hi"), ("trade", "wts")])
+            metrics = manager.metrics()
+            self.assertEqual((metrics["sent"], metrics["rejected"], metrics["batches"]), (2, 1, 0))
+            listener.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await listener
+            self.assertEqual(len(servicer.hub), 0)
+
+        asyncio.run(run())
+
+    def test_grpc_clients_reach_local_listener(self):
+        async def run():
+            servicer = ChatServiceServicer(CHANNELS_FILE)
+            master = RecordingMaster()
+            manager = ChatManager(master, None)
+            manager.use_local(servicer)
+            listener = asyncio.ensure_future(manager.listen(["global"]))
+            await asyncio.sleep(0)
+            ack = await servicer.SendMessage(message("global", "from outside"), None)
+            self.assertTrue(ack.success)
+            await asyncio.sleep(0)
+            self.assertEqual(master.chat, [("global", "from outside")])
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+        asyncio.run(run())
+
+    def test_listener_resubscribes_after_disconnect(self):
+        async def run():
+            servicer = ChatServiceServicer(CHANNELS_FILE, queue_limit=2)
+            servicer.hub.channel_policies["global"] = chat_hub.OVERFLOW_DISCONNECT
+            master = RecordingMaster()
+            manager = ChatManager(master, None, servicer=servicer)
+            listener = asyncio.ensure_future(manager.listen(["global"]))
+            await asyncio.sleep(0)
+            for i in range(5):  # overflows the listener's inbox before it runs
+                servicer.publish(message("global", f"line {i}"))
+            await asyncio.sleep(0)
+            servicer.publish(message("global", "after"))
+            await asyncio.sleep(0)
+            # The lines missed while disconnected come back from the history rings
+            self.assertEqual(master.chat, [("global", f"line {i}") for i in range(5)] + [("global", "after")])
+            self.assertEqual(manager.metrics()["resubscribes"], 1)
+            self.assertEqual(len(servicer.hub), 1)
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
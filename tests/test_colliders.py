@@ -0,0 +1,99 @@
+import unittest
+import json
+import math
+import os
+import random
+import tempfile
+
+import colliders
+from colliders import ColliderGrid, aabb, oriented_box
+
+
+def yaw_quaternion(degrees):
+    half = math.radians(degrees) / 2
+    return (0.0, math.sin(half), 0.0, math.cos(half))
+
+
+class TestBoxes(unittest.TestCase):
+    def test_aabb_contains(self):
+        box = aabb((0, 0, 0), (4, 3, 2))
+        self.assertTrue(box.contains(4, 3, 2))
+        self.assertTrue(box.contains(2, 1, 1))
+        self.assertFalse(box.contains(2, 3.1, 1))
+
+    def test_oriented_box(self):
+        # 10 x 2 plank rotated 90 degrees about y now runs along z
+        box = oriented_box((0, 0, 0), (10, 2, 2), yaw_quaternion(90))
+        self.assertTrue(box.contains(0, 0, 4.5))
+        self.assertFalse(box.contains(4.5, 0, 0))
+        self.assertAlmostEqual(box.max[2], 5)
+        self.assertAlmostEqual(box.max[0], 1)
+
+    def test_segment_entry(self):
+        box = aabb((4, 0, -1), (6, 2, 1))
+        self.assertAlmostEqual(box.segment_entry((0, 1, 0), (10, 1, 0)), 0.4)
+        self.assertIsNone(box.segment_entry((0, 1, 2), (10, 1, 2)))
+        self.assertIsNone(box.segment_entry((0, 1, 0), (3, 1, 0)))
+        self.assertEqual(box.segment_entry((5, 1, 0), (10, 1, 0)), 0.0)
+
+
+class TestColliderGrid(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.boxes = [
+            oriented_box((rng.uniform(0, 200), 2, rng.uniform(0, 200)),
+                         (rng.uniform(1, 20), 4, rng.uniform(1, 20)), yaw_quaternion(rng.uniform(0, 360)))
+            for _ in range(300)
+        ]
+        self.grid = ColliderGrid(self.boxes, cell_size=8)
+        self.points = [(rng.uniform(-10, 210), rng.uniform(-1, 5), rng.uniform(-10, 210)) for _ in range(500)]
+
+    def naive_contains(self, x, y, z):
+        return any(b.contains(x, y, z) for b in self.boxes)
+
+    def test_point_queries_match_scan(self):
+        for p in self.points:
+            self.assertEqual(self.grid.contains(*p), self.naive_contains(*p), p)
+
+    def test_contains_many_matches_scalar(self):
+        xs, ys, zs = zip(*self.points)
+        batched = self.grid.contains_many(xs, ys, zs)
+        self.assertEqual([bool(v) for v in batched], [self.grid.contains(*p) for p in self.points])
+
+    def test_segment_hit_matches_scan(self):
+        rng = random.Random(3)
+        for _ in range(300):
+            p0 = (rng.uniform(0, 200), 2, rng.uniform(0, 200))
+            p1 = (p0[0] + rng.uniform(-30, 30), 2, p0[2] + rng.uniform(-30, 30))
+            hits = [t for t in (b.segment_entry(p0, p1) for b in self.boxes) if t is not None]
+            expected = min(hits) if hits else None
+            got = self.grid.segment_hit(p0, p1)
+            if expected is None:
+                self.assertIsNone(got)
+            else:
+                self.assertAlmostEqual(got, expected)
+
+    def test_empty_grid(self):
+        grid = ColliderGrid([])
+        self.assertFalse(grid.contains(0, 0, 0))
+        self.assertIsNone(grid.segment_hit((0, 0, 0), (5, 0, 5)))
+        self.assertEqual([bool(v) for v in grid.contains_many([0], [0], [0])], [False])
+
+    def test_load_colliders(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "colliders.json")
+            with open(path, "w") as f:
+                json.dump({"cell_size": 4, "colliders": [
+                    {"min": [0, 0, 0], "max": [2, 2, 2]},
+                    {"center": [10, 1, 10], "size": [2, 2, 6], "rotation": list(yaw_quaternion(90))},
+                ]}, f)
+            grid = colliders.load_colliders(path)
+        self.assertEqual(len(grid), 2)
+        self.assertEqual(grid.cell_size, 4)
+        self.assertTrue(grid.contains(1, 1, 1))
+        self.assertTrue(grid.contains(12.5, 1, 10))
+        self.assertFalse(grid.contains(10, 1, 12.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
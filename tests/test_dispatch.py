@@ -0,0 +1,104 @@
+import unittest
+import asyncio
+import hashlib
+import hmac
+import time
+from types import MappingProxyType
+
+from dispatch import Dispatcher
+from handlers.connection import verify_join
+from packets import parse_raw_packet
+from protocol import PacketType
+from test_handlers import DummyWriter, MinimalServer
+
+
+class TestDispatcher(unittest.TestCase):
+    def test_routes_and_counts(self):
+        seen = []
+
+        async def handle_move(server, writer, packet_or_data):
+            seen.append(packet_or_data["data"])
+
+        async def run():
+            d = Dispatcher()
+            d.register(PacketType.PLAYER_MOVE, handle_move)
+            packet = parse_raw_packet({"id": PacketType.PLAYER_MOVE, "data": {"x": 1, "y": 2, "z": 3}})
+            await d.dispatch(None, None, packet)
+            await d.dispatch(None, None, {"id": PacketType.PLAYER_MOVE, "data": {"x": 4, "y": 5, "z": 6}})
+            await d.dispatch(None, None, {"id": 999, "data": {}})
+            return d, packet
+
+        d, packet = asyncio.run(run())
+        # typed packets are passed through as-is, raw dicts as a read-only view
+        self.assertIs(seen[0], packet)
+        self.assertEqual(seen[0].get("x"), 1.0)
+        self.assertIsInstance(seen[1], MappingProxyType)
+        self.assertEqual(dict(seen[1]), {"x": 4, "y": 5, "z": 6})
+        with self.assertRaises(TypeError):
+            seen[1]["x"] = 0
+        metrics = d.metrics()
+        self.assertEqual(metrics["PLAYER_MOVE"]["count"], 2)
+        self.assertNotIn("999", metrics)
+
+    def test_pre_middleware_can_stop_packet(self):
+        calls = []
+
+        async def handler(server, writer, packet_or_data):
+            calls.append("handler")
+
+        async def deny(server, writer, packet_id, data):
+            calls.append("pre")
+            return False
+
+        async def after(server, writer, packet_id, data):
+            calls.append("post")
+
+        async def run():
+            d = Dispatcher()
+            d.register(PacketType.CHAT, handler)
+            d.register(PacketType.PING, handler)
+            d.add_pre(deny, [PacketType.CHAT])
+            d.add_post(after)
+            await d.dispatch(None, None, {"id": PacketType.CHAT, "data": {}})
+            await d.dispatch(None, None, {"id": PacketType.PING, "data": {}})
+
+        asyncio.run(run())
+        self.assertEqual(calls, ["pre", "handler", "post"])
+
+    def test_handler_errors_are_counted(self):
+        async def broken(server, writer, packet_or_data):
+            raise RuntimeError("boom")
+
+        d = Dispatcher()
+        d.register(PacketType.CHAT, broken)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(d.dispatch(None, None, {"id": PacketType.CHAT, "data": {}}))
+        self.assertEqual(d.metrics()["CHAT"]["errors"], 1)
+
+
+class TestVerifyJoin(unittest.TestCase):
+    def setUp(self):
+        self.server = MinimalServer()
+        self.server.server_secret = "secret"
+        self.writer = DummyWriter()
+
+    def join_data(self, nonce, ts=None, secret="secret"):
+        ts = int(time.time()) if ts is None else ts
+        proof = hmac.new(secret.encode(), (nonce + "p1" + str(ts)).encode(), hashlib.sha256).hexdigest()
+        return {"preferredId": "p1", "ts": ts, "hmac": proof}
+
+    def test_valid_proof_passes(self):
+        self.server.sessions.connect(self.writer).nonce = "abc"
+        ok = asyncio.run(verify_join(self.server, self.writer, PacketType.PLAYER_JOIN, self.join_data("abc")))
+        self.assertTrue(ok)
+        self.assertFalse(self.writer.closed)
+
+    def test_bad_proof_or_missing_nonce_disconnects(self):
+        self.server.sessions.connect(self.writer).nonce = "abc"
+        data = self.join_data("abc", secret="wrong")
+        self.assertFalse(asyncio.run(verify_join(self.server, self.writer, PacketType.PLAYER_JOIN, data)))
+        self.assertTrue(self.writer.closed)
+
+        other = DummyWriter()
+        self.assertFalse(asyncio.run(verify_join(self.server, other, PacketType.PLAYER_JOIN, self.join_data("abc"))))
+        self.assertTrue(other.closed)
@@ -2,8 +2,11 @@ import unittest
 import asyncio
 from types import SimpleNamespace
 
+from colliders import ColliderGrid, aabb
 from handlers.player import handle_player_join, handle_player_move
 from handlers.chat import handle_chat
+from movement import MoveStats
+from sessions import SessionTable
 from protocol import PacketType
 
 
@@ -31,16 +34,22 @@ class DummyWriter:
 class MinimalServer(SimpleNamespace):
     def __init__(self):
         super().__init__()
-        self.clients = {}
-        self.client_positions = {}
-        self.last_move_times = {}
+        self.sessions = SessionTable()
         self.spawn_points = [(0, 0, 0)]
         self.max_speed = 10.0
         self.world_bounds = {"min_x": -100, "max_x": 100, "min_y": -10, "max_y": 10, "min_z": -100, "max_z": 100}
         # new attributes used by handlers
-        self.writers_by_id = {}
-        self.nicknames = {}
-        self.nickname_to_id = {}
+        self.dirty_players = set()
+        self.npc_grid = None
+        self.encodings = ["json"]
+        self.quantizer = None
+        self.chat_channels = ("global", "trade", "guild")
+        self.chat_autojoin = ("global",)
+        self.codecs = {}
+        self.outboxes = {}
+        self.move_batching = False
+        self.pending_moves = {}
+        self.move_stats = MoveStats()
 
     async def send(self, writer, packet_id, data):
         writer.write(str({"id": packet_id, "data": data}).encode())
@@ -49,12 +58,21 @@ class MinimalServer(SimpleNamespace):
     async def broadcast_world_state(self):
         return
 
+    async def world_changed(self, player_id):
+        self.dirty_players.add(player_id)
+
     def get_height_at(self, x, z):
         return 0
 
+    def heights_at(self, xs, zs):
+        return [self.get_height_at(x, z) for x, z in zip(xs, zs)]
+
     def is_inside_collider(self, x, y, z):
         return False
 
+    def collider_hit(self, p0, p1):
+        return None
+
 
 class TestHandlers(unittest.TestCase):
     def test_player_join_and_move(self):
@@ -64,28 +82,90 @@ class TestHandlers(unittest.TestCase):
         async def run():
             await handle_player_join(server, writer, {"data": {}})
             # writer should now be registered
-            self.assertIn(writer, server.clients)
-            pid = server.clients[writer]
+            self.assertIsNotNone(server.sessions.joined(writer))
+            pid = server.sessions.player_id(writer)
             # Send a small move (should succeed)
             await handle_player_move(server, writer, {"data": {"x": 1, "y": 0, "z": 1}})
-            self.assertIn(pid, server.client_positions)
+            self.assertEqual(server.sessions.by_player(pid).position, (1, 0, 1))
+            self.assertIn(pid, server.dirty_players)
 
         asyncio.run(run())
 
     def test_chat_handler_runs(self):
         server = MinimalServer()
         writer = DummyWriter()
+        sent = []
+
         # fake chat manager
         async def send_message(player_id, text, channel):
-            return
+            sent.append((player_id, text, channel))
 
         server.chat = SimpleNamespace(send_message=send_message)
-        server.clients[writer] = "player1"
+        server.sessions.join(writer, "player1", (0, 0, 0), 0, channels=("global",))
 
         async def run():
             await handle_chat(server, writer, {"data": {"text": "hi", "channel": "global"}})
+            await handle_chat(server, writer, {"data": {"text": "wts", "channel": "trade"}})
+            await handle_chat(server, writer, {"data": {"text": "/leave global"}})
+            await handle_chat(server, writer, {"data": {"text": "bye", "channel": "global"}})
 
         asyncio.run(run())
+        # only members post to a channel
+        self.assertEqual(sent, [("player1", "hi", "global")])
+        self.assertIn(b"You are not in trade.", writer.buf)
+        self.assertIn(b"'left': 'global'", writer.buf)
+        self.assertIn(b"You are not in global.", writer.buf)
+
+
+class SweptServer(MinimalServer):
+    """MinimalServer with a wall at x in [4, 5] and a 20-unit ridge at x in [14, 16]."""
+
+    def __init__(self):
+        super().__init__()
+        self.walls = ColliderGrid([aabb((4, -5, -50), (5, 5, 50))], cell_size=4)
+        self.sent = []
+
+    async def send(self, writer, packet_id, data):
+        self.sent.append((packet_id, data))
+
+    def get_height_at(self, x, z):
+        return 20 if 14 <= x <= 16 else 0
+
+    def is_inside_collider(self, x, y, z):
+        return self.walls.contains(x, y, z)
+
+    def collider_hit(self, p0, p1):
+        return self.walls.segment_hit(p0, p1)
+
+
+class TestSweptMove(unittest.TestCase):
+    def move(self, server, start, end):
+        writer = DummyWriter()
+        # last move long ago: any distance passes the speed check
+        server.sessions.join(writer, "p1", start, 0)
+        asyncio.run(handle_player_move(server, writer, {"data": dict(zip("xyz", end))}))
+        return server.sessions.by_player("p1").position
+
+    def test_tunnelling_through_wall_is_stopped_at_the_wall(self):
+        server = SweptServer()
+        self.assertEqual(self.move(server, (0, 0, 0), (8, 0, 0)), (0, 0, 0))
+        packet_id, data = server.sent[0]
+        self.assertEqual(packet_id, PacketType.PLAYER_CORRECTION)
+        self.assertAlmostEqual(data["x"], 3.95)
+
+    def test_crossing_a_ridge_is_rejected(self):
+        server = SweptServer()
+        self.assertEqual(self.move(server, (10, 0, 0), (20, 0, 0)), (10, 0, 0))
+        self.assertEqual(server.sent[0][1], {"x": 10, "y": 0, "z": 0})
+
+    def test_large_clear_step_is_accepted(self):
+        server = SweptServer()
+        self.assertEqual(self.move(server, (6, 0, 0), (12, 0, 5)), (12, 0, 5))
+        self.assertEqual(server.sent, [])
+
+    def test_player_inside_collider_can_walk_out(self):
+        server = SweptServer()
+        self.assertEqual(self.move(server, (4.5, 0, 0), (6, 0, 0)), (6, 0, 0))
 
 
 if __name__ == "__main__":
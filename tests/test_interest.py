@@ -0,0 +1,134 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+
+import wire
+from handlers import world, npc
+from interest import InterestGrid
+from protocol import PacketType
+from sessions import SessionTable
+from snapshots import SnapshotHistory
+from test_world import CountingWriter
+
+BOUNDS = {"min_x": 0, "max_x": 100, "min_z": 0, "max_z": 100, "min_y": 0, "max_y": 50}
+
+
+def make_server(radius=10):
+    handles = wire.HandleTable()
+    return SimpleNamespace(
+        handles=handles,
+        sessions=SessionTable(handles),
+        pending_moves={},
+        dirty_players=set(),
+        broadcast_mode=world.BROADCAST_TICK,
+        delta_compression=True,
+        keyframe_interval=100,
+        world_history=SnapshotHistory(),
+        world_acks={},
+        world_sent={},
+        world_keyframes={},
+        view_radius=radius,
+        player_grid=InterestGrid(BOUNDS, radius),
+        npc_grid=InterestGrid(BOUNDS, radius),
+        world_visible={},
+        visible_npcs={},
+        npc_watchers={},
+        npc_batching=True,
+        npc_quantum=None,
+        npc_sent={},
+        npc_service=SimpleNamespace(npcs={}),
+        codecs={},
+        outboxes={},
+    )
+
+
+def add_player(server, pid, pos):
+    w = CountingWriter()
+    server.sessions.join(w, pid, pos, 0)
+    server.dirty_players.add(pid)
+    return w
+
+
+class TestInterestGrid(unittest.TestCase):
+    def test_query_radius_and_incremental_move(self):
+        grid = InterestGrid(BOUNDS, 10)
+        grid.update("a", 5, 5)
+        grid.update("b", 12, 5)
+        grid.update("c", 50, 50)
+        self.assertEqual(grid.query(5, 5, 10), {"a", "b"})
+        grid.update("c", 8, 8)
+        self.assertEqual(grid.query(5, 5, 10), {"a", "b", "c"})
+        grid.remove("b")
+        self.assertEqual(grid.query(5, 5, 10), {"a", "c"})
+        self.assertNotIn("b", grid)
+
+    def test_out_of_bounds_positions_are_clamped(self):
+        grid = InterestGrid(BOUNDS, 10)
+        grid.update("a", -3, 101)
+        self.assertEqual(grid.query(0, 100, 5), {"a"})
+
+
+class TestInterestFiltering(unittest.TestCase):
+    def test_world_updates_only_contain_nearby_players(self):
+        server = make_server()
+        w0 = add_player(server, "p0", (10, 0, 10))
+        add_player(server, "p1", (15, 0, 10))
+        add_player(server, "p2", (80, 0, 80))
+
+        async def run():
+            await world.world_tick(server)
+            await world.handle_world_ack(server, w0, {"data": {"seq": 1}})
+            # p2 walks into p0's view, p1 walks out of it
+            server.sessions.by_player("p2").position = (12, 0, 12)
+            server.sessions.by_player("p1").position = (40, 0, 40)
+            await world.world_changed(server, "p2")
+            await world.world_changed(server, "p1")
+            await world.world_tick(server)
+
+        asyncio.run(run())
+        keyframe, delta = w0.packets
+        self.assertEqual({p["id"] for p in keyframe["data"]["players"]}, {"p0", "p1"})
+        self.assertEqual(delta["id"], PacketType.WORLD_DELTA)
+        self.assertEqual([p["id"] for p in delta["data"]["players"]], ["p2"])
+        self.assertEqual(delta["data"]["removed"], ["p1"])
+
+    def test_npc_enter_and_leave_events(self):
+        server = make_server()
+        near = add_player(server, "p0", (10, 0, 10))
+        far = add_player(server, "p1", (80, 0, 80))
+        server.npc_service.npcs["wolf"] = {"x": 12, "y": 0, "z": 10, "name": "Wolf"}
+
+        async def run():
+            await world.world_tick(server)
+            await npc.broadcast_npc_spawn(server, "wolf", 12, 0, 10)
+            await npc.broadcast_npc_update(server, "wolf", 14, 0, 10)
+            await npc.broadcast_npc_update(server, "wolf", 78, 0, 80)
+
+        asyncio.run(run())
+        near_npc = [p["id"] for p in near.packets if p["id"] in (PacketType.NPC_SPAWN, PacketType.NPC_UPDATE, PacketType.NPC_DESPAWN)]
+        far_npc = [p["id"] for p in far.packets if p["id"] in (PacketType.NPC_SPAWN, PacketType.NPC_UPDATE, PacketType.NPC_DESPAWN)]
+        self.assertEqual(near_npc, [PacketType.NPC_SPAWN, PacketType.NPC_UPDATE, PacketType.NPC_DESPAWN])
+        self.assertEqual(far_npc, [PacketType.NPC_SPAWN])
+        self.assertEqual(server.npc_watchers["wolf"], {far})
+
+    def test_player_move_refreshes_npc_visibility(self):
+        server = make_server()
+        w = add_player(server, "p0", (10, 0, 10))
+        server.npc_service.npcs["guard"] = {"x": 50, "y": 0, "z": 50}
+
+        async def run():
+            await npc.broadcast_npc_spawn(server, "guard", 50, 0, 50)
+            await world.world_tick(server)
+            server.sessions.by_player("p0").position = (45, 0, 45)
+            await world.world_changed(server, "p0")
+            await world.world_tick(server)
+
+        asyncio.run(run())
+        spawns = [p for p in w.packets if p["id"] == PacketType.NPC_SPAWN]
+        self.assertEqual(len(spawns), 1)
+        self.assertEqual(spawns[0]["data"]["npcId"], "guard")
+        self.assertEqual(server.visible_npcs[w], {"guard"})
+
+
+if __name__ == "__main__":
+    unittest.main()
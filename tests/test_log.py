@@ -0,0 +1,75 @@
+import unittest
+import io
+import logging
+import threading
+
+import log
+
+
+class TestSampler(unittest.TestCase):
+    def setUp(self):
+        self.logger = log.get_logger("test.sampler")
+        self.records = []
+        handler = logging.Handler()
+        handler.emit = self.records.append
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+        self.addCleanup(self.logger.setLevel, logging.NOTSET)
+
+    def test_disabled_level_skips_formatting(self):
+        self.logger.setLevel(logging.INFO)
+
+        class Explodes:
+            def __str__(self):
+                raise AssertionError("formatted while disabled")
+
+        trace = log.Sampler(self.logger, every=1)
+        trace("[RECV] %s", Explodes())
+        self.logger.debug("[RECV] %s", Explodes())
+        self.assertEqual(self.records, [])
+
+    def test_one_in_every(self):
+        self.logger.setLevel(logging.DEBUG)
+        trace = log.Sampler(self.logger, every=10)
+        for i in range(25):
+            trace("[MOVE] %d", i)
+        self.assertEqual([r.getMessage() for r in self.records], ["[MOVE] 0", "[MOVE] 10", "[MOVE] 20"])
+
+
+class TestConfigure(unittest.TestCase):
+    def test_records_go_through_queue_listener(self):
+        out = io.StringIO()
+        log.configure("INFO", stream=out)
+        self.addCleanup(log.shutdown)
+        root = logging.getLogger(log.ROOT)
+        self.addCleanup(lambda: [root.removeHandler(h) for h in list(root.handlers)])
+        self.addCleanup(setattr, root, "propagate", True)
+        self.addCleanup(root.setLevel, logging.NOTSET)
+        self.assertIsInstance(root.handlers[0], logging.handlers.QueueHandler)
+
+        log.get_logger("test.configure").info("[JOIN] Player %s joined", "p1")
+        log.get_logger("test.configure").debug("[RECV] hidden")
+        log.shutdown()
+        self.assertIn("[JOIN] Player p1 joined", out.getvalue())
+        self.assertNotIn("hidden", out.getvalue())
+
+    def test_formatting_happens_on_the_listener_thread(self):
+        out = io.StringIO()
+        log.configure("INFO", stream=out)
+        self.addCleanup(log.shutdown)
+        root = logging.getLogger(log.ROOT)
+        self.addCleanup(lambda: [root.removeHandler(h) for h in list(root.handlers)])
+        self.addCleanup(setattr, root, "propagate", True)
+        self.addCleanup(root.setLevel, logging.NOTSET)
+        threads = []
+
+        class Arg:
+            def __str__(self):
+                threads.append(threading.current_thread())
+                return "arg"
+
+        log.get_logger("test.configure").info("[JOIN] %s", Arg())
+        log.shutdown()
+        self.assertIn("[JOIN] arg", out.getvalue())
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
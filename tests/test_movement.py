@@ -0,0 +1,113 @@
+import unittest
+import asyncio
+import random
+from types import SimpleNamespace
+
+import movement
+from handlers import world as world_handlers
+from handlers.player import handle_player_move, process_moves
+from master_server import MasterServer
+from protocol import PacketType
+from test_handlers import DummyWriter, MinimalServer
+
+BOUNDS = {"min_x": -100, "max_x": 100, "min_y": -10, "max_y": 10, "min_z": -100, "max_z": 100}
+
+
+class RecordingServer(MinimalServer):
+    def __init__(self):
+        super().__init__()
+        self.move_batching = True
+        self.sent = []
+
+    async def send(self, writer, packet_id, data):
+        self.sent.append((writer, packet_id, data))
+
+    def get_height_at(self, x, z):
+        return 0
+
+
+class TestCheckMoves(unittest.TestCase):
+    @unittest.skipIf(movement.np is None, "numpy not installed")
+    def test_vectorized_matches_scalar(self):
+        rng = random.Random(5)
+        server = SimpleNamespace(max_speed=10.0, world_bounds=BOUNDS,
+                                 heights_at=lambda xs, zs: [0.0] * len(xs))
+        olds = [(rng.uniform(-90, 90), 0, rng.uniform(-90, 90)) for _ in range(500)]
+        news = [(x + rng.uniform(-20, 20), rng.uniform(-12, 12), z + rng.uniform(-20, 20)) for x, _, z in olds]
+        elapsed = [rng.choice([0, 0.0005, 0.1, 0.5, 2.0]) for _ in olds]
+        vectorized = movement.check_moves(server, olds, news, elapsed)
+        scalar = movement.check_moves_scalar(server, olds, news, elapsed)
+        self.assertEqual(vectorized[0], scalar[0])
+        self.assertEqual(len(set(scalar[0])), 5)
+
+
+class TestMoveBatching(unittest.TestCase):
+    def join(self, server, pid, pos):
+        writer = DummyWriter()
+        server.sessions.join(writer, pid, pos, 0)
+        return writer
+
+    def test_latest_move_per_player_validated_once_per_tick(self):
+        server = RecordingServer()
+        a = self.join(server, "a", (0, 0, 0))
+        b = self.join(server, "b", (10, 0, 10))
+
+        async def run():
+            for x in (1, 2, 3):
+                await handle_player_move(server, a, {"data": {"x": x, "y": 0, "z": 0}})
+            await handle_player_move(server, b, {"data": {"x": 500, "y": 0, "z": 10}})
+            # Nothing is applied before the tick
+            self.assertEqual(server.sessions.by_player("a").position, (0, 0, 0))
+            self.assertEqual(server.sent, [])
+            await process_moves(server)
+
+        asyncio.run(run())
+        self.assertEqual(server.sessions.by_player("a").position, (3, 0, 0))
+        self.assertEqual(server.sessions.by_player("b").position, (10, 0, 10))
+        self.assertEqual(server.dirty_players, {"a"})
+        self.assertEqual(server.sent, [(b, PacketType.PLAYER_CORRECTION, {"x": 10, "y": 0, "z": 10})])
+        metrics = server.move_stats.metrics()
+        self.assertEqual((metrics["received"], metrics["superseded"], metrics["accepted"]), (4, 2, 1))
+        self.assertEqual(metrics["rejected"], {movement.VERDICT_BOUNDS: 1})
+        self.assertEqual(metrics["top_offenders"], [("b", 1)])
+        self.assertEqual(server.pending_moves, {})
+
+    def test_height_correction_keeps_xz(self):
+        server = RecordingServer()
+        a = self.join(server, "a", (0, 0, 0))
+
+        async def run():
+            await handle_player_move(server, a, {"data": {"x": 1, "y": 8, "z": 1}})
+            await process_moves(server)
+
+        asyncio.run(run())
+        self.assertEqual(server.sent[0][2], {"x": 1, "y": 0, "z": 1})
+
+    def test_per_move_mode_applies_moves_on_arrival(self):
+        server = MasterServer(broadcast_mode=world_handlers.BROADCAST_PER_MOVE)
+        self.assertFalse(server.move_batching)
+        writer = DummyWriter()
+        spawn = server.spawn_points[0]
+        server.sessions.join(writer, "a", spawn, 0)
+        moved = (spawn[0] + 1, spawn[1], spawn[2])
+
+        asyncio.run(handle_player_move(server, writer, {"data": dict(zip("xyz", moved))}))
+        self.assertEqual(server.sessions.by_player("a").position, moved)
+        self.assertEqual(server.pending_moves, {})
+        self.assertIn(str(moved[0]).encode(), writer.buf)  # broadcast right away
+
+    def test_disconnected_player_move_is_dropped(self):
+        server = RecordingServer()
+        a = self.join(server, "a", (0, 0, 0))
+
+        async def run():
+            await handle_player_move(server, a, {"data": {"x": 1, "y": 0, "z": 0}})
+            server.sessions.close(a)
+            await process_moves(server)
+
+        asyncio.run(run())
+        self.assertEqual(server.move_stats.accepted, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import asyncio
+
+import wire
+from handlers import world, npc
+from handlers.broadcast import broadcast_packet
+from protocol import PacketType
+from test_interest import make_server, add_player
+
+MOVES = [("wolf", 12.0, 0.0, 10.0), ("bear", 80.0, 0.0, 80.0), ("crow", 11.0, 2.0, 9.0)]
+
+
+def npc_packets(w):
+    return [p for p in w.packets if p["id"] in (PacketType.NPC_UPDATE, PacketType.NPC_BATCH_UPDATE)]
+
+
+class TestNpcBatch(unittest.TestCase):
+    def test_one_batch_per_client_without_interest(self):
+        server = make_server()
+        server.npc_grid = None
+        ws = [add_player(server, f"p{i}", (10, 0, 10)) for i in range(3)]
+
+        asyncio.run(npc.broadcast_npc_updates(server, MOVES))
+        for w in ws:
+            (packet,) = npc_packets(w)
+            self.assertEqual(packet["id"], PacketType.NPC_BATCH_UPDATE)
+            self.assertEqual([e["npcId"] for e in packet["data"]["npcs"]], ["wolf", "bear", "crow"])
+
+    def test_batches_respect_interest(self):
+        server = make_server()
+        near = add_player(server, "p0", (10, 0, 10))
+        far = add_player(server, "p1", (80, 0, 80))
+
+        async def run():
+            await world.world_tick(server)
+            for npc_id, x, y, z in MOVES:
+                server.npc_service.npcs[npc_id] = {"x": x, "y": y, "z": z}
+                await npc.broadcast_npc_spawn(server, npc_id, x, y, z)
+            await npc.broadcast_npc_updates(server, [(i, x + 1, y, z) for i, x, y, z in MOVES])
+
+        asyncio.run(run())
+        (near_batch,) = npc_packets(near)
+        (far_batch,) = npc_packets(far)
+        self.assertEqual({e["npcId"] for e in near_batch["data"]["npcs"]}, {"wolf", "crow"})
+        self.assertEqual([e["npcId"] for e in far_batch["data"]["npcs"]], ["bear"])
+
+    def test_batching_off_sends_per_npc_updates(self):
+        server = make_server()
+        server.npc_grid = None
+        server.npc_batching = False
+        server._broadcast = lambda packet_id, data: broadcast_packet(server, packet_id, data)
+        w = add_player(server, "p0", (10, 0, 10))
+
+        asyncio.run(npc.broadcast_npc_updates(server, MOVES))
+        self.assertEqual([p["id"] for p in npc_packets(w)], [PacketType.NPC_UPDATE] * 3)
+
+    def test_quantized_batches_skip_unchanged_npcs(self):
+        server = make_server()
+        server.npc_grid = None
+        server.npc_quantum = 0.01
+        w = add_player(server, "p0", (10, 0, 10))
+
+        async def run():
+            await npc.broadcast_npc_updates(server, MOVES)
+            # wolf moves less than a quantum, bear moves a metre
+            await npc.broadcast_npc_updates(server, [("wolf", 12.001, 0.0, 10.0), ("bear", 81.0, 0.0, 80.0)])
+
+        asyncio.run(run())
+        first, second = npc_packets(w)
+        self.assertEqual(first["data"]["q"], 0.01)
+        self.assertEqual(first["data"]["npcs"][0], {"npcId": "wolf", "x": 1200, "y": 0, "z": 1000})
+        self.assertEqual(second["data"]["npcs"], [{"npcId": "bear", "x": 8100, "y": 0, "z": 8000}])
+
+
+class TestNpcBatchWire(unittest.TestCase):
+    def roundtrip(self, data):
+        codec = wire.BinaryCodec(wire.HandleTable())
+        (packet,) = wire.BinaryDecoder().feed(codec.encode(PacketType.NPC_BATCH_UPDATE, data))
+        return packet["data"]
+
+    def test_float_batch_roundtrip(self):
+        data = {"npcs": [{"npcId": "wolf", "x": 1.5, "y": -2.0, "z": 3.25}]}
+        self.assertEqual(self.roundtrip(data), data)
+
+    def test_quantized_batch_is_smaller(self):
+        npcs = [{"npcId": f"npc-{i}", "x": 1200 + i, "y": -35, "z": 990} for i in range(50)]
+        quantized = {"q": 0.01, "npcs": npcs}
+        self.assertEqual(self.roundtrip(quantized), quantized)
+        handles = wire.HandleTable()
+        floats = {"npcs": [dict(e, x=e["x"] / 100, y=e["y"] / 100, z=e["z"] / 100) for e in npcs]}
+        q_len = len(wire.encode_payload(PacketType.NPC_BATCH_UPDATE, quantized, handles)[0])
+        f_len = len(wire.encode_payload(PacketType.NPC_BATCH_UPDATE, floats, handles)[0])
+        self.assertLess(q_len, f_len * 0.75)
@@ -0,0 +1,98 @@
+import unittest
+import math
+import threading
+from types import SimpleNamespace
+
+import npc_store
+from npc_store import make_npc_store, step_npcs
+
+BOUNDS = {"min_x": 0, "max_x": 100, "min_z": 0, "max_z": 100}
+
+
+def make_server(blocked=lambda x, y, z: False):
+    return SimpleNamespace(
+        world_bounds=BOUNDS,
+        get_height_at=lambda x, z: 5.0,
+        heights_at=lambda xs, zs: [5.0] * len(xs),
+        is_inside_collider=blocked,
+        colliders_contain=lambda xs, ys, zs: [blocked(x, y, z) for x, y, z in zip(xs, ys, zs)],
+    )
+
+
+class TestDictStep(unittest.TestCase):
+    def test_dict_store_without_numpy(self):
+        npcs = make_npc_store(vectorized=False)
+        self.assertEqual(npcs, {})
+        npcs["a"] = {"x": 50.0, "y": 0.0, "z": 50.0, "yaw": 0.0, "speed": 2.0, "state": "idle"}
+        (move,) = step_npcs(npcs, 0.25, make_server())
+        self.assertEqual(move[0], "a")
+        self.assertEqual(npcs["a"]["state"], "walking")
+        self.assertAlmostEqual(math.hypot(move[1] - 50, move[3] - 50), 0.5)
+
+
+@unittest.skipIf(npc_store.np is None, "numpy not installed")
+class TestArrayNpcStore(unittest.TestCase):
+    def make_store(self):
+        store = npc_store.ArrayNpcStore(capacity=2, seed=1)
+        store["a"] = {"name": "Alice", "x": 50.0, "y": 0.0, "z": 50.0, "yaw": 0.0, "speed": 2.0, "state": "idle"}
+        store["b"] = {"name": "Bob", "x": 99.9, "y": 0.0, "z": 50.0, "yaw": 0.0, "speed": 2.0}
+        store["c"] = {"name": "Cat", "x": 10.0, "y": 0.0, "z": 10.0, "yaw": 0.0}
+        return store
+
+    def test_dict_view(self):
+        store = self.make_store()
+        self.assertEqual(len(store), 3)
+        self.assertIn("b", store)
+        self.assertEqual(store["a"]["name"], "Alice")
+        self.assertEqual(store["a"].get("state"), "idle")
+        store["a"].update({"x": 1.0, "state": "fleeing"})
+        self.assertEqual((store["a"]["x"], store["a"]["state"]), (1.0, "fleeing"))
+        self.assertEqual(dict(store["c"])["speed"], npc_store.DEFAULT_SPEED)
+
+    def test_delete_swaps_last_row_in(self):
+        store = self.make_store()
+        del store["a"]
+        self.assertEqual(sorted(store), ["b", "c"])
+        self.assertEqual(store["c"]["name"], "Cat")
+        self.assertEqual(store["c"]["x"], 10.0)
+        with self.assertRaises(KeyError):
+            store["a"]
+
+    def test_view_writes_wait_for_the_store_lock(self):
+        store = self.make_store()
+        walk = threading.Thread(target=lambda: store["c"].update({"x": 20.0, "state": "walking"}))
+        with store._lock:  # as step() or a removal holds it
+            walk.start()
+            walk.join(0.05)
+            self.assertTrue(walk.is_alive())
+            self.assertEqual(store["c"]["x"], 10.0)
+            del store["a"]  # moves c to another row under the writer
+        walk.join()
+        self.assertEqual((store["c"]["x"], store["c"]["state"]), (20.0, "walking"))
+        self.assertEqual(store["b"]["x"], 99.9)
+
+    def test_step_moves_reflects_and_blocks(self):
+        store = self.make_store()
+        server = make_server(blocked=lambda x, y, z: x < 20)
+        moves = {m[0]: m for m in step_npcs(store, 0.25, server)}
+
+        # a wanders 0.5 units and lands on the sampled height
+        self.assertEqual(set(moves), {"a"})
+        _, x, y, z = moves["a"]
+        self.assertAlmostEqual(math.hypot(x - 50, z - 50), 0.5)
+        self.assertEqual(y, 5.0)
+        self.assertEqual(store["a"]["state"], "walking")
+        # b would leave the map: reversed in place
+        self.assertEqual(store["b"]["x"], 99.9)
+        self.assertGreater(store["b"]["yaw"], math.pi / 2)
+        # c is inside a collider: turned a quarter, not moved
+        self.assertEqual(store["c"]["x"], 10.0)
+        self.assertAlmostEqual(store["c"]["yaw"], math.pi / 2, delta=0.6 * 0.25)
+
+    def test_many_npcs_one_step(self):
+        store = npc_store.ArrayNpcStore(seed=2)
+        for i in range(10000):
+            store[f"npc-{i}"] = {"x": 50.0, "y": 0.0, "z": 50.0}
+        moves = step_npcs(store, 0.25, make_server())
+        self.assertEqual(len(moves), 10000)
+        self.assertTrue(all(0 <= m[1] <= 100 for m in moves))
@@ -0,0 +1,171 @@
+import unittest
+import asyncio
+import json
+
+import outbound
+import wire
+from handlers import npc
+from handlers.broadcast import broadcast_packet
+from protocol import PacketType
+from test_handlers import DummyWriter, MinimalServer
+from test_interest import make_server
+
+
+class StalledWriter(DummyWriter):
+    """Writer whose drain() blocks until released, like a client that stopped reading."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def drain(self):
+        await self.release.wait()
+
+
+def npc_update(npc_id, x):
+    return wire.EncodedPacket(PacketType.NPC_UPDATE, {"npcId": npc_id, "x": x, "y": 0, "z": 0})
+
+
+def decode_lines(buf):
+    return [json.loads(line) for line in buf.decode().splitlines()]
+
+
+class TestClientOutbox(unittest.TestCase):
+    def test_drop_oldest_keeps_reliable_packets(self):
+        box = outbound.ClientOutbox(DummyWriter(), limit=3)
+        box.put(b"spawn\n")
+        box.put(b"u1\n", ("npc", 1))
+        box.put(b"u2\n", ("npc", 2))
+        self.assertTrue(box.put(b"chat\n"))
+        self.assertEqual(box.depth, 3)
+        self.assertEqual(box.stats.dropped, 1)
+        self.assertEqual([i[1] for i in box._items if i[1] is not None], [b"spawn\n", b"u2\n", b"chat\n"])
+
+    def test_coalesce_replaces_queued_update(self):
+        box = outbound.ClientOutbox(DummyWriter(), limit=8, policy=outbound.OVERFLOW_COALESCE)
+        box.put(b"a1\n", ("npc", "a"))
+        box.put(b"b1\n", ("npc", "b"))
+        box.put(b"a2\n", ("npc", "a"))
+        self.assertEqual(box.depth, 2)
+        self.assertEqual(box.stats.coalesced, 1)
+        self.assertEqual([i[1] for i in box._items if i[1] is not None], [b"b1\n", b"a2\n"])
+
+    def test_disconnect_policy_closes_writer(self):
+        writer = DummyWriter()
+        box = outbound.ClientOutbox(writer, limit=1, policy=outbound.OVERFLOW_DISCONNECT)
+        box.put(b"u1\n", ("npc", 1))
+        self.assertFalse(box.put(b"u2\n", ("npc", 1)))
+        self.assertTrue(writer.closed)
+        self.assertEqual(box.stats.overflow_disconnects, 1)
+        self.assertFalse(box.put(b"later\n"))
+
+    def test_full_of_reliable_packets_disconnects(self):
+        writer = DummyWriter()
+        box = outbound.ClientOutbox(writer, limit=2)
+        box.put(b"a\n")
+        box.put(b"b\n")
+        self.assertFalse(box.put(b"c\n"))
+        self.assertTrue(writer.closed)
+
+    def test_writer_task_flushes_in_order(self):
+        async def run():
+            writer = DummyWriter()
+            box = outbound.ClientOutbox(writer)
+            box.start()
+            box.put(b"one\n")
+            box.put(b"two\n", "world")
+            await asyncio.sleep(0.01)
+            box.close()
+            return writer.buf
+
+        self.assertEqual(asyncio.run(run()), b"one\ntwo\n")
+
+
+class TestNonBlockingBroadcast(unittest.TestCase):
+    def test_stalled_client_does_not_block_others(self):
+        async def run():
+            server = MinimalServer()
+            server.outbox_stats = outbound.OutboxStats()
+            slow, fast = StalledWriter(), DummyWriter()
+            for w, pid in ((slow, "slow"), (fast, "fast")):
+                server.sessions.join(w, pid, (0, 0, 0), 0)
+                server.outboxes[w] = outbound.ClientOutbox(w, limit=4, stats=server.outbox_stats)
+                server.outboxes[w].start()
+
+            # First write parks the slow client's writer task in drain()
+            await broadcast_packet(server, PacketType.CHAT, {"text": "hi"})
+            await asyncio.sleep(0.01)
+            for i in range(10):
+                await asyncio.wait_for(broadcast_packet(server, PacketType.NPC_UPDATE,
+                                                        {"npcId": 7, "x": i, "y": 0, "z": 0}), 0.1)
+            await asyncio.sleep(0.01)
+            metrics = outbound.queue_metrics(server)
+            fast_packets = decode_lines(fast.buf)
+
+            slow.release.set()
+            await asyncio.sleep(0.01)
+            slow_packets = decode_lines(slow.buf)
+            for box in server.outboxes.values():
+                box.close()
+            return metrics, fast_packets, slow_packets
+
+        metrics, fast_packets, slow_packets = asyncio.run(run())
+        self.assertEqual(len(fast_packets), 11)
+        self.assertEqual(metrics["max_depth"], 4)
+        self.assertEqual(metrics["dropped"], 6)
+        # The slow client skips stale positions but ends at the latest one
+        self.assertEqual(slow_packets[-1]["data"]["x"], 9)
+        self.assertEqual(len(slow_packets), 5)
+
+    def test_binary_intern_preamble_is_never_dropped(self):
+        server = MinimalServer()
+        server.outbox_stats = outbound.OutboxStats()
+        w = DummyWriter()
+        server.codecs[w] = wire.BinaryCodec(wire.HandleTable())
+        box = server.outboxes[w] = outbound.ClientOutbox(w, limit=4, stats=server.outbox_stats)
+        for i in range(3):
+            outbound.deliver(server, w, npc_update(f"npc-{i}", i))
+        live = [item for item in box._items if item[1] is not None]
+        # Every INTERN frame is still queued; only position frames were dropped
+        self.assertEqual(sum(1 for key, *_ in live if key is None), 3)
+
+    def test_stalled_queue_stays_bounded(self):
+        box = outbound.ClientOutbox(DummyWriter(), limit=4)
+        for i in range(1000):
+            box.put(b"u\n", ("npc", i))
+        self.assertEqual(box.depth, 4)
+        self.assertLessEqual(len(box._items), 8)
+
+    def test_stalled_client_drops_npc_batches(self):
+        async def run():
+            server = make_server()
+            server.npc_grid = None
+            server.npc_quantum = 0.01
+            server.outbox_stats = outbound.OutboxStats()
+            w = StalledWriter()
+            server.sessions.join(w, "slow", (0, 0, 0), 0)
+            box = server.outboxes[w] = outbound.ClientOutbox(w, limit=4, policy=outbound.OVERFLOW_COALESCE,
+                                                             stats=server.outbox_stats)
+            box.start()
+            await broadcast_packet(server, PacketType.CHAT, {"text": "hi"})
+            await asyncio.sleep(0.01)  # the writer task is parked in drain()
+            for i in range(10):
+                await npc.broadcast_npc_updates(server, [("wolf", float(i), 0.0, 0.0)])
+                # the batch that was just queued is still marked as sent
+                self.assertEqual(server.npc_sent, {"wolf": (i * 100, 0, 0)})
+                await npc.broadcast_npc_updates(server, [("bear", 50.0, 0.0, float(i))])
+                # ...but the wolf's batch was coalesced away, so it goes out again
+                self.assertNotIn("wolf", server.npc_sent)
+            closed = box.closed
+            disconnects = server.outbox_stats.overflow_disconnects
+            w.release.set()
+            await asyncio.sleep(0.01)
+            box.close()
+            return closed, disconnects, decode_lines(w.buf)
+
+        closed, disconnects, packets = asyncio.run(run())
+        self.assertFalse(closed)
+        self.assertEqual(disconnects, 0)
+        self.assertEqual([p["id"] for p in packets], [PacketType.CHAT, PacketType.NPC_BATCH_UPDATE])
+        self.assertEqual(packets[-1]["data"]["npcs"], [{"npcId": "bear", "x": 5000, "y": 0, "z": 900}])
+
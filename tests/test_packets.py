@@ -1,5 +1,8 @@
 import unittest
-from packets import parse_raw_packet, BasePacket
+import os
+import subprocess
+import sys
+from packets import parse_raw_packet, packet_class, BasePacket, PacketError, TypedPacket
 from protocol import PacketType
 
 
@@ -21,5 +24,64 @@ class TestPackets(unittest.TestCase):
         self.assertEqual(pkt._data.get("_raw_id"), 99999)
 
 
+class TestTypedPackets(unittest.TestCase):
+    def test_move_is_slotted_and_validated(self):
+        pkt = parse_raw_packet({"id": PacketType.PLAYER_MOVE, "data": {"x": 1, "y": 2.5, "z": -3, "extra": 1}})
+        self.assertIsInstance(pkt, TypedPacket)
+        self.assertFalse(hasattr(pkt, "__dict__"))
+        self.assertEqual((pkt.x, pkt.y, pkt.z), (1.0, 2.5, -3.0))
+        self.assertEqual(pkt.to_data(), {"x": 1.0, "y": 2.5, "z": -3.0})
+        self.assertEqual(pkt.get("extra", "default"), "default")
+
+    def test_invalid_fields_raise(self):
+        bad = [
+            {"x": 1, "y": 2},  # missing z
+            {"x": "1", "y": 2, "z": 3},
+            {"x": float("nan"), "y": 2, "z": 3},
+            {"x": True, "y": 2, "z": 3},
+        ]
+        for data in bad:
+            with self.assertRaises(PacketError):
+                parse_raw_packet({"id": PacketType.PLAYER_MOVE, "data": data})
+        with self.assertRaises(PacketError):
+            parse_raw_packet({"id": PacketType.CHAT, "data": {"text": ["not", "text"]}})
+
+    def test_chat_defaults_and_roundtrip(self):
+        pkt = parse_raw_packet({"id": PacketType.CHAT, "data": {"text": "hi"}})
+        self.assertEqual(pkt.channel, "global")
+        self.assertEqual(pkt.to_data(), {"text": "hi", "channel": "global"})
+        again = parse_raw_packet({"id": PacketType.CHAT, "data": pkt.to_data()})
+        self.assertEqual(again.to_data(), pkt.to_data())
+
+    def test_npc_and_world_schemas(self):
+        npc = parse_raw_packet({"id": PacketType.NPC_UPDATE, "data": {"npcId": "n1", "x": 0, "y": 1, "z": 2}})
+        self.assertEqual(npc.npcId, "n1")
+        world = parse_raw_packet({"id": PacketType.WORLD_UPDATE, "data": {"players": []}})
+        self.assertEqual(world.to_data(), {"players": []})
+        with self.assertRaises(PacketError):
+            parse_raw_packet({"id": PacketType.WORLD_ACK, "data": {}})
+
+
+class TestRegistry(unittest.TestCase):
+    def test_packet_modules_load_on_first_use(self):
+        code = (
+            "import sys, packets\n"
+            "assert 'packets.npc' not in sys.modules\n"
+            "packets.parse_raw_packet({'id': 11, 'data': {'npcId': 'n', 'x': 0, 'y': 0, 'z': 0}})\n"
+            "assert 'packets.npc' in sys.modules\n"
+            "assert 'packets.chat' not in sys.modules\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=root)
+
+    def test_every_type_resolves_to_one_class(self):
+        from packets.registry import _modules
+        for pid in _modules:
+            cls = packet_class(pid)
+            self.assertIsNotNone(cls)
+            self.assertEqual(cls.packet_id, pid)
+            self.assertTrue(issubclass(cls, (BasePacket, TypedPacket)))
+
+
 if __name__ == "__main__":
     unittest.main()
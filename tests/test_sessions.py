@@ -0,0 +1,177 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+
+import wire
+from handlers.broadcast import broadcast_packet
+from handlers.chat import broadcast_chat, handle_chat
+from handlers.player import handle_player_join, handle_player_move
+from protocol import PacketType
+from sessions import SessionTable
+from test_handlers import DummyWriter, MinimalServer
+
+
+class BrokenWriter(DummyWriter):
+    def write(self, data):
+        raise ConnectionResetError("gone")
+
+
+class TestSessionTable(unittest.TestCase):
+    def test_join_indexes_and_close_forgets_everything(self):
+        table = SessionTable()
+        w = DummyWriter()
+        table.connect(w).nonce = "n"
+        self.assertEqual(len(table), 0)
+        session = table.join(w, "p1", (1, 2, 3), 10.0, nickname="Bob")
+        self.assertIs(table.by_player("p1"), session)
+        self.assertIs(table.by_nickname("Bob"), session)
+        self.assertEqual(table.positions(), {"p1": (1, 2, 3)})
+
+        closed = table.close(w)
+        self.assertEqual(closed.player_id, "p1")
+        self.assertIsNone(table.get(w))
+        self.assertIsNone(table.by_player("p1"))
+        self.assertIsNone(table.by_nickname("Bob"))
+        self.assertEqual((len(table), table.connections()), (0, 0))
+        self.assertIsNone(table.close(w))
+
+    def test_entity_ids_are_wire_handles_and_reused(self):
+        table = SessionTable(wire.HandleTable(retain=0))
+        writers = [DummyWriter() for _ in range(3)]
+        ids = [table.join(w, f"p{i}", (0, 0, 0), 0).entity_id for i, w in enumerate(writers)]
+        self.assertEqual(ids, [1, 2, 3])
+        self.assertEqual(table.ids.name(2), "p1")
+        table.close(writers[1])
+        self.assertEqual(table.join(DummyWriter(), "p9", (0, 0, 0), 0).entity_id, 2)
+
+    def test_churn_keeps_table_bounded(self):
+        table = SessionTable()
+        resident = DummyWriter()
+        table.join(resident, "resident", (0, 0, 0), 0)
+        for i in range(10000):
+            w = DummyWriter()
+            table.connect(w).nonce = str(i)
+            table.join(w, f"guest-{i}", (0, 0, 0), 0, nickname=f"nick-{i}")
+            table.close(w)
+        self.assertEqual(table.connections(), 1)
+        self.assertEqual(len(table._by_nickname), 1)
+        self.assertLessEqual(len(table.ids), table.ids.retain + 1)
+        self.assertEqual(table.writers(), [resident])
+
+    def test_nickname_fallback_and_rename(self):
+        table = SessionTable()
+        a = table.join(DummyWriter(), "a", (0, 0, 0), 0, nickname="Sam")
+        b = table.join(DummyWriter(), "b", (0, 0, 0), 0, nickname="Sam")
+        self.assertEqual(b.nickname, "b")
+        self.assertFalse(table.rename(b, "Sam"))
+        self.assertTrue(table.rename(a, "Max"))
+        self.assertTrue(table.rename(b, "Sam"))
+        self.assertIs(table.by_nickname("Sam"), b)
+        # b took "c" with /nick before player "c" joined
+        table.rename(b, "c")
+        c = table.join(DummyWriter(), "c", (0, 0, 0), 0)
+        self.assertEqual(c.nickname, "c-2")
+        self.assertIs(table.by_nickname("c-2"), c)
+
+    def test_rejoining_player_id_moves_to_new_connection(self):
+        table = SessionTable()
+        old, new = DummyWriter(), DummyWriter()
+        table.join(old, "p1", (0, 0, 0), 0)
+        table.join(new, "p1", (5, 0, 5), 0)
+        self.assertIs(table.by_player("p1").writer, new)
+        self.assertIsNone(table.player_id(old))
+        self.assertEqual(table.writers(), [new])
+
+    def test_chat_channel_index_follows_membership(self):
+        table = SessionTable()
+        a, b = DummyWriter(), DummyWriter()
+        sa = table.join(a, "a", (0, 0, 0), 0, channels=("global", "trade"))
+        table.join(b, "b", (0, 0, 0), 0, channels=("global",))
+        self.assertEqual(table.channel_writers("global"), [a, b])
+        self.assertEqual(table.channel_writers("trade"), [a])
+        self.assertFalse(table.join_channel(sa, "trade"))
+        self.assertTrue(table.leave_channel(sa, "trade"))
+        self.assertFalse(table.leave_channel(sa, "trade"))
+        self.assertEqual(table.channel_sizes(), {"global": 2})
+        table.close(a)
+        table.close(b)
+        self.assertEqual(table.channel_sizes(), {})
+
+
+class TestSessionCleanup(unittest.TestCase):
+    def test_dead_client_is_fully_removed(self):
+        server = MinimalServer()
+        dead, alive = BrokenWriter(), DummyWriter()
+
+        async def run():
+            await handle_player_join(server, alive, {"data": {"preferredId": "alive"}})
+            server.sessions.join(dead, "dead", (0, 0, 0), 0, nickname="Ghost")
+            server.move_batching = True
+            await handle_player_move(server, dead, {"data": {"x": 1, "y": 0, "z": 0}})
+            await broadcast_packet(server, PacketType.PING, {})
+            await handle_chat(server, alive, {"data": {"text": "/whisper Ghost boo"}})
+
+        asyncio.run(run())
+        self.assertIsNone(server.sessions.get(dead))
+        self.assertIsNone(server.sessions.by_nickname("Ghost"))
+        self.assertEqual(server.pending_moves, {})
+        self.assertIn("dead", server.dirty_players)
+        self.assertIn(b"Player Ghost not found.", alive.buf)
+
+
+    def test_rejoin_closes_previous_connection(self):
+        server = MinimalServer()
+        old, new = DummyWriter(), DummyWriter()
+
+        async def run():
+            await handle_player_join(server, old, {"data": {"preferredId": "p1"}})
+            await handle_player_join(server, new, {"data": {"preferredId": "p1"}})
+
+        asyncio.run(run())
+        self.assertTrue(old.closed)
+        self.assertFalse(new.closed)
+        self.assertIsNone(server.sessions.get(old))
+        self.assertIs(server.sessions.by_player("p1").writer, new)
+
+
+    def test_preferred_id_of_live_npc_is_not_taken(self):
+        server = MinimalServer()
+        npc_handle = server.sessions.ids.claim("guard_01")  # as broadcast_npc_spawn does
+        w = DummyWriter()
+        asyncio.run(handle_player_join(server, w, {"data": {"preferredId": "guard_01"}}))
+        session = server.sessions.get(w)
+        self.assertNotEqual(session.player_id, "guard_01")
+        self.assertNotEqual(session.entity_id, npc_handle)
+        server.sessions.close(w)
+        self.assertTrue(server.sessions.ids.live("guard_01"))
+
+
+class TestChatChannels(unittest.TestCase):
+    def test_chat_reaches_channel_members_only(self):
+        server = MinimalServer()
+        reader, trader = DummyWriter(), DummyWriter()
+
+        async def run():
+            await handle_player_join(server, reader, {"data": {"preferredId": "reader"}})
+            await handle_player_join(server, trader, {"data": {"preferredId": "trader"}})
+            await handle_chat(server, trader, {"data": {"text": "/join trade"}})
+            await handle_chat(server, trader, {"data": {"text": "/join bazaar"}})
+            self.assertIn(b"Unknown channel bazaar.", trader.buf)
+            reader.buf = trader.buf = b""
+            await broadcast_chat(server, SimpleNamespace(channel="trade", playerId="x", text="wts", timestamp=0))
+            await broadcast_chat(server, SimpleNamespace(channel="global", playerId="x", text="hi", timestamp=0))
+            await handle_chat(server, reader, {"data": {"text": "/leave global"}})
+            await broadcast_chat(server, SimpleNamespace(channel="global", playerId="x", text="again", timestamp=0))
+
+        asyncio.run(run())
+        self.assertNotIn(b"wts", reader.buf)
+        self.assertIn(b"wts", trader.buf)
+        self.assertIn(b"hi", reader.buf)
+        self.assertIn(b"Left global.", reader.buf)
+        self.assertNotIn(b"again", reader.buf)
+        self.assertIn(b"again", trader.buf)
+        self.assertEqual(server.sessions.channel_sizes(), {"global": 1, "trade": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
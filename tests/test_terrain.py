@@ -0,0 +1,118 @@
+import unittest
+import json
+import os
+import struct
+import tempfile
+
+import terrain
+
+# 3x3 samples over a 10x10 map at origin (100, 200):
+# row 0 (z=200): 0 10 20 / row 1 (z=205): 30 40 50 / row 2 (z=210): 60 70 80
+SAMPLES = [0, 10, 20, 30, 40, 50, 60, 70, 80]
+
+
+def write_raw(path, samples, code, order="<"):
+    with open(path, "wb") as f:
+        f.write(struct.pack(f"{order}{len(samples)}{code}", *samples))
+
+
+class TerrainTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.maps = []
+
+    def tearDown(self):
+        for hm in self.maps:
+            hm.close()
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def heightmap(self, samples=SAMPLES, code="H", order="<", **kwargs):
+        path = self.path("terrain.raw")
+        write_raw(path, samples, code, order)
+        kwargs.setdefault("fmt", terrain.FORMAT_UINT16 if code == "H" else terrain.FORMAT_FLOAT32)
+        hm = terrain.Heightmap(path, (3, 3), (10, 10), origin=(100, 200), **kwargs)
+        self.maps.append(hm)
+        return hm
+
+
+class TestHeightmap(TerrainTestCase):
+    def test_samples_and_bilinear(self):
+        hm = self.heightmap()
+        self.assertEqual(hm.height_at(100, 200), 0)
+        self.assertEqual(hm.height_at(110, 210), 80)
+        self.assertEqual(hm.height_at(105, 205), 40)
+        self.assertAlmostEqual(hm.height_at(102.5, 200), 5)
+        self.assertAlmostEqual(hm.height_at(107.5, 207.5), 60)
+
+    def test_clamps_outside_map(self):
+        hm = self.heightmap()
+        self.assertEqual(hm.height_at(50, 100), 0)
+        self.assertEqual(hm.height_at(500, 500), 80)
+        self.assertAlmostEqual(hm.height_at(105, 1000), 70)
+
+    def test_uint16_scale_offset_and_flip(self):
+        hm = self.heightmap(height_scale=0.5, height_offset=1.0, flip_z=True)
+        self.assertEqual(hm.height_at(100, 200), 31)
+        self.assertEqual(hm.height_at(100, 210), 1)
+
+    def test_float32_big_endian(self):
+        hm = self.heightmap([s + 0.25 for s in SAMPLES], code="f", order=">", byte_order="big")
+        self.assertAlmostEqual(hm.height_at(105, 205), 40.25)
+
+    def test_size_mismatch(self):
+        with self.assertRaises(ValueError):
+            self.heightmap(SAMPLES[:-1])
+
+    @unittest.skipIf(terrain.np is None, "numpy not installed")
+    def test_batched_matches_scalar(self):
+        hm = self.heightmap(flip_z=True, height_scale=0.1)
+        xs = [90, 100, 101.3, 104.9, 107.5, 110, 130]
+        zs = [200, 203.7, 209.9, 205, 207.5, 212, 190]
+        batched = hm.heights_at(xs, zs)
+        for x, z, h in zip(xs, zs, batched):
+            self.assertAlmostEqual(h, hm.height_at(x, z))
+
+
+class TestTiledHeightmap(TerrainTestCase):
+    def write_tiles(self):
+        # 2x2 tiles of 2x2 samples, each 10 units; tile (col, row) is flat at 10*col + 100*row
+        for col in range(2):
+            for row in range(2):
+                write_raw(self.path(f"{col}_{row}.raw"), [10 * col + 100 * row] * 4, "H")
+
+    def test_lazy_tiles_with_eviction(self):
+        self.write_tiles()
+        tiles = terrain.TiledHeightmap(self.path("{col}_{row}.raw"), (2, 2), (2, 2), (10, 10),
+                                       origin=(0, 0), max_open=2)
+        self.maps.append(tiles)
+        self.assertEqual(len(tiles), 0)
+        self.assertEqual(tiles.height_at(5, 5), 0)
+        self.assertEqual(tiles.height_at(15, 5), 10)
+        self.assertEqual(tiles.height_at(15, 15), 110)
+        self.assertEqual(len(tiles), 2)
+        self.assertEqual(tiles.height_at(-5, 50), 100)
+
+    @unittest.skipIf(terrain.np is None, "numpy not installed")
+    def test_batched_groups_by_tile(self):
+        self.write_tiles()
+        tiles = terrain.TiledHeightmap(self.path("{col}_{row}.raw"), (2, 2), (2, 2), (10, 10))
+        self.maps.append(tiles)
+        heights = tiles.heights_at([1, 11, 2, 19, 3], [1, 1, 12, 19, 2])
+        self.assertEqual(list(heights), [0, 10, 100, 110, 0])
+
+    def test_load_descriptor(self):
+        self.write_tiles()
+        descriptor = self.path("terrain.json")
+        with open(descriptor, "w") as f:
+            json.dump({"tiles": "{col}_{row}.raw", "tile_count": [2, 2], "resolution": [2, 2],
+                       "size": [10, 10], "origin": [100, 200], "height_scale": 0.5}, f)
+        tiles = terrain.load_heightmap(descriptor)
+        self.maps.append(tiles)
+        self.assertEqual(tiles.height_at(115, 215), 55)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,299 @@
+import unittest
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import time
+
+import wire
+from handlers.broadcast import broadcast_encoded, broadcast_packet
+from handlers.player import handle_player_join
+from master_server import MasterServer
+from protocol import PacketType
+from test_handlers import DummyWriter, MinimalServer
+
+
+class TestVarint(unittest.TestCase):
+    def test_roundtrip(self):
+        for n in (0, 1, 127, 128, 300, 2 ** 21, 2 ** 35):
+            self.assertEqual(wire.decode_varint(wire.encode_varint(n)), (n, len(wire.encode_varint(n))))
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            wire.decode_varint(b"\x80")
+
+
+class TestHandleTable(unittest.TestCase):
+    def test_released_handle_is_reused_after_retention(self):
+        handles = wire.HandleTable(retain=2)
+        a, b = handles.claim("a"), handles.claim("b")
+        handles.release("a")
+        handles.release("b")
+        # still resolvable while retained
+        self.assertEqual((handles.name(a), handles.handle("a")), ("a", a))
+        handles.claim("c")
+        handles.release("c")
+        self.assertIsNone(handles.name(a))
+        self.assertEqual(handles.claim("d"), a)
+        self.assertEqual(handles.name(b), "b")
+
+    def test_reclaim_cancels_release(self):
+        handles = wire.HandleTable(retain=1)
+        h = handles.claim("a")
+        handles.release("a")
+        self.assertEqual(handles.claim("a"), h)
+        b = handles.claim("b")
+        for name in ("b", "c"):
+            handles.claim(name)
+            handles.release(name)
+        self.assertEqual(handles.name(h), "a")
+        self.assertIsNone(handles.name(b))
+
+    def test_late_reference_is_released_again(self):
+        handles = wire.HandleTable(retain=2)
+        live = handles.claim("live")
+        for i in range(100):
+            handles.claim(f"npc-{i}")
+            handles.release(f"npc-{i}")
+            # a delta still naming an entity retired a while ago
+            handles.handle(f"npc-{i // 2}")
+        self.assertLessEqual(len(handles), 1 + handles.retain + 1)
+        self.assertEqual(handles.name(live), "live")
+        # claiming a late-referenced name makes it live again
+        late = handles.handle("gone")
+        self.assertEqual(handles.claim("gone"), late)
+        for name in ("x", "y", "z"):
+            handles.claim(name)
+            handles.release(name)
+        self.assertEqual(handles.name(late), "gone")
+
+    def test_reused_handle_is_interned_again(self):
+        handles = wire.HandleTable(retain=0)
+        codec = wire.BinaryCodec(handles)
+        decoder = wire.BinaryDecoder()
+        spawn = {"npcId": "wolf", "x": 1.0, "y": 2.0, "z": 3.0}
+        decoder.feed(codec.encode(PacketType.NPC_SPAWN, spawn))
+        handles.release("wolf")
+        spawn["npcId"] = "bear"
+        packets = decoder.feed(codec.encode(PacketType.NPC_SPAWN, spawn))
+        self.assertEqual(packets[-1]["data"]["npcId"], "bear")
+
+
+class TestBinaryCodec(unittest.TestCase):
+    def test_world_update_roundtrip_interns_ids_once(self):
+        codec = wire.BinaryCodec(wire.HandleTable())
+        decoder = wire.BinaryDecoder()
+        data = {"seq": 3, "players": [{"id": "alice", "x": 1.5, "y": 2.0, "z": -3.25},
+                                      {"id": "bob", "x": 0.0, "y": 0.0, "z": 0.0}]}
+        first = codec.encode(PacketType.WORLD_UPDATE, data)
+        second = codec.encode(PacketType.WORLD_UPDATE, data)
+        # the second frame no longer carries INTERN frames
+        self.assertLess(len(second), len(first))
+        self.assertLess(len(second), len(json.dumps(data)) / 3)
+
+        packets = decoder.feed(first + second)
+        self.assertEqual([p["id"] for p in packets], [PacketType.WORLD_UPDATE] * 2)
+        self.assertEqual(packets[1]["data"], data)
+
+    def test_partial_frames_are_buffered(self):
+        codec = wire.BinaryCodec(wire.HandleTable())
+        decoder = wire.BinaryDecoder()
+        blob = codec.encode(PacketType.NPC_UPDATE, {"npcId": "wolf_01", "x": 1.0, "y": 2.0, "z": 3.0})
+        self.assertEqual(decoder.feed(blob[:5]), [])
+        packets = decoder.feed(blob[5:])
+        self.assertEqual(packets, [{"id": PacketType.NPC_UPDATE, "data": {"npcId": "wolf_01", "x": 1.0, "y": 2.0, "z": 3.0}}])
+
+    def test_unknown_layout_falls_back_to_json_payload(self):
+        codec = wire.BinaryCodec(wire.HandleTable())
+        data = {"text": "hello", "channel": "global"}
+        packets = wire.BinaryDecoder().feed(codec.encode(PacketType.CHAT, data))
+        self.assertEqual(packets, [{"id": PacketType.CHAT, "data": data}])
+
+    def test_read_frame(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(wire.frame(PacketType.PLAYER_MOVE, wire.encode_payload(PacketType.PLAYER_MOVE, {"x": 1, "y": 2, "z": 3}, None)[0]))
+            reader.feed_eof()
+            packet_id, payload = await wire.read_frame(reader)
+            self.assertEqual(packet_id, PacketType.PLAYER_MOVE)
+            self.assertEqual(wire.decode_payload(packet_id, payload), {"x": 1.0, "y": 2.0, "z": 3.0})
+            self.assertIsNone(await wire.read_frame(reader))
+
+        asyncio.run(run())
+
+    def test_read_frame_rejects_oversized_lengths(self):
+        async def run():
+            for prefix in (wire.encode_varint(wire.MAX_FRAME_SIZE + 1), b"\xff\xff\xff\x7f"):
+                reader = asyncio.StreamReader()
+                reader.feed_data(prefix)
+                with self.assertRaises(ValueError):
+                    await wire.read_frame(reader)
+
+        asyncio.run(run())
+
+    def test_oversized_frame_closes_the_connection(self):
+        async def run():
+            server = MasterServer()
+            reader, writer = asyncio.StreamReader(), DummyWriter()
+            server.sessions.connect(writer).inbound_encoding = wire.ENCODING_BINARY
+            client = asyncio.ensure_future(server.handle_client(reader, writer))
+            reader.feed_data(wire.encode_varint(1 << 20))  # no EOF: only the limit ends it
+            await asyncio.wait_for(client, 1)
+            self.assertTrue(writer.closed)
+            self.assertEqual(server.sessions.connections(), 0)
+
+        asyncio.run(run())
+
+
+class TestPositionQuantizer(unittest.TestCase):
+    BOUNDS = {"min_x": 150, "max_x": 250, "min_y": 0, "max_y": 50, "min_z": 500, "max_z": 600}
+
+    def test_pack_entries_matches_pack(self):
+        quant = wire.PositionQuantizer.for_bounds(self.BOUNDS, 1)
+        rng = random.Random(3)
+        # includes positions outside the bounds, which clamp
+        entries = [{"x": rng.uniform(100, 300), "y": rng.uniform(-5, 60), "z": rng.uniform(450, 700)}
+                   for _ in range(300)]
+        for n in (0, 3, 300):
+            self.assertEqual(quant.pack_entries(entries[:n]), [quant.pack(e["x"], e["y"], e["z"]) for e in entries[:n]])
+
+    def test_roundtrip_within_half_a_step(self):
+        quant = wire.PositionQuantizer.for_bounds(self.BOUNDS, 1)
+        x, y, z = quant.decode(*quant.encode(208.6597, 6.989525, 545.12))
+        self.assertAlmostEqual(x, 208.6597, delta=0.005)
+        self.assertAlmostEqual(y, 6.989525, delta=0.005)
+        self.assertAlmostEqual(z, 545.12, delta=0.005)
+        # outside the bounds clamps to the edge
+        self.assertEqual(quant.encode(100, -5, 1e6), (0, 0, wire.QUANT_MAX))
+
+    def test_precision_must_cover_the_world(self):
+        with self.assertRaises(ValueError):
+            wire.PositionQuantizer.for_bounds(self.BOUNDS, 0.1)
+
+    def test_quantized_snapshot_is_smaller_and_decodes(self):
+        quant = wire.PositionQuantizer.for_bounds(self.BOUNDS, 1)
+        data = {"seq": 1, "players": [{"id": f"p{i}", "x": 150 + i * 0.37, "y": 6.989525, "z": 599.5 - i}
+                                      for i in range(50)]}
+        handles = wire.HandleTable()
+        plain = wire.encode_payload(PacketType.WORLD_UPDATE, data, handles)[0]
+        packed = wire.encode_payload(PacketType.WORLD_UPDATE, data, handles, quant)[0]
+        self.assertLessEqual(len(packed), len(plain) - 50 * 6)
+
+        codec = wire.BinaryCodec(handles, quant)
+        (packet,) = wire.BinaryDecoder(quant).feed(codec.encode(PacketType.WORLD_UPDATE, data))
+        for got, sent in zip(packet["data"]["players"], data["players"]):
+            self.assertEqual(got["id"], sent["id"])
+            for axis in "xyz":
+                self.assertAlmostEqual(got[axis], sent[axis], delta=0.005)
+
+    def test_moves_keep_full_precision(self):
+        quant = wire.PositionQuantizer.for_bounds(self.BOUNDS, 1)
+        move = {"x": 208.5, "y": 6.75, "z": 545.25}
+        payload = wire.encode_payload(PacketType.PLAYER_MOVE, move, None, quant)[0]
+        self.assertEqual(wire.decode_payload(PacketType.PLAYER_MOVE, payload), move)
+
+
+class RecordingWriter(DummyWriter):
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        super().write(data)
+
+
+class TestEncodeOnce(unittest.TestCase):
+    def make_server(self, n_json, n_binary):
+        server = MinimalServer()
+        handles = wire.HandleTable()
+        for i in range(n_json + n_binary):
+            w = RecordingWriter()
+            server.sessions.join(w, f"p{i}", (0, 0, 0), 0)
+            if i >= n_json:
+                server.codecs[w] = wire.BinaryCodec(handles)
+        return server
+
+    def test_fan_out_shares_one_buffer_per_encoding(self):
+        server = self.make_server(3, 3)
+        data = {"npcId": "wolf_01", "x": 1.0, "y": 2.0, "z": 3.0}
+        asyncio.run(broadcast_packet(server, PacketType.NPC_UPDATE, data))
+
+        json_chunks = [w.chunks[-1] for w in server.sessions.writers() if w not in server.codecs]
+        binary_frames = [w.chunks[-1] for w in server.sessions.writers() if w in server.codecs]
+        self.assertTrue(all(c is json_chunks[0] for c in json_chunks))
+        self.assertTrue(all(c is binary_frames[0] for c in binary_frames))
+        # each binary client was told about the handle exactly once
+        for w in server.codecs:
+            self.assertEqual(len(w.chunks), 2)
+            self.assertEqual(wire.BinaryDecoder().feed(b"".join(w.chunks)), [{"id": PacketType.NPC_UPDATE, "data": data}])
+
+    def test_pre_encoded_bytes_are_written_as_is(self):
+        server = self.make_server(2, 0)
+        blob = memoryview(wire.JSON_CODEC.encode(PacketType.PING, {}))
+        asyncio.run(broadcast_encoded(server, blob))
+        for w in server.sessions.writers():
+            self.assertIs(w.chunks[-1], blob)
+
+
+class TestNegotiation(unittest.TestCase):
+    def test_join_switches_to_binary_after_id_assigned(self):
+        server = MinimalServer()
+        server.encodings = list(wire.ENCODINGS)
+        server.handles = wire.HandleTable()
+        writer = DummyWriter()
+        asyncio.run(handle_player_join(server, writer, {"data": {"encoding": "binary"}}))
+        self.assertIn("'encoding': 'binary'", writer.buf.decode())
+        self.assertEqual(wire.codec_for(server, writer).name, wire.ENCODING_BINARY)
+
+    def test_binary_join_announces_quantization(self):
+        server = MinimalServer()
+        server.encodings = list(wire.ENCODINGS)
+        server.handles = wire.HandleTable()
+        server.quantizer = wire.PositionQuantizer((150, 0, 500), 0.01)
+        writer = DummyWriter()
+        asyncio.run(handle_player_join(server, writer, {"data": {"encoding": "binary"}}))
+        self.assertIn("'quantization': {'origin': [150.0, 0.0, 500.0], 'step': 0.01}", writer.buf.decode())
+        self.assertIs(wire.codec_for(server, writer).quantizer, server.quantizer)
+
+    def test_client_switches_inbound_encoding_explicitly(self):
+        async def run():
+            server = MasterServer()
+            reader, writer = asyncio.StreamReader(), DummyWriter()
+            client = asyncio.ensure_future(server.handle_client(reader, writer))
+            while b"\n" not in writer.buf:
+                await asyncio.sleep(0)
+            nonce = json.loads(writer.buf.split(b"\n")[0])["data"]["nonce"]
+            ts = int(time.time())
+            proof = hmac.new(server.server_secret.encode(), f"{nonce}p1{ts}".encode(), hashlib.sha256).hexdigest()
+
+            def line(packet_id, data):
+                return json.dumps({"id": packet_id, "data": data}).encode() + b"\n"
+
+            # sent before the client has seen PLAYER_ID_ASSIGNED: still JSON
+            reader.feed_data(line(PacketType.PLAYER_JOIN, {"preferredId": "p1", "ts": ts, "hmac": proof,
+                                                           "encoding": "binary"})
+                             + line(PacketType.PLAYER_MOVE, {"x": 208.0, "y": 6.9, "z": 545.0})
+                             + line(PacketType.PING, {"msg": "ping"}))
+            await asyncio.sleep(0.01)
+            self.assertIn("p1", server.pending_moves)
+            self.assertEqual(server.packet_metrics()["PING"]["count"], 1)
+
+            reader.feed_data(line(PacketType.ENCODING_SWITCH, {"encoding": "binary"})
+                             + wire.frame(PacketType.PING, wire.encode_payload(PacketType.PING, {"msg": "ping"}, None)[0]))
+            reader.feed_eof()
+            await client
+            self.assertEqual(server.packet_metrics()["PING"]["count"], 2)
+
+        asyncio.run(run())
+
+    def test_unsupported_encoding_falls_back_to_json(self):
+        server = MinimalServer()
+        writer = DummyWriter()
+        asyncio.run(handle_player_join(server, writer, {"data": {"encoding": "binary"}}))
+        self.assertIs(wire.codec_for(server, writer), wire.JSON_CODEC)
+
+
+if __name__ == "__main__":
+    unittest.main()
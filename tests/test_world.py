@@ -0,0 +1,130 @@
+import unittest
+import asyncio
+import json
+from types import SimpleNamespace
+
+from handlers import world
+from protocol import PacketType
+from sessions import SessionTable
+from snapshots import SnapshotHistory
+
+
+class CountingWriter:
+    def __init__(self):
+        self.packets = []
+
+    def write(self, data: bytes):
+        self.packets.extend(json.loads(line) for line in data.decode().splitlines())
+
+    async def drain(self):
+        return
+
+
+def make_server(mode, delta=False):
+    server = SimpleNamespace(
+        sessions=SessionTable(),
+        dirty_players=set(),
+        broadcast_mode=mode,
+        tick_rate=20,
+        delta_compression=delta,
+        keyframe_interval=100,
+        world_history=SnapshotHistory(),
+        world_acks={},
+        world_sent={},
+        world_keyframes={},
+        view_radius=None,
+        player_grid=None,
+        npc_grid=None,
+        world_visible={},
+        visible_npcs={},
+        npc_watchers={},
+        npc_batching=True,
+        npc_quantum=None,
+        npc_sent={},
+        pending_moves={},
+        codecs={},
+        outboxes={},
+    )
+    for i in range(3):
+        w = CountingWriter()
+        server.sessions.join(w, f"p{i}", (i, 0, i), 0)
+    return server
+
+
+class TestWorldTick(unittest.TestCase):
+    def test_tick_mode_coalesces_moves(self):
+        server = make_server(world.BROADCAST_TICK)
+
+        async def run():
+            for i in range(10):
+                server.sessions.by_player("p0").position = (i, 0, 0)
+                await world.world_changed(server, "p0")
+            # nothing is sent until the tick runs
+            self.assertTrue(all(not w.packets for w in server.sessions.writers()))
+            await world.world_tick(server)
+            # an idle tick sends nothing
+            await world.world_tick(server)
+
+        asyncio.run(run())
+        for w in server.sessions.writers():
+            self.assertEqual(len(w.packets), 1)
+            self.assertEqual(w.packets[0]["id"], PacketType.WORLD_UPDATE)
+            self.assertEqual(len(w.packets[0]["data"]["players"]), 3)
+        self.assertEqual(server.dirty_players, set())
+
+    def test_per_move_mode_broadcasts_immediately(self):
+        server = make_server(world.BROADCAST_PER_MOVE)
+
+        async def run():
+            for _ in range(4):
+                await world.world_changed(server, "p0")
+
+        asyncio.run(run())
+        for w in server.sessions.writers():
+            self.assertEqual(len(w.packets), 4)
+
+
+class TestWorldDelta(unittest.TestCase):
+    def test_delta_against_acked_baseline(self):
+        server = make_server(world.BROADCAST_TICK, delta=True)
+        writers = server.sessions.writers()
+
+        async def run():
+            await world.world_changed(server, "p0")
+            await world.world_tick(server)
+            # first snapshot is always a keyframe
+            for w in writers:
+                self.assertEqual(w.packets[-1]["id"], PacketType.WORLD_UPDATE)
+                self.assertEqual(w.packets[-1]["data"]["seq"], 1)
+            # only the first client acknowledges it
+            await world.handle_world_ack(server, writers[0], {"data": {"seq": 1}})
+
+            server.sessions.by_player("p1").position = (5, 0, 5)
+            server.sessions.close(writers[2])
+            await world.world_changed(server, "p1")
+            await world.world_changed(server, "p2")
+            await world.world_tick(server)
+            # nothing new: no resend
+            await world.world_tick(server)
+
+        asyncio.run(run())
+        delta = writers[0].packets[-1]
+        self.assertEqual(len(writers[0].packets), 2)
+        self.assertEqual(delta["id"], PacketType.WORLD_DELTA)
+        self.assertEqual(delta["data"]["baseline"], 1)
+        self.assertEqual(delta["data"]["seq"], 2)
+        self.assertEqual([p["id"] for p in delta["data"]["players"]], ["p1"])
+        self.assertEqual(delta["data"]["removed"], ["p2"])
+        # client without an ack falls back to a full keyframe
+        self.assertEqual(writers[1].packets[-1]["id"], PacketType.WORLD_UPDATE)
+        self.assertEqual(len(writers[1].packets[-1]["data"]["players"]), 2)
+
+    def test_ack_for_unsent_snapshot_is_ignored(self):
+        server = make_server(world.BROADCAST_TICK, delta=True)
+        w = server.sessions.writers()[0]
+        asyncio.run(world.handle_world_ack(server, w, {"data": {"seq": 7}}))
+        self.assertNotIn(w, server.world_acks)
+
+
+if __name__ == "__main__":
+    unittest.main()
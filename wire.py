@@ -0,0 +1,585 @@
+# wire.py
+"""Wire encodings for the TCP protocol.
+
+Two encodings are supported per connection:
+
+json   - the original newline-delimited `{"id": ..., "data": {...}}` text.
+binary - length-prefixed frames: varint(len) | varint(packet id) | payload.
+         Position-heavy packets use struct-packed float32 coordinates and
+         varint entity handles; any other packet carries its data as UTF-8
+         JSON inside the frame so every packet type still works.
+
+Entity ids (player UUIDs, NPC ids) are interned into small integer handles
+in a server-wide HandleTable. Before a binary frame references a handle the
+peer has not been told about, an INTERN frame (handle -> name) is sent on
+that connection, so each name crosses the wire once and every later
+position entry is a varint. Handles live as long as their entity: players
+claim one at join (it is also their session entity_id) and NPCs at spawn,
+and both release it when they leave, so handles stay small under churn.
+
+The encoding is negotiated during the handshake: HANDSHAKE_CHALLENGE lists
+the encodings the server accepts, PLAYER_JOIN carries the client's choice in
+"encoding", and PLAYER_ID_ASSIGNED echoes the selected one. The server
+sends in the new encoding from PLAYER_ID_ASSIGNED on. The client keeps
+sending JSON until it sends an ENCODING_SWITCH packet, still as JSON, and
+the server reads that connection in the new encoding from then on.
+
+A server started with a position precision also quantizes positions in
+binary snapshots (WORLD_UPDATE, WORLD_DELTA, NPC_UPDATE and unquantized
+NPC_BATCH_UPDATE entries): each axis is sent as a 16-bit count of
+precision-sized steps from the world_bounds minimum corner instead of a
+float32, 6 bytes per position instead of 12. PLAYER_ID_ASSIGNED then
+carries the PositionQuantizer spec ({"origin": [x, y, z], "step": s}) the
+client needs to turn the counts back into world coordinates. JSON
+connections keep plain floats.
+"""
+import json
+import operator
+import struct
+from collections import deque
+from protocol import PacketType
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+ENCODINGS = [ENCODING_JSON, ENCODING_BINARY]
+
+_VEC3 = struct.Struct("<3f")
+_QVEC3 = struct.Struct("<3H")
+QUANT_MAX = 0xFFFF
+# Quantize snapshot positions as one array op from this many entries up
+VECTORIZE_MIN = 16
+_XYZ = operator.itemgetter("x", "y", "z")
+
+# Largest inbound frame body, like the 64 KiB stream limit on JSON lines;
+# its length prefix fits in MAX_LENGTH_BYTES varint bytes
+MAX_FRAME_SIZE = 64 * 1024
+MAX_LENGTH_BYTES = 3
+
+# Released handles keep their name for this many further releases before
+# the handle is reused, so removals and packets encoded just before the
+# release still resolve to the right entity.
+RETAIN_RELEASED = 256
+
+
+def encode_varint(n):
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def zigzag(n):
+    """Map a signed int to an unsigned one so small magnitudes stay short as varints."""
+    return (n << 1) ^ (n >> 63)
+
+
+def unzigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+def decode_varint(buf, pos=0):
+    """Return (value, new_pos). Raises ValueError on truncated input."""
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ValueError("truncated varint")
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+class HandleTable:
+    """Server-wide string id <-> small integer handle mapping."""
+
+    def __init__(self, retain=RETAIN_RELEASED):
+        self.retain = retain
+        self._handles = {}  # name -> handle
+        self._names = {}  # handle -> name
+        self._released = {}  # names released but still mapped, oldest first
+        self._free = deque()  # handles ready for reuse
+        self._next = 1
+
+    def __len__(self):
+        return len(self._handles)
+
+    def handle(self, name):
+        """Handle for name; a name nobody claimed is interned as already released.
+
+        That covers late references to an entity whose handle was retired
+        (e.g. its id in a WORLD_DELTA "removed" list): the new handle is
+        retired again after `retain` more releases instead of living on.
+        """
+        h = self._handles.get(name)
+        if h is None:
+            h = self._intern(name)
+            self._released[name] = None
+        return h
+
+    def _intern(self, name):
+        h = self._free.popleft() if self._free else self._take()
+        self._handles[name] = h
+        self._names[h] = name
+        return h
+
+    def _take(self):
+        h = self._next
+        self._next += 1
+        return h
+
+    def claim(self, name):
+        """Handle for a live entity; cancels a pending release of the same name."""
+        self._released.pop(name, None)
+        h = self._handles.get(name)
+        return h if h is not None else self._intern(name)
+
+    def live(self, name):
+        """True if name is claimed by an entity that has not been released."""
+        return name in self._handles and name not in self._released
+
+    def release(self, name):
+        """The entity is gone; its handle is reused after `retain` more releases."""
+        if name in self._handles:
+            self._released.setdefault(name, None)
+        while len(self._released) > self.retain:
+            oldest = next(iter(self._released))
+            del self._released[oldest]
+            h = self._handles.pop(oldest)
+            del self._names[h]
+            self._free.append(h)
+
+    def name(self, handle):
+        return self._names.get(handle)
+
+
+class PositionQuantizer:
+    """16-bit fixed-point positions: whole `step`s from `origin` per axis."""
+
+    def __init__(self, origin, step):
+        self.origin = tuple(float(v) for v in origin)
+        self.step = float(step)
+        self._inv = 1.0 / self.step
+
+    @classmethod
+    def for_bounds(cls, world_bounds, precision_cm):
+        """Quantizer over world_bounds with steps of precision_cm centimetres."""
+        wb = world_bounds
+        step = precision_cm / 100
+        extent = max(wb["max_x"] - wb["min_x"], wb["max_y"] - wb["min_y"], wb["max_z"] - wb["min_z"])
+        if step <= 0 or extent / step > QUANT_MAX:
+            raise ValueError(f"{precision_cm} cm steps cannot cover {extent} world units in 16 bits")
+        return cls((wb["min_x"], wb["min_y"], wb["min_z"]), step)
+
+    def spec(self):
+        return {"origin": list(self.origin), "step": self.step}
+
+    def encode(self, x, y, z):
+        """Step counts for a position, clamped to the quantized range."""
+        ox, oy, oz = self.origin
+        inv = self._inv
+        cx = int((x - ox) * inv + 0.5)
+        cy = int((y - oy) * inv + 0.5)
+        cz = int((z - oz) * inv + 0.5)
+        return (0 if cx < 0 else min(cx, QUANT_MAX),
+                0 if cy < 0 else min(cy, QUANT_MAX),
+                0 if cz < 0 else min(cz, QUANT_MAX))
+
+    def decode(self, cx, cy, cz):
+        ox, oy, oz = self.origin
+        s = self.step
+        return ox + cx * s, oy + cy * s, oz + cz * s
+
+    def pack(self, x, y, z):
+        return _QVEC3.pack(*self.encode(x, y, z))
+
+    def pack_entries(self, entries):
+        """pack() of every {"x", "y", "z"} entry, as a list of 6-byte strings.
+
+        Snapshots quantize all their positions in one numpy pass; per
+        position, the scalar path costs several times a float32 pack.
+        """
+        if np is None or len(entries) < VECTORIZE_MIN:
+            return [self.pack(*_XYZ(e)) for e in entries]
+        counts = np.array(list(map(_XYZ, entries)), dtype=np.float64)
+        counts -= self.origin
+        counts *= self._inv
+        counts += 0.5
+        np.clip(counts, 0, QUANT_MAX, out=counts)
+        packed = counts.astype("<u2").tobytes()
+        size = _QVEC3.size
+        return [packed[i:i + size] for i in range(0, len(packed), size)]
+
+    def unpack_from(self, payload, pos):
+        return self.decode(*_QVEC3.unpack_from(payload, pos))
+
+
+# --- Binary payload layouts -------------------------------------------------
+# Encoders take (data, handles, refs, quant) and return payload bytes; every
+# handle they emit is recorded in refs (handle -> name) so the codec can
+# intern it. quant is the connection's PositionQuantizer or None.
+
+def _ref(name, handles, refs):
+    h = handles.handle(name)
+    refs[h] = name
+    return encode_varint(h)
+
+
+def _pack_position(x, y, z, quant):
+    if quant is None:
+        return _VEC3.pack(x, y, z)
+    return quant.pack(x, y, z)
+
+
+def _unpack_position(payload, pos, quant):
+    """Return (x, y, z, new_pos)."""
+    if quant is None:
+        return _VEC3.unpack_from(payload, pos) + (pos + _VEC3.size,)
+    return quant.unpack_from(payload, pos) + (pos + _QVEC3.size,)
+
+
+def _enc_vec3(data, handles, refs, quant):
+    # Client moves and corrections stay full precision
+    return _VEC3.pack(data.get("x", 0), data.get("y", 0), data.get("z", 0))
+
+
+def _enc_ack(data, handles, refs, quant):
+    return encode_varint(int(data.get("seq", 0)))
+
+
+def _enc_players(players, handles, refs, quant, out):
+    out += encode_varint(len(players))
+    if quant is None:
+        pack = _VEC3.pack
+        for p in players:
+            out += _ref(p["id"], handles, refs)
+            out += pack(p["x"], p["y"], p["z"])
+        return
+    for p, position in zip(players, quant.pack_entries(players)):
+        out += _ref(p["id"], handles, refs)
+        out += position
+
+
+def _enc_world_update(data, handles, refs, quant):
+    out = bytearray(encode_varint(data.get("seq", 0)))
+    _enc_players(data.get("players", []), handles, refs, quant, out)
+    return bytes(out)
+
+
+def _enc_world_delta(data, handles, refs, quant):
+    out = bytearray(encode_varint(data["seq"]))
+    out += encode_varint(data["baseline"])
+    _enc_players(data.get("players", []), handles, refs, quant, out)
+    removed = data.get("removed", [])
+    out += encode_varint(len(removed))
+    for eid in removed:
+        out += _ref(eid, handles, refs)
+    return bytes(out)
+
+
+def _enc_npc_update(data, handles, refs, quant):
+    return _ref(data["npcId"], handles, refs) + _pack_position(data["x"], data["y"], data["z"], quant)
+
+
+def _enc_npc_batch(data, handles, refs, quant):
+    # varint(quantum in micrometres, 0 = positions) | varint(count) |
+    # count * (handle | x y z), coordinates as zigzag varints of multiples of
+    # the quantum, else as positions (float32 or quantized)
+    q = data.get("q")
+    npcs = data["npcs"]
+    out = bytearray(encode_varint(round(q * 1e6) if q else 0))
+    out += encode_varint(len(npcs))
+    positions = quant.pack_entries(npcs) if quant is not None and not q else None
+    for i, npc in enumerate(npcs):
+        out += _ref(npc["npcId"], handles, refs)
+        if q:
+            out += encode_varint(zigzag(npc["x"]))
+            out += encode_varint(zigzag(npc["y"]))
+            out += encode_varint(zigzag(npc["z"]))
+        elif positions is not None:
+            out += positions[i]
+        else:
+            out += _VEC3.pack(npc["x"], npc["y"], npc["z"])
+    return bytes(out)
+
+
+def _enc_npc_despawn(data, handles, refs, quant):
+    return _ref(data["npcId"], handles, refs)
+
+
+def _enc_intern(data, handles, refs, quant):
+    return encode_varint(data["handle"]) + data["name"].encode()
+
+
+_ENCODERS = {
+    PacketType.PLAYER_MOVE: _enc_vec3,
+    PacketType.PLAYER_CORRECTION: _enc_vec3,
+    PacketType.WORLD_ACK: _enc_ack,
+    PacketType.WORLD_UPDATE: _enc_world_update,
+    PacketType.WORLD_DELTA: _enc_world_delta,
+    PacketType.NPC_UPDATE: _enc_npc_update,
+    PacketType.NPC_BATCH_UPDATE: _enc_npc_batch,
+    PacketType.NPC_DESPAWN: _enc_npc_despawn,
+    PacketType.INTERN: _enc_intern,
+}
+
+
+def _dec_vec3(payload, pos, names, quant):
+    x, y, z = _VEC3.unpack_from(payload, pos)
+    return {"x": x, "y": y, "z": z}
+
+
+def _dec_ack(payload, pos, names, quant):
+    seq, _ = decode_varint(payload, pos)
+    return {"seq": seq}
+
+
+def _dec_players(payload, pos, names, quant):
+    count, pos = decode_varint(payload, pos)
+    players = []
+    for _ in range(count):
+        h, pos = decode_varint(payload, pos)
+        x, y, z, pos = _unpack_position(payload, pos, quant)
+        players.append({"id": names.get(h, h), "x": x, "y": y, "z": z})
+    return players, pos
+
+
+def _dec_world_update(payload, pos, names, quant):
+    seq, pos = decode_varint(payload, pos)
+    players, _ = _dec_players(payload, pos, names, quant)
+    return {"seq": seq, "players": players}
+
+
+def _dec_world_delta(payload, pos, names, quant):
+    seq, pos = decode_varint(payload, pos)
+    baseline, pos = decode_varint(payload, pos)
+    players, pos = _dec_players(payload, pos, names, quant)
+    count, pos = decode_varint(payload, pos)
+    removed = []
+    for _ in range(count):
+        h, pos = decode_varint(payload, pos)
+        removed.append(names.get(h, h))
+    return {"seq": seq, "baseline": baseline, "players": players, "removed": removed}
+
+
+def _dec_npc_update(payload, pos, names, quant):
+    h, pos = decode_varint(payload, pos)
+    x, y, z, _ = _unpack_position(payload, pos, quant)
+    return {"x": x, "y": y, "z": z, "npcId": names.get(h, h)}
+
+
+def _dec_npc_batch(payload, pos, names, quant):
+    q_um, pos = decode_varint(payload, pos)
+    count, pos = decode_varint(payload, pos)
+    npcs = []
+    for _ in range(count):
+        h, pos = decode_varint(payload, pos)
+        if q_um:
+            x, pos = decode_varint(payload, pos)
+            y, pos = decode_varint(payload, pos)
+            z, pos = decode_varint(payload, pos)
+            x, y, z = unzigzag(x), unzigzag(y), unzigzag(z)
+        else:
+            x, y, z, pos = _unpack_position(payload, pos, quant)
+        npcs.append({"npcId": names.get(h, h), "x": x, "y": y, "z": z})
+    data = {"npcs": npcs}
+    if q_um:
+        data["q"] = q_um / 1e6
+    return data
+
+
+def _dec_npc_despawn(payload, pos, names, quant):
+    h, _ = decode_varint(payload, pos)
+    return {"npcId": names.get(h, h)}
+
+
+def _dec_intern(payload, pos, names, quant):
+    h, pos = decode_varint(payload, pos)
+    return {"handle": h, "name": bytes(payload[pos:]).decode()}
+
+
+_DECODERS = {
+    PacketType.PLAYER_MOVE: _dec_vec3,
+    PacketType.PLAYER_CORRECTION: _dec_vec3,
+    PacketType.WORLD_ACK: _dec_ack,
+    PacketType.WORLD_UPDATE: _dec_world_update,
+    PacketType.WORLD_DELTA: _dec_world_delta,
+    PacketType.NPC_UPDATE: _dec_npc_update,
+    PacketType.NPC_BATCH_UPDATE: _dec_npc_batch,
+    PacketType.NPC_DESPAWN: _dec_npc_despawn,
+    PacketType.INTERN: _dec_intern,
+}
+
+
+def encode_payload(packet_id, data, handles, quantizer=None):
+    """Return (payload bytes, refs) for a binary frame body."""
+    refs = {}
+    encoder = _ENCODERS.get(packet_id)
+    if encoder is None:
+        return json.dumps(data).encode(), refs
+    return encoder(data, handles, refs, quantizer), refs
+
+
+def decode_payload(packet_id, payload, names=None, quantizer=None):
+    """Decode a binary frame body back into the packet's data dict."""
+    decoder = _DECODERS.get(packet_id)
+    if decoder is None:
+        return json.loads(bytes(payload).decode()) if payload else {}
+    return decoder(payload, 0, names or {}, quantizer)
+
+
+def frame(packet_id, payload):
+    body = encode_varint(packet_id) + payload
+    return encode_varint(len(body)) + body
+
+
+# --- Per-connection codecs --------------------------------------------------
+
+class EncodedPacket:
+    """A packet serialized at most once per wire encoding.
+
+    Broadcasts hand the same instance to every recipient: JSON clients share
+    one bytes object and binary clients share one frame, plus a small
+    per-connection INTERN preamble the first time a handle is referenced.
+    """
+
+    __slots__ = ("packet_id", "data", "_json", "_frame", "_refs")
+
+    def __init__(self, packet_id, data):
+        self.packet_id = packet_id
+        self.data = data
+        self._json = None
+        self._frame = None
+        self._refs = None
+
+    def json(self):
+        if self._json is None:
+            self._json = (json.dumps({"id": self.packet_id, "data": self.data}) + "\n").encode()
+        return self._json
+
+    def binary(self, handles, quantizer=None):
+        """Return (frame bytes, refs); a server uses one quantizer for every binary connection."""
+        if self._frame is None:
+            payload, self._refs = encode_payload(self.packet_id, self.data, handles, quantizer)
+            self._frame = frame(self.packet_id, payload)
+        return self._frame, self._refs
+
+
+class JsonCodec:
+    name = ENCODING_JSON
+
+    def encode(self, packet_id, data):
+        return (json.dumps({"id": packet_id, "data": data}) + "\n").encode()
+
+    def packet_chunks(self, packet):
+        """Return (preamble, body) bytes for an EncodedPacket."""
+        return b"", packet.json()
+
+    def write_packet(self, writer, packet):
+        writer.write(packet.json())
+
+
+class BinaryCodec:
+    """Binary encoder for one connection; tracks which handles the peer knows."""
+
+    name = ENCODING_BINARY
+
+    def __init__(self, handles, quantizer=None):
+        self.handles = handles
+        self.quantizer = quantizer
+        self.known = {}  # handle -> name already sent to the peer
+
+    def encode(self, packet_id, data):
+        payload, refs = encode_payload(packet_id, data, self.handles, self.quantizer)
+        return self.interns(refs) + frame(packet_id, payload)
+
+    def packet_chunks(self, packet):
+        """Return (preamble, body): INTERN frames this peer still needs, then the shared frame."""
+        shared, refs = packet.binary(self.handles, self.quantizer)
+        return self.interns(refs), shared
+
+    def write_packet(self, writer, packet):
+        preamble, shared = self.packet_chunks(packet)
+        if preamble:
+            writer.write(preamble)
+        writer.write(shared)
+
+    def interns(self, refs):
+        """INTERN frames for every handle in refs the peer doesn't know yet."""
+        out = b""
+        for h, name in refs.items():
+            if self.known.get(h) != name:
+                self.known[h] = name
+                out += frame(PacketType.INTERN, _enc_intern({"handle": h, "name": name}, None, None, None))
+        return out
+
+
+JSON_CODEC = JsonCodec()
+
+
+def codec_for(server, writer):
+    return server.codecs.get(writer, JSON_CODEC)
+
+
+async def read_frame(reader, max_size=MAX_FRAME_SIZE):
+    """Read one binary frame; returns (packet_id, payload) or None on EOF.
+
+    Raises ValueError for a length prefix over MAX_LENGTH_BYTES or a frame
+    over max_size, before buffering the body; the caller drops the client.
+    """
+    length = 0
+    shift = 0
+    for _ in range(MAX_LENGTH_BYTES):
+        b = await reader.read(1)
+        if not b:
+            return None
+        length |= (b[0] & 0x7F) << shift
+        if not b[0] & 0x80:
+            break
+        shift += 7
+    else:
+        raise ValueError("frame length prefix too long")
+    if length > max_size:
+        raise ValueError(f"frame of {length} bytes exceeds {max_size}")
+    body = await reader.readexactly(length)
+    packet_id, pos = decode_varint(body)
+    return packet_id, body[pos:]
+
+
+class BinaryDecoder:
+    """Client-side helper: decodes a byte stream of frames, applying INTERN frames."""
+
+    def __init__(self, quantizer=None):
+        self.names = {}
+        self.quantizer = quantizer
+        self._buf = bytearray()
+
+    def feed(self, data):
+        """Consume bytes; return a list of decoded {"id", "data"} packets (INTERN excluded)."""
+        self._buf += data
+        packets = []
+        while True:
+            try:
+                length, pos = decode_varint(self._buf)
+            except ValueError:
+                break
+            if len(self._buf) - pos < length:
+                break
+            body = bytes(self._buf[pos:pos + length])
+            del self._buf[:pos + length]
+            packet_id, p = decode_varint(body)
+            data = decode_payload(packet_id, body[p:], self.names, self.quantizer)
+            if packet_id == PacketType.INTERN:
+                self.names[data["handle"]] = data["name"]
+                continue
+            packets.append({"id": packet_id, "data": data})
+        return packets